@@ -0,0 +1,162 @@
+"""
+Compares the storage backends of the links (database.backend): lookup of an existing and a non-existing link,
+insert of one link and insert of a batch of links, each in its own session (and transaction) as in the service
+
+The Postgres backend uses the database given by DB_STRING and is skipped when it is not set,
+the benchmark links are removed from it at the end; SQLite uses a temporary database file
+    python benchmarks/backends.py --links 10000 --lookups 20000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import common  # noqa: E402
+
+common.use_src()
+
+import psycopg2  # noqa: E402
+
+import pool  # noqa: E402
+import storage  # noqa: E402
+from codec import AlphabetCodec  # noqa: E402
+from config import load_conf  # noqa: E402
+
+BACKENDS = ("postgres", "sqlite", "memory")
+BATCH = 100
+
+
+def entry(link: str, codec: AlphabetCodec) -> dict:
+    """
+    Creates the values of the inserted link, the same as the create request does
+    :param link: link of the form of the encoded links
+    :param codec: AlphabetCodec object of the encoded links
+    :return: dictionary with preprocessed information about the entry
+    """
+    return {"link": link, "id": codec.key(link), "protocol": "https", "dest": f"example.com/{link}",
+            "redirect": 301, "ip_address": 2130706433, "generated": True, "expires_in": None}
+
+
+def measure(function, arguments: list, operations_per_call: int = 1) -> dict:
+    """
+    Measures the latency of each call of the function
+    :param function: function taking one argument
+    :param arguments: arguments of the calls, one call per argument
+    :param operations_per_call: number of operations done by one call, e.g., links of the batch
+    :return: summary of the measurement
+    """
+    latencies = []
+    started = time.perf_counter()
+    for argument in arguments:
+        start = time.perf_counter()
+        function(argument)
+        latencies.append(time.perf_counter() - start)
+
+    return common.summarize(latencies, time.perf_counter() - started, len(arguments) * operations_per_call)
+
+
+def run(name: str, link_storage, codec: AlphabetCodec, args, created: list) -> dict:
+    """
+    Seeds the storage with the benchmark links and measures all operations
+    :param name: name of the backend
+    :param link_storage: storage object of the backend
+    :param codec: AlphabetCodec object of the encoded links
+    :param args: parsed arguments
+    :param created: list the inserted links are appended to, for the cleanup
+    :return: dictionary of name -> summary
+    """
+    # distinct links spread over the whole link capacity, the first ones are seeded, the rest are inserted
+    ids = random.sample(range(codec.capacity), args.links + args.inserts * (1 + BATCH) + args.lookups)
+    links = [codec.encode(link_id) for link_id in ids]
+    seeded, links = links[:args.links], links[args.links:]
+    single, links = links[:args.inserts], links[args.inserts:]
+    batched, missing = links[:args.inserts * BATCH], links[args.inserts * BATCH:]
+    created.extend(seeded + single + batched)
+
+    for start in range(0, len(seeded), 1000):
+        with link_storage.session() as session:
+            session.insert_many([entry(link, codec) for link in seeded[start:start + 1000]])
+            session.commit()
+
+    def get(link):
+        with link_storage.session() as session:
+            return session.get(link)
+
+    def insert(link):
+        with link_storage.session() as session:
+            session.insert(entry(link, codec))
+            session.commit()
+
+    def insert_many(links_batch):
+        with link_storage.session() as session:
+            session.insert_many([entry(link, codec) for link in links_batch])
+            session.commit()
+
+    # warm-up, also prepares the statements
+    for link in seeded[:1000]:
+        get(link)
+
+    return {
+        f"get ({name})": measure(get, random.choices(seeded, k=args.lookups)),
+        f"get missing ({name})": measure(get, missing),
+        f"insert ({name})": measure(insert, single),
+        f"insert_many {BATCH} ({name})": measure(
+            insert_many, [batched[start:start + BATCH] for start in range(0, len(batched), BATCH)], BATCH),
+    }
+
+
+def cleanup(links: list[str], codec: AlphabetCodec) -> None:
+    """
+    Removes the benchmark links from the Postgres database
+    :param links: list of links
+    :param codec: AlphabetCodec object of the encoded links
+    :return: None
+    """
+    connection = psycopg2.connect(os.environ.get("DB_STRING"))
+    cursor = connection.cursor()
+    cursor.execute("DELETE FROM encoded_links WHERE id = ANY(%(ids)s);", {"ids": [codec.key(link) for link in links]})
+    connection.commit()
+    connection.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--links", type=int, default=10000, help="number of links in the storage")
+    parser.add_argument("--lookups", type=int, default=20000, help="number of measured lookups per backend")
+    parser.add_argument("--inserts", type=int, default=1000,
+                        help=f"number of measured inserts of one link and of {BATCH} links per backend")
+    parser.add_argument("--backend", choices=BACKENDS, action="append", help="storage backend, all by default")
+    common.add_output_arguments(parser)
+    args = parser.parse_args()
+
+    conf = load_conf("config.toml")
+    codec = AlphabetCodec(sorted(conf.Utils.link_alphabet), conf.Utils.link_length)
+    results = {}
+    for name in args.backend or BACKENDS:
+        if name == "postgres" and not os.environ.get("DB_STRING"):
+            print("DB_STRING is not set, skipping the postgres backend")
+            continue
+
+        created = []
+        with tempfile.TemporaryDirectory() as directory:
+            conf.Storage.backend = name
+            conf.Storage.sqlite_path = os.path.join(directory, "benchmark.sqlite3")
+            link_storage = storage.init(conf.Storage, codec)
+            if name == "postgres":
+                link_storage.start(pool.init(conf.Pool, os.environ.get("DB_STRING"), 0))
+            try:
+                results.update(run(name, link_storage, codec, args, created))
+            finally:
+                if name == "postgres":
+                    cleanup(created, codec)
+
+    return common.finish(args, "backends", results, {"links": args.links, "lookups": args.lookups,
+                                                     "inserts": args.inserts})
+
+
+if __name__ == "__main__":
+    sys.exit(main())
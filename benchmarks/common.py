@@ -0,0 +1,149 @@
+"""
+Shared helpers of the benchmarks: statistics, machine-readable results and comparison with the baselines
+"""
+import json
+import os
+import platform
+import sys
+import time
+from typing import Optional
+
+SRC_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+BASELINES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+DEFAULT_TOLERANCE = 0.1
+# use_src changes the working directory, the paths given on the command line are relative to the original one
+INVOCATION_DIR = os.getcwd()
+
+
+def use_src() -> None:
+    """
+    Makes the service modules importable and the relative paths (config.toml, templates) resolvable
+    :return: None
+    """
+    if SRC_DIR not in sys.path:
+        sys.path.insert(0, SRC_DIR)
+    os.chdir(SRC_DIR)
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """
+    Returns the value at the given fraction of the sorted values
+    :param values: sorted list of values
+    :param fraction: number between 0 and 1, e.g., 0.99 for p99
+    :return: value at the percentile
+    """
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def summarize(latencies: list[float], elapsed: float, operations: Optional[int] = None) -> dict:
+    """
+    Summarizes the measured latencies
+    :param latencies: list of latencies in seconds
+    :param elapsed: wall time of the measurement in seconds
+    :param operations: number of operations, number of latencies if None
+    :return: dictionary with throughput (operations per second) and p50/p99 latency in microseconds
+    """
+    latencies = sorted(latencies)
+    operations = len(latencies) if operations is None else operations
+    return {
+        "operations": operations,
+        "throughput": round(operations / elapsed, 1),
+        "p50_us": round(percentile(latencies, 0.5) * 1e6, 3),
+        "p99_us": round(percentile(latencies, 0.99) * 1e6, 3),
+    }
+
+
+def print_results(results: dict) -> None:
+    """
+    Prints the results as a table
+    :param results: dictionary of name -> summary
+    :return: None
+    """
+    for name, summary in results.items():
+        print(f"{name:<40} {summary['throughput']:>12.1f}/s  p50={summary['p50_us']:>10.2f}us  "
+              f"p99={summary['p99_us']:>10.2f}us")
+
+
+def save_results(filename: str, suite: str, results: dict, parameters: dict) -> None:
+    """
+    Stores the results as a JSON document usable as a baseline
+    :param filename: path of the output file
+    :param suite: name of the benchmark suite
+    :param results: dictionary of name -> summary
+    :param parameters: parameters of the run
+    :return: None
+    """
+    document = {
+        "suite": suite,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "parameters": parameters,
+        "results": results,
+    }
+    directory = os.path.dirname(os.path.abspath(filename))
+    os.makedirs(directory, exist_ok=True)
+    with open(filename, "w", encoding="utf-8") as file:
+        json.dump(document, file, indent=2)
+        file.write("\n")
+
+
+def compare(results: dict, baseline_filename: str, tolerance: float) -> list[str]:
+    """
+    Compares the results with the baseline
+    :param results: dictionary of name -> summary
+    :param baseline_filename: path of the baseline file created by save_results
+    :param tolerance: allowed relative slowdown, e.g., 0.1 for 10 %
+    :return: list of descriptions of the regressions, empty if there are none
+    """
+    with open(baseline_filename, "r", encoding="utf-8") as file:
+        baseline = json.load(file)["results"]
+
+    regressions = []
+    for name, summary in results.items():
+        if name not in baseline:
+            continue
+        expected = baseline[name]
+        if summary["throughput"] < expected["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {summary['throughput']}/s < baseline {expected['throughput']}/s")
+        if summary["p50_us"] > expected["p50_us"] * (1 + tolerance):
+            regressions.append(f"{name}: p50 {summary['p50_us']}us > baseline {expected['p50_us']}us")
+
+    return regressions
+
+
+def add_output_arguments(parser) -> None:
+    """
+    Adds the arguments controlling the stored results and the comparison with the baseline
+    :param parser: argparse.ArgumentParser object
+    :return: None
+    """
+    parser.add_argument("--save", help="store the results as JSON to the given file")
+    parser.add_argument("--baseline", help="compare the results with the given JSON file, exit with 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed relative slowdown compared to the baseline")
+
+
+def finish(args, suite: str, results: dict, parameters: dict) -> int:
+    """
+    Prints, stores and compares the results based on the arguments
+    :param args: parsed arguments of add_output_arguments
+    :param suite: name of the benchmark suite
+    :param results: dictionary of name -> summary
+    :param parameters: parameters of the run
+    :return: exit code
+    """
+    print_results(results)
+    if args.save:
+        save_results(os.path.join(INVOCATION_DIR, args.save), suite, results, parameters)
+        print(f"Results stored to {args.save}")
+
+    if args.baseline:
+        regressions = compare(results, os.path.join(INVOCATION_DIR, args.baseline), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions compared to {args.baseline}")
+
+    return 0
@@ -0,0 +1,114 @@
+"""
+Compares the redirects answered by the WSGI fast path (network.fast_path) with the ones dispatched by Flask
+
+Calls the WSGI app in-process, without the test client, so only the request handling of the service is measured:
+the cached redirect, the not-found link (cached as not found) and the link with not allowed characters.
+The links are created through the app in the storage configured by config.toml (DB_STRING for PostgreSQL)
+and removed from PostgreSQL at the end.
+
+    python benchmarks/fastpath.py --requests 50000 --save benchmarks/baselines/fastpath.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import common  # noqa: E402
+
+common.use_src()
+
+import psycopg2  # noqa: E402
+from werkzeug.test import EnvironBuilder  # noqa: E402
+
+import fastpath  # noqa: E402
+import storage  # noqa: E402
+from codec import AlphabetCodec  # noqa: E402
+
+LINKS = 100
+
+
+def cleanup(links: list[str], codec: AlphabetCodec) -> None:
+    """
+    Removes the benchmark links from the Postgres database
+    :param links: list of links
+    :param codec: AlphabetCodec object of the encoded links
+    :return: None
+    """
+    connection = psycopg2.connect(os.environ.get("DB_STRING"))
+    cursor = connection.cursor()
+    cursor.execute("DELETE FROM encoded_links WHERE id = ANY(%(ids)s);",
+                   {"ids": [codec.key(link) for link in links if codec.key(link) is not None]})
+    cursor.execute("DELETE FROM links WHERE link = ANY(%(links)s);", {"links": links})
+    connection.commit()
+    connection.close()
+
+
+def measure(wsgi_app, environs: list[dict], requests: int) -> dict:
+    """
+    Sends the requests round-robin and measures the latency of each of them, including reading the body
+    :param wsgi_app: WSGI application
+    :param environs: WSGI environments of the requests
+    :param requests: number of the requests
+    :return: summary of the measurement
+    """
+    def start_response(status, headers, exc_info=None):
+        return None
+
+    latencies = []
+    started = time.perf_counter()
+    for index in range(requests):
+        environ = dict(environs[index % len(environs)])
+        start = time.perf_counter()
+        iterable = wsgi_app(environ, start_response)
+        b"".join(iterable)
+        if hasattr(iterable, "close"):
+            iterable.close()
+        latencies.append(time.perf_counter() - start)
+
+    return common.summarize(latencies, time.perf_counter() - started)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50000, help="number of measured requests per case and path")
+    common.add_output_arguments(parser)
+    args = parser.parse_args()
+
+    import app as service  # noqa: E402
+
+    fast_path = service.app.wsgi_app
+    if not isinstance(fast_path, fastpath.RedirectFastPath):
+        print("Redirect fast path is not installed, enable [network.fast_path] and disable [timing]")
+        return 1
+
+    client = service.app.test_client()
+    links = []
+    for index in range(LINKS):
+        response = client.post("/", json={"destination": f"https://example.com/{index}"})
+        links.append(json.loads(response.data)["link"])
+
+    cases = {
+        "redirect": [f"/{link}" for link in links],
+        "not found": [f"/{link[::-1]}x" for link in links],
+        "not allowed characters": ["/favicon.ico"],
+    }
+    results = {}
+    try:
+        for name, paths in cases.items():
+            environs = [EnvironBuilder(path=path).get_environ() for path in paths]
+            # warm-up, also fills the redirect cache and the prebuilt responses
+            measure(fast_path, environs, len(environs) * 2)
+            results[f"{name} (flask)"] = measure(fast_path.wsgi_app, environs, args.requests)
+            results[f"{name} (fast path)"] = measure(fast_path, environs, args.requests)
+    finally:
+        if isinstance(service.app.config["STORAGE"], storage.PostgresStorage):
+            cleanup(links, service.app.config["GET_CTX"].codec)
+
+    return common.finish(args, "fastpath", results, {"requests": args.requests, "links": LINKS})
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+End-to-end load generator replaying Zipf-distributed redirect and create traffic against the Flask app
+
+Runs the app in-process (Flask test client) against the database given by DB_STRING,
+seeds it with the benchmark links and removes them (and the created ones) at the end.
+
+    python benchmarks/load.py --links 10000 --requests 20000 --concurrency 4 --save benchmarks/baselines/load.json
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import common  # noqa: E402
+
+common.use_src()
+
+import psycopg2  # noqa: E402
+
+from codec import AlphabetCodec  # noqa: E402
+from config import load_conf  # noqa: E402
+
+
+def codec() -> AlphabetCodec:
+    """
+    Creates the codec of the encoded links the same way as the service
+    :return: AlphabetCodec object
+    """
+    conf = load_conf("config.toml")
+    return AlphabetCodec(sorted(conf.Utils.link_alphabet), conf.Utils.link_length)
+
+
+def seed(count: int) -> list[str]:
+    """
+    Inserts the benchmark links into the database
+    :param count: number of links
+    :return: list of inserted links, ordered by popularity
+    """
+    link_codec = codec()
+    step = link_codec.capacity // count
+    ids = [index * step for index in range(count)]
+
+    connection = psycopg2.connect(os.environ.get("DB_STRING"))
+    cursor = connection.cursor()
+    cursor.execute(
+        "INSERT INTO encoded_links (id, destination_proto, destination_addr, redirect, creator_ip) "
+        "SELECT new_links.id, 2, CONCAT('example.com/', new_links.id), '1', 0 "
+        "FROM unnest(%(ids)s::bigint[]) AS new_links(id) ON CONFLICT (id) DO NOTHING RETURNING id;",
+        {"ids": ids}
+    )
+    inserted = {row[0] for row in cursor.fetchall()}
+    connection.commit()
+    connection.close()
+
+    return [link_codec.encode(link_id) for link_id in ids if link_id in inserted]
+
+
+def cleanup(links: list[str]) -> None:
+    """
+    Removes the benchmark links from the database
+    :param links: list of links
+    :return: None
+    """
+    link_codec = codec()
+    connection = psycopg2.connect(os.environ.get("DB_STRING"))
+    cursor = connection.cursor()
+    cursor.execute("DELETE FROM encoded_links WHERE id = ANY(%(ids)s);",
+                   {"ids": [link_codec.key(link) for link in links if link_codec.key(link) is not None]})
+    cursor.execute("DELETE FROM links WHERE link = ANY(%(links)s);", {"links": links})
+    connection.commit()
+    connection.close()
+
+
+def zipf_weights(count: int, exponent: float) -> list[float]:
+    """
+    Returns the cumulative weights of the Zipf distribution over the ranks
+    :param count: number of ranks
+    :param exponent: Zipf exponent, higher values concentrate the traffic on fewer links
+    :return: list of cumulative weights
+    """
+    return list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+def worker(app, links: list[str], cum_weights: list[float], args, results: dict, created: list, lock) -> None:
+    """
+    Sends args.requests // args.concurrency requests and records their latencies
+    :return: None
+    """
+    client = app.test_client()
+    rng = random.Random()
+    latencies = {"redirect": [], "redirect (miss)": [], "create": []}
+    count = args.requests // args.concurrency
+    samples = iter(rng.choices(links, cum_weights=cum_weights, k=count))
+
+    for _ in range(count):
+        operation = rng.random()
+        if operation < args.create_ratio:
+            start = time.perf_counter()
+            response = client.post("/", json={"destination": f"https://example.com/{rng.random()}"})
+            latencies["create"].append(time.perf_counter() - start)
+            if response.status_code == 201:
+                created.append(json.loads(response.data)["link"])
+        elif operation < args.create_ratio + args.miss_ratio:
+            start = time.perf_counter()
+            client.get(f"/{''.join(rng.choices('xyzXYZ', k=8))}")
+            latencies["redirect (miss)"].append(time.perf_counter() - start)
+        else:
+            link = next(samples)
+            start = time.perf_counter()
+            client.get(f"/{link}")
+            latencies["redirect"].append(time.perf_counter() - start)
+
+    with lock:
+        for name, values in latencies.items():
+            results.setdefault(name, []).extend(values)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--links", type=int, default=10000, help="number of seeded links")
+    parser.add_argument("--requests", type=int, default=20000, help="total number of requests")
+    parser.add_argument("--concurrency", type=int, default=4, help="number of client threads")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of the link popularity")
+    parser.add_argument("--create-ratio", type=float, default=0.01, help="fraction of create requests")
+    parser.add_argument("--miss-ratio", type=float, default=0.05, help="fraction of redirects of missing links")
+    common.add_output_arguments(parser)
+    args = parser.parse_args()
+
+    links = seed(args.links)
+    created = []
+    try:
+        import app as service  # noqa: E402
+
+        cum_weights = zipf_weights(len(links), args.zipf)
+        latencies: dict[str, list[float]] = {}
+        lock = threading.Lock()
+        threads = [threading.Thread(target=worker, args=(service.app, links, cum_weights, args, latencies, created,
+                                                         lock))
+                   for _ in range(args.concurrency)]
+
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        cleanup(links + created)
+
+    results = {name: common.summarize(values, elapsed) for name, values in latencies.items() if values}
+    results["total"] = common.summarize(list(itertools.chain(*latencies.values())), elapsed)
+
+    parameters = {key: value for key, value in vars(args).items() if key not in ("save", "baseline", "tolerance")}
+    return common.finish(args, "load", results, parameters)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Micro-benchmarks of the pure-Python functions on the create and redirect paths
+
+    python benchmarks/micro.py --save benchmarks/baselines/micro.json
+    python benchmarks/micro.py --baseline benchmarks/baselines/micro.json
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import common  # noqa: E402
+
+common.use_src()
+
+import flask  # noqa: E402
+
+import bloom  # noqa: E402
+import create  # noqa: E402
+import get  # noqa: E402
+import logs  # noqa: E402
+import utils  # noqa: E402
+from config import load_conf  # noqa: E402
+
+BATCH = 100
+
+
+def loggers() -> tuple[logging.Logger, logging.Logger]:
+    """
+    Creates the loggers writing to os.devnull, directly and through the queue of the log pipeline
+    :return: tuple of the direct and the queued logger
+    """
+    pipeline = logs.LogPipeline(open(os.devnull, "w", encoding="utf-8"))
+    pipeline.start()
+    # the benchmark loggers do not propagate to the root logger, so only the background writing is used
+    logging.getLogger().removeHandler(pipeline.handler)
+
+    direct = logging.getLogger("benchmark.direct")
+    direct.addHandler(pipeline.output)
+    queued = logging.getLogger("benchmark.queued")
+    queued.addHandler(pipeline.handler)
+    for logger in (direct, queued):
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+    return direct, queued
+
+
+def measure(function, samples: int) -> dict:
+    """
+    Measures the function in batches of BATCH calls, the latency of a call is the batch time divided by BATCH
+    :param function: function without arguments
+    :param samples: number of measured batches
+    :return: summary of the measurement
+    """
+    for _ in range(BATCH):
+        function()
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(samples):
+        start = time.perf_counter()
+        for _ in range(BATCH):
+            function()
+        latencies.append((time.perf_counter() - start) / BATCH)
+    elapsed = time.perf_counter() - started
+
+    return common.summarize(latencies, elapsed, samples * BATCH)
+
+
+def benchmarks() -> dict:
+    """
+    Creates the measured functions with the inputs resembling the real requests
+    :return: dictionary of name -> function without arguments
+    """
+    conf = load_conf("config.toml")
+    allowed_alphabet = conf.Utils.link_alphabet.union(conf.Utils.extensions_alphabet)
+    link_alphabet_l = sorted(conf.Utils.link_alphabet)
+    insert_ctx = create.InsertContext(conf.Utils.link_alphabet, link_alphabet_l, allowed_alphabet,
+                                      conf.Utils.link_length, conf.Utils.destination_length,
+                                      conf.Utils.creation_tries)
+    get_ctx = get.GetContext(allowed_alphabet)
+    link_filter = bloom.LinkFilter(1, 0.01, 3600, insert_ctx.codec)
+    link_filter.add("AbCdE")
+
+    direct_logger, queued_logger = loggers()
+
+    body = {"destination": "https://example.com/some/path?query=value", "redirect": 302}
+    parsed = urlparse(body["destination"])
+
+    return {
+        "CreateValues.__init__": lambda: create.CreateValues(body, insert_ctx),
+        "check_destination": lambda: create.check_destination(body["destination"], conf.Utils.destination_length),
+        "utils.remove_scheme_url": lambda: utils.remove_scheme_url(parsed),
+        "utils.generate_string": lambda: utils.generate_string(link_alphabet_l, conf.Utils.link_length),
+        "get.check_requested_link (valid)": lambda: get.check_requested_link("AbCdE", get_ctx),
+        "get.check_requested_link (invalid)": lambda: get.check_requested_link("wp-admin.php", get_ctx),
+        "bloom.LinkFilter.might_contain (present)": lambda: link_filter.might_contain("AbCdE"),
+        "bloom.LinkFilter.might_contain (absent)": lambda: link_filter.might_contain("EdCbA"),
+        "logging.debug (disabled)": lambda: logging.debug("Link found in the redirect cache, link=%s", "AbCdE"),
+        "logging.info (direct)": lambda: direct_logger.info("Link found in the redirect cache, link=%s", "AbCdE"),
+        "logging.info (queued)": lambda: queued_logger.info("Link found in the redirect cache, link=%s", "AbCdE"),
+        "json_response": lambda: utils.json_response({"status": "created", "link": "AbCdE"}, 201),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=2000, help="number of measured batches per function")
+    parser.add_argument("--filter", default="", help="run only the benchmarks containing the text")
+    common.add_output_arguments(parser)
+    args = parser.parse_args()
+
+    # templates of the 404 responses need the application context
+    app = flask.Flask("benchmark", template_folder=os.path.join(common.SRC_DIR, "template"))
+    with app.app_context():
+        results = {name: measure(function, args.samples)
+                   for name, function in benchmarks().items() if args.filter in name}
+
+    return common.finish(args, "micro", results, {"samples": args.samples, "batch": BATCH})
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Compares the latency of the redirect lookup through the get_address plpgsql function
+with the prepared statement used by get.get_from_db.
+
+Requires a database created from utils/database.sql, given by DB_STRING
+    python benchmarks/redirect_query.py --links 10000 --lookups 20000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import common  # noqa: E402
+
+common.use_src()
+
+import psycopg2  # noqa: E402
+
+import db  # noqa: E402
+from get import get_from_db  # noqa: E402
+
+
+def fill(connection, count: int) -> list[str]:
+    """
+    Inserts the benchmark links, which are removed at the end
+    :param connection: psycopg2 connection object
+    :param count: number of links
+    :return: list of inserted links
+    """
+    links = [f"bench{index}" for index in range(count)]
+    cursor = connection.cursor()
+    cursor.execute(
+        "INSERT INTO links (link, destination_proto, destination_addr, redirect, creator_ip) "
+        "SELECT new_links.link, 2, CONCAT('example.com/', new_links.link), '1', 0 "
+        "FROM unnest(%(links)s::varchar[]) AS new_links(link) ON CONFLICT (link) DO NOTHING;",
+        {"links": links}
+    )
+    connection.commit()
+    cursor.close()
+    return links
+
+
+def measure(lookup, links: list[str], lookups: int) -> dict:
+    """
+    Measures the latency of each lookup of a random link
+    :param lookup: function taking the link
+    :param links: list of existing links
+    :param lookups: number of lookups
+    :return: summary of the measurement
+    """
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(lookups):
+        link = random.choice(links)
+        start = time.perf_counter()
+        lookup(link)
+        latencies.append(time.perf_counter() - start)
+
+    return common.summarize(latencies, time.perf_counter() - started)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--links", type=int, default=10000, help="number of links in the table")
+    parser.add_argument("--lookups", type=int, default=20000, help="number of measured lookups per variant")
+    common.add_output_arguments(parser)
+    args = parser.parse_args()
+
+    connection = psycopg2.connect(os.environ.get("DB_STRING"), connection_factory=db.PreparingConnection)
+    links = fill(connection, args.links)
+    vacuum = psycopg2.connect(os.environ.get("DB_STRING"))
+    vacuum.autocommit = True
+    vacuum.cursor().execute("VACUUM ANALYZE links;")
+    vacuum.close()
+
+    cursor = connection.cursor()
+
+    def function_lookup(link):
+        cursor.execute("SELECT url, redirect FROM get_address(%(link)s::varchar);", {"link": link})
+        return cursor.fetchone()
+
+    def prepared_lookup(link):
+        return get_from_db(cursor, {"link": link})
+
+    # warm-up of both variants, also prepares the statement
+    measure(function_lookup, links, 1000)
+    measure(prepared_lookup, links, 1000)
+
+    results = {
+        "get_address()": measure(function_lookup, links, args.lookups),
+        "prepared get_link": measure(prepared_lookup, links, args.lookups),
+    }
+
+    connection.rollback()
+    cursor.execute("DELETE FROM links WHERE link = ANY(%(links)s);", {"links": links})
+    connection.commit()
+    connection.close()
+
+    return common.finish(args, "redirect_query", results, {"links": args.links, "lookups": args.lookups})
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""
+Measures the cold start of the service: import of the app (loading the config and creating the worker resources)
+and the first served request, each in a fresh Python process, for every connect mode of the connection pool
+
+The first request is a redirect of a non-existing link, so it waits for the database connection
+when the pool did not open it before. The database is given by DB_STRING
+    python benchmarks/startup.py --runs 20
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import common  # noqa: E402
+
+MODES = ("startup", "background", "lazy")
+# run in the fresh process, prints the import time and the time until the first response in seconds
+CHILD = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.app.test_client().get("/zzzzz")
+print(json.dumps({"import": imported - start, "first request": time.perf_counter() - start}))
+"""
+
+
+def write_config(directory: str, mode: str) -> None:
+    """
+    Writes the config of the service with the given connect mode of the pool into the directory
+    :param directory: path of the directory the child process runs in
+    :param mode: connect mode of the pool
+    :return: None
+    """
+    with open(os.path.join(common.SRC_DIR, "config.toml"), "r", encoding="utf-8") as file:
+        config = file.read()
+
+    config = re.sub(r'^connect = ".*"$', f'connect = "{mode}"', config, flags=re.MULTILINE)
+    with open(os.path.join(directory, "config.toml"), "w", encoding="utf-8") as file:
+        file.write(config)
+
+
+def measure(mode: str, runs: int) -> dict:
+    """
+    Starts the service in runs fresh processes and measures each start
+    :param mode: connect mode of the pool
+    :param runs: number of processes
+    :return: dictionary of name -> summary
+    """
+    environment = dict(os.environ, PYTHONPATH=common.SRC_DIR)
+    timings = {"import": [], "first request": []}
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as directory:
+        write_config(directory, mode)
+        for _ in range(runs):
+            output = subprocess.run([sys.executable, "-c", CHILD], cwd=directory, env=environment,
+                                    capture_output=True, text=True, check=True).stdout
+            for name, value in json.loads(output.strip().splitlines()[-1]).items():
+                timings[name].append(value)
+    elapsed = time.perf_counter() - started
+
+    return {f"{name} (connect={mode})": common.summarize(values, elapsed) for name, values in timings.items()}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=20, help="number of started processes per connect mode")
+    parser.add_argument("--mode", choices=MODES, action="append", help="connect mode of the pool, all by default")
+    common.add_output_arguments(parser)
+    args = parser.parse_args()
+
+    results = {}
+    for mode in args.mode or MODES:
+        results.update(measure(mode, args.runs))
+
+    return common.finish(args, "startup", results, {"runs": args.runs})
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+Compares the text-keyed storage of the links (links table) with the integer-keyed one (encoded_links table):
+size of the unique index and latency of the redirect lookup.
+
+Both variants are built as temporary tables of the same links in the database given by DB_STRING
+    python benchmarks/storage.py --links 1000000 --lookups 20000
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import common  # noqa: E402
+
+common.use_src()
+
+import psycopg2  # noqa: E402
+
+from codec import AlphabetCodec  # noqa: E402
+from config import load_conf  # noqa: E402
+
+TABLES = {
+    "text key": (
+        "CREATE TEMPORARY TABLE bench_text_links (link VARCHAR(32) NOT NULL, destination_proto INTEGER NOT NULL, "
+        "destination_addr VARCHAR(50) NOT NULL, redirect char, "
+        "CONSTRAINT bench_text_links_key UNIQUE (link) INCLUDE (destination_proto, destination_addr, redirect));",
+        "bench_text_links_key",
+        "PREPARE bench_text (varchar) AS SELECT destination_proto, destination_addr, redirect "
+        "FROM bench_text_links WHERE link = $1;",
+        "bench_text",
+    ),
+    "integer key": (
+        "CREATE TEMPORARY TABLE bench_encoded_links (id BIGINT NOT NULL, destination_proto INTEGER NOT NULL, "
+        "destination_addr VARCHAR(50) NOT NULL, redirect char, "
+        "CONSTRAINT bench_encoded_links_pkey PRIMARY KEY (id) "
+        "INCLUDE (destination_proto, destination_addr, redirect));",
+        "bench_encoded_links_pkey",
+        "PREPARE bench_encoded (bigint) AS SELECT destination_proto, destination_addr, redirect "
+        "FROM bench_encoded_links WHERE id = $1;",
+        "bench_encoded",
+    ),
+}
+
+
+def fill(cursor, table: str, rows) -> None:
+    """
+    Loads the rows into the table using COPY
+    :param cursor: psycopg2 cursor object
+    :param table: name of the table
+    :param rows: iterable of (key, destination) tuples
+    :return: None
+    """
+    buffer = io.StringIO()
+    for key, destination in rows:
+        buffer.write(f"{key}\t2\t{destination}\t1\n")
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} FROM STDIN;", buffer)
+
+
+def measure(cursor, statement: str, links: list, to_key, lookups: int) -> dict:
+    """
+    Measures the latency of each lookup of a random link, including its conversion to the key
+    :param cursor: psycopg2 cursor object
+    :param statement: name of the prepared statement
+    :param links: list of existing links
+    :param to_key: function converting the link to the key of the table
+    :param lookups: number of lookups
+    :return: summary of the measurement
+    """
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(lookups):
+        link = random.choice(links)
+        start = time.perf_counter()
+        cursor.execute(f"EXECUTE {statement} (%s);", (to_key(link),))
+        cursor.fetchone()
+        latencies.append(time.perf_counter() - start)
+
+    return common.summarize(latencies, time.perf_counter() - started)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--links", type=int, default=1000000, help="number of links in each table")
+    parser.add_argument("--lookups", type=int, default=20000, help="number of measured lookups per variant")
+    common.add_output_arguments(parser)
+    args = parser.parse_args()
+
+    conf = load_conf("config.toml")
+    codec = AlphabetCodec(sorted(conf.Utils.link_alphabet), conf.Utils.link_length)
+    ids = random.sample(range(codec.capacity), min(args.links, codec.capacity))
+    links = [codec.encode(link_id) for link_id in ids]
+
+    connection = psycopg2.connect(os.environ.get("DB_STRING"))
+    connection.autocommit = True
+    cursor = connection.cursor()
+
+    cursor.execute(TABLES["text key"][0])
+    fill(cursor, "bench_text_links", ((link, f"example.com/{link}") for link in links))
+    cursor.execute(TABLES["integer key"][0])
+    fill(cursor, "bench_encoded_links", ((link_id, f"example.com/{link}") for link_id, link in zip(ids, links)))
+    # keeps the visibility map up to date, so both lookups are index-only scans
+    cursor.execute("VACUUM ANALYZE bench_text_links, bench_encoded_links;")
+
+    results = {}
+    for name, (_, index, prepare, statement) in TABLES.items():
+        cursor.execute(prepare)
+        to_key = str if name == "text key" else codec.key
+        # warm-up, also loads the index into the shared buffers
+        measure(cursor, statement, links, to_key, 1000)
+        results[name] = measure(cursor, statement, links, to_key, args.lookups)
+        cursor.execute("SELECT pg_relation_size(%s::regclass);", (index,))
+        results[name]["index_bytes"] = cursor.fetchone()[0]
+
+    connection.close()
+
+    for name, summary in results.items():
+        print(f"{name:<40} index size {summary['index_bytes'] / 2 ** 20:>10.2f} MiB")
+    return common.finish(args, "storage", results, {"links": len(links), "lookups": args.lookups})
+
+
+if __name__ == "__main__":
+    sys.exit(main())
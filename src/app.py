@@ -1,20 +1,37 @@
 import ipaddress
 import logging
 import os
-import sys
+import time
 from typing import Optional
 from os import environ
 
-from flask import Flask, render_template, request
-from psycopg2.pool import ThreadedConnectionPool
+from flask import Flask, Response, g, render_template, request
 from dotenv import load_dotenv
 
-from create import CreateValues, insert_request, InsertContext
-from get import check_requested_link, get_request, GetContext
+from create import BulkCreateValues, CreateValues, insert_bulk_request, insert_grouped_request, insert_request, \
+    InsertContext
+from get import check_requested_link, get_cached, get_filtered, get_replicated, get_result, result_response, \
+    resolve_cached, resolve_replicated, resolve_response, resolve_result, GetContext, ResolveValues
+from codec import AlphabetCodec
 from config import load_conf
 from utils import json_response
+import bloom
+import cache
+import clicks
+import fastpath
+import generator
+import groupcommit
+import logs
+import metrics
+import pool
 import proxy
+import purge
+import ratelimit
 import recaptcha
+import replicas
+import storage
+import timing
+import warmup
 from recaptcha import RecaptchaContext, RecaptchaValues
 
 loglevel = os.environ.get("PY_LOGGING", "WARNING")
@@ -22,25 +39,30 @@ numeric_level = getattr(logging, loglevel.upper(), None)
 if not isinstance(numeric_level, int):
     raise ValueError('Invalid log level: %s' % loglevel)
 
-logging.basicConfig(
-    handlers=[
-        # logging.FileHandler("syslog.log", mode="w", encoding="utf-8"),
-        logging.StreamHandler(sys.stdout)
-    ],
-    level=numeric_level,
-    format='%(asctime)s:%(levelname)s:%(name)s@%(threadName)s:%(message)s'
-)
+# once started, the records are written to stdout by a background thread, so the logging does not block the requests
+LOG_PIPELINE = logs.init(numeric_level)
 
 logging.info("Loading dotenv")
 load_dotenv()
 
 logging.info("Trying to import postfork, detecting uWSGI")
-CONNECTION_POOL: Optional[ThreadedConnectionPool] = None
+# connections to the primary database, used for all writes (and the reads without read replicas)
+CONNECTION_POOL: Optional[pool.ManagedConnectionPool] = None
+UWSGI = False
 # parameters can be customized for uWSGI and non-uWSGI installation separately
 try:
     # on non existing import (uWSGI is not running), it fails
     from uwsgidecorators import postfork
     logging.info("uWSGI detected, applying postfork")
+    UWSGI = True
+
+    @postfork
+    def _start_log_pipeline():
+        """
+        If uWSGI server is available, starts writing the log records after the process forking,
+        as the threads do not survive the forking
+        """
+        LOG_PIPELINE.start()
 
     # https://stackoverflow.com/questions/44476678/uwsgi-lazy-apps-and-threadpool
     @postfork
@@ -50,22 +72,156 @@ try:
         after the process forking.
         This is needed due to the parallelism and shared variable memory
         """
-        global CONNECTION_POOL
-        logging.info("Opening database connection")
-        CONNECTION_POOL = ThreadedConnectionPool(1, 10, environ.get("DB_STRING"))
-        logging.debug("Database connection opened with parameters minconn=%s, maxconn=%s",
-                      CONNECTION_POOL.minconn, CONNECTION_POOL.maxconn)
+        open_storage()
+
+    @postfork
+    def _make_redirect_cache():
+        """
+        If uWSGI server is available, creates the redirect cache after the process forking.
+        Each worker gets a handle to the cache shared among the workers (or its own fallback cache)
+        with its own counters and lock
+        """
+        logging.info("Creating redirect cache")
+        app.config["REDIRECT_CACHE"] = cache.init(app.config["CACHE_CONF"])
+        app.config["INSERT_CTX"].redirect_cache = app.config["REDIRECT_CACHE"]
+
+    @postfork
+    def _warm_up_redirect_cache():
+        """
+        If uWSGI server is available, starts loading the most requested links into the redirect cache
+        after the process forking, in the background, so the worker starts serving right away
+        """
+        if app.config["CACHE_WARMER"] is not None:
+            logging.info("Starting warm-up of redirect cache")
+            app.config["CACHE_WARMER"].start(app.config["STORAGE"], app.config["REDIRECT_CACHE"])
+
+    @postfork
+    def _make_replica_set():
+        """
+        If uWSGI server is available, creates the pools of the read replicas after the process forking,
+        so the workers do not share the connections
+        """
+        logging.info("Creating read replica pools")
+        app.config["REPLICA_SET"] = replicas.init(app.config["REPLICAS_CONF"], environ.get("DB_REPLICA_STRINGS"))
+
+    @postfork
+    def _start_link_generator():
+        """
+        If uWSGI server is available, sets the worker ID of the snowflake generator after the process forking,
+        so each worker generates its own IDs
+        """
+        generator.start(app.config["INSERT_CTX"].generator)
+
+    @postfork
+    def _start_group_commit():
+        """
+        If uWSGI server is available, starts the committer of the grouped create requests after the process forking,
+        as the threads do not survive the forking
+        """
+        if app.config["GROUP_COMMIT"] is not None:
+            logging.info("Starting group commit")
+            app.config["GROUP_COMMIT"].start(app.config["STORAGE"])
+
+    @postfork
+    def _start_link_filter():
+        """
+        If uWSGI server is available, starts loading and rebuilding the link filter after the process forking,
+        the filter itself is shared by the workers, as it is created before the forking
+        """
+        if app.config["LINK_FILTER"] is not None:
+            logging.info("Starting link filter")
+            app.config["LINK_FILTER"].start(environ.get("DB_STRING"))
+
+    @postfork
+    def _start_purger():
+        """
+        If uWSGI server is available, starts the purge of the expired links after the process forking,
+        as the threads do not survive the forking
+        """
+        if app.config["PURGER"] is not None:
+            logging.info("Starting purge of expired links")
+            app.config["PURGER"].start(CONNECTION_POOL)
+
+    @postfork
+    def _start_click_counter():
+        """
+        If uWSGI server is available, starts the flushing of the click counter after the process forking,
+        as the threads do not survive the forking
+        """
+        if app.config["CLICK_COUNTER"] is not None:
+            logging.info("Starting click counter")
+            app.config["CLICK_COUNTER"].start(CONNECTION_POOL)
+
+    @postfork
+    def _start_metrics_exporter():
+        """
+        If uWSGI server is available, starts sharing the metrics of the worker after the process forking
+        """
+        if app.config["METRICS_EXPORTER"] is not None:
+            logging.info("Starting metrics exporter")
+            app.config["METRICS_EXPORTER"].start()
 except ImportError as _:
-    logging.info("uWSGI not detected, opening database connection")
-    CONNECTION_POOL = ThreadedConnectionPool(1, 10, environ.get("DB_STRING"))
-    logging.debug("Database connection opened with parameters minconn=%s, maxconn=%s",
-                  CONNECTION_POOL.minconn, CONNECTION_POOL.maxconn)
+    logging.info("uWSGI not detected, database connection is opened by main")
 
 app = Flask(__name__, template_folder="template", static_folder="static")
 app.config["SECRET_KEY"] = environ.get("SECRET_KEY")
 app.config["RECAPTCHA_SECRET_KEY"] = environ.get("RECAPTCHA_SECRET_KEY")
 
 
+def open_storage() -> None:
+    """
+    Opens the connection pool of the primary database, if the links are stored in Postgres.
+    The other storages open their connections on the first use
+
+    Contains FEATURE SWITCH
+    :return: None
+    """
+    global CONNECTION_POOL
+    # FEATURE SWITCH
+    if not isinstance(app.config["STORAGE"], storage.PostgresStorage):
+        return
+
+    logging.info("Opening database connection")
+    # the purge, the click counter and the cache warm-up hold one connection each, outside the request connections
+    background = sum(app.config[name] is not None for name in ("PURGER", "CLICK_COUNTER", "CACHE_WARMER"))
+    CONNECTION_POOL = pool.init(app.config["POOL_CONF"], environ.get("DB_STRING"), background)
+    app.config["STORAGE"].start(CONNECTION_POOL)
+
+
+@app.before_request
+def start_timer():
+    """
+    Stores the start time of the request for the latency metrics and the Server-Timing header,
+    starts profiling the request if sampled
+    """
+    g.start = time.perf_counter()
+    timing.begin(app.config["PROFILER"])
+
+
+@app.after_request
+def record_request(response):
+    """
+    Records the latency and the status code of the request into the metrics and the Server-Timing header
+    :param response: flask.Response
+    :return: flask.Response
+    """
+    route = request.endpoint or "none"
+    elapsed = time.perf_counter() - g.start
+    metrics.REQUEST_LATENCY.observe(elapsed, route)
+    metrics.REQUESTS.inc(route, response.status_code)
+    timing.finish(response, elapsed)
+
+    return response
+
+
+@app.teardown_request
+def stop_profiler(_):
+    """
+    Stops profiling the request, even if it failed
+    """
+    timing.teardown(app.config["PROFILER"])
+
+
 @app.errorhandler(404)
 def not_found(e):
     """
@@ -78,6 +234,31 @@ def not_found(e):
     return render_template("404.html"), 404
 
 
+@app.errorhandler(pool.PoolBusy)
+def pool_busy(e):
+    """
+    Returns service-unavailable flask response when no database connection became free in time,
+    the client is told when to retry instead of waiting in the queue
+
+    Inbuilt function which takes error as parameter
+    :param e: Error
+    :return: flask.Response
+    """
+    logging.warning("Request refused, %s", e)
+    return busy_response()
+
+
+def busy_response() -> Response:
+    """
+    Returns the response to the request refused by the busy connection pool
+    :return: flask.Response
+    """
+    response = json_response({"error": "Service is busy, try again later"}, 503)
+    response.headers["Retry-After"] = str(app.config["POOL_CONF"].retry_after)
+
+    return response
+
+
 @app.route("/", methods=["GET"])
 def index():
     """
@@ -97,12 +278,18 @@ def create():
     :return: flask.Response
     """
     logging.info("Opening new create request")
+    rate_limit_response = ratelimit.check(app.config["RATE_LIMITER"], request.remote_addr)
+    if rate_limit_response is not None:
+        return rate_limit_response
+
     if not request.is_json:
         logging.info("Non-JSON request")
         return json_response({"error": "Request is not in the correct format"}, 400)
 
-    body: dict = request.json
-    create_values = CreateValues(body, app.config["INSERT_CTX"])
+    with timing.span("parse"):
+        body: dict = request.json
+    with timing.span("validate"):
+        create_values = CreateValues(body, app.config["INSERT_CTX"])
     if not create_values:
         logging.debug("Request with incorrect values")
         return create_values.response
@@ -112,26 +299,169 @@ def create():
         return recaptcha_values.response
 
     request_ip_str = request.remote_addr
-    recaptcha_response = recaptcha.verify(recaptcha_values, app.config["RECAPTCHA_CTX"],
-                                          app.config["RECAPTCHA_SECRET_KEY"], request_ip_str)
+    with timing.span("recaptcha"):
+        recaptcha_response = recaptcha.verify(recaptcha_values, app.config["RECAPTCHA_CTX"],
+                                              app.config["RECAPTCHA_SECRET_KEY"], request_ip_str)
     if recaptcha_response is not None:
         return recaptcha_response
 
     request_ip = ipaddress.ip_address(request_ip_str)
 
-    logging.debug("Requesting connection from connection pool")
-    connection = CONNECTION_POOL.getconn()
-    logging.debug("Opening the cursor")
-    cursor = connection.cursor()
+    # FEATURE SWITCH
+    if app.config["GROUP_COMMIT"] is not None and app.config["GROUP_COMMIT"].accepts(create_values):
+        return insert_grouped_request(create_values, int(request_ip), app.config["INSERT_CTX"],
+                                      app.config["GROUP_COMMIT"])
 
-    response = insert_request(connection, cursor, create_values, int(request_ip), app.config["INSERT_CTX"])
+    # the creations are refused first when the connection pool is busy, so the redirects are served
+    with app.config["STORAGE"].session(sheddable=True) as session:
+        return insert_request(session, create_values, int(request_ip), app.config["INSERT_CTX"])
 
-    cursor.close()
-    logging.debug("Cursor closed")
-    CONNECTION_POOL.putconn(connection)
-    logging.debug("Connection put to connection pool")
 
-    return response
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """
+    Route for the metrics of the service in the Prometheus text format
+
+    Contains FEATURE SWITCH
+    :return: flask.Response
+    """
+    # FEATURE SWITCH
+    if app.config["METRICS_EXPORTER"] is None:
+        return render_template("404.html"), 404
+
+    return Response(app.config["METRICS_EXPORTER"].collect(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/profile", methods=["POST"])
+def profile():
+    """
+    Route switching the profiler of all workers, protected by the admin password
+
+    Contains FEATURE SWITCH
+    :return: flask.Response
+    """
+    # FEATURE SWITCH
+    if app.config["PROFILER"] is None:
+        return render_template("404.html"), 404
+
+    body = request.get_json(silent=True)
+    admin_response = timing.check_admin(body)
+    if admin_response is not None:
+        return admin_response
+
+    rate = body.get("rate")
+    if not isinstance(rate, (int, float)) or isinstance(rate, bool) or not 0 <= rate <= 1:
+        return json_response({"error": "Rate must be a number between 0 and 1"}, 400)
+
+    session = app.config["PROFILER"].switch(float(rate))
+    return json_response({"rate": rate, "session": session}, 200)
+
+
+@app.route("/profile/stats", methods=["POST"])
+def profile_stats():
+    """
+    Route returning the merged profiles of all workers, protected by the admin password
+
+    Contains FEATURE SWITCH
+    :return: flask.Response
+    """
+    # FEATURE SWITCH
+    if app.config["PROFILER"] is None:
+        return render_template("404.html"), 404
+
+    body = request.get_json(silent=True)
+    admin_response = timing.check_admin(body)
+    if admin_response is not None:
+        return admin_response
+
+    sort = body.get("sort", "cumulative")
+    limit = body.get("limit", 30)
+    if sort not in timing.SORT_KEYS or not isinstance(limit, int) or isinstance(limit, bool) or limit < 1:
+        return json_response({"error": f"Sort must be one of {', '.join(timing.SORT_KEYS)} "
+                                       f"and limit a positive number"}, 400)
+
+    return Response(app.config["PROFILER"].stats(sort, limit), mimetype="text/plain")
+
+
+@app.route("/bulk", methods=["POST"])
+def create_bulk():
+    """
+    Route for creation of multiple links in one request
+    :return: flask.Response
+    """
+    logging.info("Opening new bulk create request")
+    rate_limit_response = ratelimit.check(app.config["RATE_LIMITER"], request.remote_addr)
+    if rate_limit_response is not None:
+        return rate_limit_response
+
+    if not request.is_json:
+        logging.info("Non-JSON request")
+        return json_response({"error": "Request is not in the correct format"}, 400)
+
+    with timing.span("parse"):
+        body = request.json
+    if not isinstance(body, dict):
+        logging.info("Non-object JSON request")
+        return json_response({"error": "Request is not in the correct format"}, 400)
+
+    with timing.span("validate"):
+        bulk_values = BulkCreateValues(body, app.config["INSERT_CTX"])
+    if not bulk_values:
+        logging.debug("Request with incorrect values")
+        return bulk_values.response
+
+    recaptcha_values = RecaptchaValues(body, app.config["RECAPTCHA_CTX"])
+    if not recaptcha_values:
+        return recaptcha_values.response
+
+    request_ip_str = request.remote_addr
+    with timing.span("recaptcha"):
+        recaptcha_response = recaptcha.verify(recaptcha_values, app.config["RECAPTCHA_CTX"],
+                                              app.config["RECAPTCHA_SECRET_KEY"], request_ip_str)
+    if recaptcha_response is not None:
+        return recaptcha_response
+
+    request_ip = ipaddress.ip_address(request_ip_str)
+
+    with app.config["STORAGE"].session(sheddable=True) as session:
+        return insert_bulk_request(session, bulk_values, int(request_ip), app.config["INSERT_CTX"])
+
+
+@app.route("/resolve", methods=["POST"])
+def resolve():
+    """
+    Route for resolving multiple links in one request, without redirecting.
+    The links not found in the redirect cache are looked up by one database query
+    :return: flask.Response
+    """
+    logging.info("Opening new resolve request")
+    if not request.is_json:
+        logging.info("Non-JSON request")
+        return json_response({"error": "Request is not in the correct format"}, 400)
+
+    with timing.span("parse"):
+        body = request.json
+    if not isinstance(body, dict):
+        logging.info("Non-object JSON request")
+        return json_response({"error": "Request is not in the correct format"}, 400)
+
+    resolve_values = ResolveValues(body, app.config["GET_CTX"])
+    if not resolve_values:
+        logging.debug("Request with incorrect values")
+        return resolve_values.response
+
+    with timing.span("cache"):
+        results, missing = resolve_cached(resolve_values.links, app.config["GET_CTX"], app.config["REDIRECT_CACHE"],
+                                          app.config["LINK_FILTER"])
+    with timing.span("replica"):
+        replicated, missing = resolve_replicated(missing, app.config["GET_CTX"].codec, app.config["REPLICA_SET"],
+                                                 app.config["REDIRECT_CACHE"])
+    results.update(replicated)
+    if missing:
+        with app.config["STORAGE"].session() as session:
+            results.update(resolve_result(session, missing, app.config["REDIRECT_CACHE"]))
+
+    return resolve_response(resolve_values.links, results)
 
 
 @app.route("/<redirect_url>/", methods=["GET"])
@@ -147,19 +477,47 @@ def redirect(redirect_url: str):
     if resp is not None:
         return resp
 
-    logging.debug("Requesting connection from connection pool")
-    connection = CONNECTION_POOL.getconn()
-    logging.debug("Opening the cursor")
-    cursor = connection.cursor()
+    return result_response(lookup_redirect(redirect_url))
 
-    response = get_request(cursor, redirect_url)
 
-    cursor.close()
-    logging.debug("Cursor closed")
-    CONNECTION_POOL.putconn(connection)
-    logging.debug("Connection put to connection pool")
+def lookup_redirect(redirect_url: str) -> Optional[tuple]:
+    """
+    Looks up the link in the redirect cache, the link filter, the read replicas and the storage, in this order,
+    and counts the click. Used by the redirect route and by the redirect fast path (see fastpath.py)
+    :param redirect_url: requested link, checked against the alphabet
+    :return: (url, redirect) tuple or None or an empty tuple if the link does not exist
+    """
+    with timing.span("cache"):
+        result = get_cached(redirect_url, app.config["REDIRECT_CACHE"])
+    if result is None:
+        with timing.span("filter"):
+            result = get_filtered(redirect_url, app.config["LINK_FILTER"])
+    if result is None:
+        with timing.span("replica"):
+            result = get_replicated(redirect_url, app.config["GET_CTX"].codec, app.config["REPLICA_SET"],
+                                    app.config["REDIRECT_CACHE"])
+    if result is None:
+        with app.config["STORAGE"].session() as session:
+            result = get_result(session, redirect_url, app.config["REDIRECT_CACHE"])
+
+    # FEATURE SWITCH
+    if result and app.config["CLICK_COUNTER"] is not None:
+        app.config["CLICK_COUNTER"].increment(redirect_url)
+
+    return result
+
+
+def cache_operations() -> dict:
+    """
+    Returns the counters of the redirect cache of the worker for the metrics
+    :return: dictionary of (result,) -> number of operations
+    """
+    redirect_cache = app.config.get("REDIRECT_CACHE")
+    if redirect_cache is None:
+        return {}
 
-    return response
+    stats = redirect_cache.stats()
+    return {("hit",): stats["hits"], ("miss",): stats["misses"], ("eviction",): stats.get("evictions", 0)}
 
 
 def main():
@@ -168,21 +526,67 @@ def main():
     """
     logging.info("Loading config")
     conf = load_conf("config.toml")
+    # FEATURE SWITCH
+    if conf.Storage.backend != "postgres":
+        storage.check_features(conf)
+    logs.configure(conf.Logging)
     proxy.init(app, conf.Proxy)
 
     allowed_alphabet = conf.Utils.link_alphabet.union(conf.Utils.extensions_alphabet)
-    app.config["INSERT_CTX"] = InsertContext(conf.Utils.link_alphabet, list(conf.Utils.link_alphabet), allowed_alphabet,
+    # sorted, so the links generated from the sequence are the same in every process
+    link_alphabet_l = sorted(conf.Utils.link_alphabet)
+    link_generator = generator.init(conf.Utils, link_alphabet_l, environ.get("LINK_SECRET", app.config["SECRET_KEY"]),
+                                    environ.get("NODE_ID"))
+    codec = AlphabetCodec(link_alphabet_l, conf.Utils.link_length)
+    app.config["STORAGE"] = storage.init(conf.Storage, codec)
+    app.config["LINK_FILTER"] = bloom.init(conf.Bloom, codec)
+    app.config["INSERT_CTX"] = InsertContext(conf.Utils.link_alphabet, link_alphabet_l, allowed_alphabet,
                                              conf.Utils.link_length, conf.Utils.destination_length,
-                                             conf.Utils.creation_tries)
-    app.config["GET_CTX"] = GetContext(allowed_alphabet)
+                                             conf.Utils.creation_tries, link_generator, conf.Utils.bulk_limit,
+                                             conf.Utils.deduplicate, codec, app.config["LINK_FILTER"])
+    app.config["GROUP_COMMIT"] = groupcommit.init(conf.GroupCommit, conf.Pool.wait_timeout, app.config["INSERT_CTX"])
+    app.config["GET_CTX"] = GetContext(allowed_alphabet, codec, conf.Utils.bulk_limit)
+    app.config["RATE_LIMITER"] = ratelimit.init(conf.RateLimit)
     app.config["RECAPTCHA_CTX"] = RecaptchaContext(conf.Recaptcha.enabled, conf.Recaptcha.minimal_score,
                                                    conf.Recaptcha.verify_ip, conf.Recaptcha.site_key)
+    app.config["CACHE_CONF"] = conf.Cache
+    app.config["REDIRECT_CACHE"] = cache.init(conf.Cache)
+    # the created links are removed from the cache, so they are not cached as not found
+    app.config["INSERT_CTX"].redirect_cache = app.config["REDIRECT_CACHE"]
+    app.config["CACHE_WARMER"] = warmup.init(conf.Cache)
+    app.config["CLICK_COUNTER"] = clicks.init(conf.Clicks)
+    # the other storages replace the expired links on insert instead
+    app.config["PURGER"] = purge.init(conf.Purge, codec) if conf.Storage.backend == "postgres" else None
+    app.config["METRICS_EXPORTER"] = metrics.init(conf.Metrics, UWSGI)
+    app.config["PROFILER"] = timing.init(conf.Timing)
+    app.config["POOL_CONF"] = conf.Pool
+    app.config["REPLICAS_CONF"] = conf.Replicas
+    app.config["REPLICA_SET"] = replicas.init(conf.Replicas, environ.get("DB_REPLICA_STRINGS"))
+    # installed in front of ProxyFix, the redirects do not use the client address
+    fastpath.init(app, conf.FastPath, lookup_redirect, busy_response())
+    metrics.CACHE_OPERATIONS.set_function(cache_operations)
+    # with uWSGI, the worker resources are started by the postfork hooks
+    if not UWSGI:
+        LOG_PIPELINE.start()
+        open_storage()
+        generator.start(link_generator)
+    if not UWSGI and app.config["GROUP_COMMIT"] is not None:
+        app.config["GROUP_COMMIT"].start(app.config["STORAGE"])
+    if not UWSGI and app.config["CACHE_WARMER"] is not None:
+        app.config["CACHE_WARMER"].start(app.config["STORAGE"], app.config["REDIRECT_CACHE"])
+    if not UWSGI and app.config["CLICK_COUNTER"] is not None:
+        app.config["CLICK_COUNTER"].start(CONNECTION_POOL)
+    if not UWSGI and app.config["LINK_FILTER"] is not None:
+        app.config["LINK_FILTER"].start(environ.get("DB_STRING"))
+    if not UWSGI and app.config["PURGER"] is not None:
+        app.config["PURGER"].start(CONNECTION_POOL)
     logging.debug(
         "Using link_alphabet=%s, allowed alphabet=%s, link length=%s, destination length=%s, creation tries=%s, "
-        "recaptcha enabled=%s, recaptcha minimal score=%s, recaptcha verify IP=%s, recaptcha site key=%s",
+        "generation=%s, deduplicate=%s, storage backend=%s, recaptcha enabled=%s, recaptcha minimal score=%s, "
+        "recaptcha verify IP=%s, recaptcha site key=%s",
         conf.Utils.link_alphabet, allowed_alphabet, conf.Utils.link_length, conf.Utils.destination_length,
-        conf.Utils.creation_tries, conf.Recaptcha.enabled, conf.Recaptcha.minimal_score, conf.Recaptcha.verify_ip,
-        conf.Recaptcha.site_key)
+        conf.Utils.creation_tries, conf.Utils.generation, conf.Utils.deduplicate, conf.Storage.backend,
+        conf.Recaptcha.enabled, conf.Recaptcha.minimal_score, conf.Recaptcha.verify_ip, conf.Recaptcha.site_key)
 
 
 if __name__ == "__main__":
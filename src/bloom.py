@@ -0,0 +1,248 @@
+import hashlib
+import logging
+import math
+import mmap
+import multiprocessing
+import os
+import struct
+import threading
+import time
+from typing import Optional
+
+import psycopg2
+
+import metrics
+from codec import AlphabetCodec
+from config import Bloom
+
+# index of the active bit array, 1 if the filter was loaded, PID of the worker rebuilding the filter (0 if none),
+# time of the last rebuild (time.time())
+HEADER = struct.Struct("<BB2xId")
+# number of links read from the database and added to the filter at once
+SCAN_BATCH = 10000
+# number of seconds between the tries to load the filter when the load failed
+RETRY_INTERVAL = 10
+
+
+def positions(link: str, size_bits: int, hashes: int) -> list[int]:
+    """
+    Computes the bit positions of the link in the filter, using double hashing of one blake2b digest
+    :param link: link to be hashed
+    :param size_bits: number of bits of the filter
+    :param hashes: number of positions
+    :return: list of bit positions
+    """
+    digest = hashlib.blake2b(link.encode(), digest_size=16).digest()
+    first = int.from_bytes(digest[:8], "little")
+    second = int.from_bytes(digest[8:], "little") | 1
+
+    return [(first + number * second) % size_bits for number in range(hashes)]
+
+
+class LinkFilter:
+    """
+    Bloom filter of all existing links (of both links tables), shared by the workers of the node
+
+    Tells if the link surely does not exist, so the redirects of the non-existing links do not reach the database.
+    The filter is kept in the shared memory created before the forking as two bit arrays:
+    the active one answers the lookups, the other one is rebuilt from the database periodically,
+    so the deleted links are dropped. The created links are added to both of them.
+    The filter knows only the links created by this node, so its misses are trusted for max_age seconds
+    after the rebuild, afterwards the links missing in it are looked up in the database until the next rebuild
+    """
+    def __init__(self, memory: int, false_positive_rate: float, rebuild_interval: int, max_age: int,
+                 codec: AlphabetCodec):
+        self.size_bytes = memory * 2 ** 20
+        self.size_bits = self.size_bytes * 8
+        self.hashes = max(1, round(-math.log2(false_positive_rate)))
+        # number of links the filter holds with the false positive rate
+        self.capacity = int(self.size_bits * math.log(2) ** 2 / -math.log(false_positive_rate))
+        self.rebuild_interval = rebuild_interval
+        self.max_age = max_age
+        self.codec = codec
+        self.dsn = None
+        self._memory = mmap.mmap(-1, HEADER.size + 2 * self.size_bytes)
+        # created before the forking, so it is shared by the workers
+        self._lock = multiprocessing.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _offset(self, index: int) -> int:
+        return HEADER.size + index * self.size_bytes
+
+    def _set(self, index: int, link_positions: list[int]) -> None:
+        offset = self._offset(index)
+        for position in link_positions:
+            self._memory[offset + (position >> 3)] |= 1 << (position & 7)
+
+    def ready(self) -> bool:
+        """
+        Checks if the filter was loaded from the database
+        :return: True if the filter can be used
+        """
+        return HEADER.unpack_from(self._memory, 0)[1] == 1
+
+    def trusted(self) -> bool:
+        """
+        Checks if the filter was loaded and rebuilt less than max_age seconds ago,
+        so the links created by the other nodes or imported since the rebuild are not missed for longer
+        :return: True if the links missing in the filter surely do not exist
+        """
+        _, loaded, _, rebuilt_at = HEADER.unpack_from(self._memory, 0)
+        return loaded == 1 and (self.max_age == 0 or time.time() - rebuilt_at < self.max_age)
+
+    def might_contain(self, link: str) -> bool:
+        """
+        Checks the link against the active bit array
+        :param link: requested link
+        :return: False if the link surely does not exist, True if it may exist
+        """
+        offset = self._offset(self._memory[0])
+        for position in positions(link, self.size_bits, self.hashes):
+            if not self._memory[offset + (position >> 3)] & (1 << (position & 7)):
+                return False
+
+        return True
+
+    def add(self, link: str) -> None:
+        """
+        Adds the link to both bit arrays, must be called after the link is committed,
+        so the link is either found by the rebuild or added after it started
+        :param link: created link
+        :return: None
+        """
+        link_positions = positions(link, self.size_bits, self.hashes)
+        with self._lock:
+            self._set(0, link_positions)
+            self._set(1, link_positions)
+
+    def _claim(self) -> Optional[int]:
+        """
+        Marks this worker as the one rebuilding the filter, unless another running worker does it
+        or the filter was rebuilt less than rebuild_interval seconds ago
+        :return: index of the bit array to be rebuilt or None if the rebuild is not needed
+        """
+        with self._lock:
+            active, loaded, pid, rebuilt_at = HEADER.unpack_from(self._memory, 0)
+            if pid != 0 and metrics.pid_alive(pid):
+                return None
+            if loaded and time.time() - rebuilt_at < self.rebuild_interval:
+                return None
+
+            HEADER.pack_into(self._memory, 0, active, loaded, os.getpid(), rebuilt_at)
+            offset = self._offset(1 - active)
+            self._memory[offset:offset + self.size_bytes] = bytes(self.size_bytes)
+
+        return 1 - active
+
+    def _release(self, index: Optional[int], started: float = 0) -> None:
+        """
+        Makes the rebuilt bit array active and lets the other workers rebuild the filter again
+        :param index: index of the rebuilt bit array or None if the rebuild failed
+        :param started: time the rebuild started reading the links (time.time()), the filter is as old as the scan
+        :return: None
+        """
+        with self._lock:
+            active, loaded, _, rebuilt_at = HEADER.unpack_from(self._memory, 0)
+            if index is None:
+                HEADER.pack_into(self._memory, 0, active, loaded, 0, rebuilt_at)
+            else:
+                HEADER.pack_into(self._memory, 0, index, 1, 0, started)
+
+    def rebuild(self) -> bool:
+        """
+        Rebuilds the inactive bit array from all links in the database, streaming them by a server-side cursor,
+        and makes it active. The primary database is used, as the replicas can miss the newest links,
+        by a dedicated connection, so the long scan does not hold a connection of the pool
+        :return: True if the filter was rebuilt by this worker
+        """
+        index = self._claim()
+        if index is None:
+            return False
+
+        logging.info("Rebuilding link filter")
+        start = time.perf_counter()
+        started = time.time()
+        count = 0
+        connection = None
+        try:
+            connection = psycopg2.connect(self.dsn)
+            cursor = connection.cursor(name="link_filter")
+            cursor.itersize = SCAN_BATCH
+            cursor.execute("SELECT link, NULL::bigint FROM links UNION ALL SELECT NULL, id FROM encoded_links;")
+            while rows := cursor.fetchmany(SCAN_BATCH):
+                batch = [positions(link if link is not None else self.codec.encode(link_id),
+                                   self.size_bits, self.hashes) for link, link_id in rows]
+                with self._lock:
+                    for link_positions in batch:
+                        self._set(index, link_positions)
+                count += len(rows)
+            cursor.close()
+            connection.rollback()
+        except psycopg2.Error as exc:
+            logging.error("Rebuilding link filter unsuccessful, error=%s", exc)
+            self._release(None)
+            return False
+        finally:
+            if connection is not None:
+                connection.close()
+
+        self._release(index, started)
+        logging.info("Link filter rebuilt with %s links in %.2f s", count, time.perf_counter() - start)
+        if count > self.capacity:
+            logging.warning("Link filter holds %s links, more than its capacity of %s links, "
+                            "the false positive rate is higher than configured", count, self.capacity)
+
+        return True
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self.rebuild()
+            self._stopped.wait(self.rebuild_interval if self.ready() else RETRY_INTERVAL)
+
+    def start(self, dsn: Optional[str]) -> None:
+        """
+        Starts the background thread loading the filter and rebuilding it every rebuild_interval seconds,
+        only one worker of the node rebuilds the filter at once.
+        Must be called after the process forking
+        :param dsn: connection string of the primary database, connected only for the rebuild
+        :return: None
+        """
+        self.dsn = dsn
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="link-filter", daemon=True)
+        self._thread.start()
+
+
+def init(config: Bloom, codec: AlphabetCodec) -> Optional[LinkFilter]:
+    """
+    Creates the link filter if enabled based on a given config.
+    Must be called before the process forking, so the filter is shared by the workers
+
+    Contains FEATURE SWITCH
+    :param config: Bloom object of a configuration containing information
+    :param codec: AlphabetCodec object converting the numbers of the encoded links back to the links
+    :return: LinkFilter object or None if the filter is disabled
+    """
+    logging.debug("Going to initialize link filter, state %s", config.enabled)
+    # FEATURE SWITCH
+    if not config.enabled:
+        return None
+
+    try:
+        # on non existing import (uWSGI is not running), it fails
+        import uwsgi
+    except ImportError as _:
+        pass
+    else:
+        if uwsgi.opt.get("lazy-apps") or uwsgi.opt.get("lazy"):
+            logging.warning("Link filter cannot be shared by the workers loading the application after the forking "
+                            "(lazy-apps), the filter is disabled")
+            return None
+
+    link_filter = LinkFilter(config.memory, config.false_positive_rate, config.rebuild_interval, config.max_age,
+                             codec)
+    logging.debug("Link filter initialized with values memory=%s MiB, false_positive_rate=%s, hashes=%s, "
+                  "capacity=%s, rebuild_interval=%s, max_age=%s", config.memory, config.false_positive_rate,
+                  link_filter.hashes, link_filter.capacity, config.rebuild_interval, config.max_age)
+    return link_filter
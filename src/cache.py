@@ -0,0 +1,264 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Union
+
+from config import Cache
+
+NOT_FOUND = ()
+NOT_FOUND_VALUE = b"0"
+
+
+class RedirectCache:
+    """
+    Bounded in-process cache of the redirect lookups with LRU eviction and TTL expiry
+
+    Stores (url, redirect) tuple for the found links and an empty tuple (NOT_FOUND)
+    for the links which are not in the database
+    """
+    def __init__(self, size: int, ttl: int, negative_ttl: int):
+        self.size = size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, tuple[float, tuple]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, link: str) -> Optional[tuple]:
+        """
+        Retrieves the cached result of the link lookup
+        :param link: requested link
+        :return: None if the link is not cached or its entry expired,
+            otherwise (url, redirect) tuple or NOT_FOUND
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(link)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, result = entry
+            if expires_at <= now:
+                del self._entries[link]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(link)
+            self.hits += 1
+            return result
+
+    def put(self, link: str, result: Optional[tuple], ttl: Optional[float] = None) -> None:
+        """
+        Stores the result of the link lookup, evicting the least recently used entries if the cache is full
+        :param link: requested link
+        :param result: (url, redirect) tuple or None (empty tuple) if the link was not found
+        :param ttl: number of seconds until the expiry of the found link, None if it never expires
+        :return: None
+        """
+        if not result:
+            if self.negative_ttl == 0:
+                return
+            expires_at = time.monotonic() + self.negative_ttl
+            result = NOT_FOUND
+        else:
+            expires_at = time.monotonic() + (self.ttl if ttl is None else min(self.ttl, ttl))
+            result = tuple(result)
+
+        with self._lock:
+            self._entries[link] = (expires_at, result)
+            self._entries.move_to_end(link)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, link: str) -> None:
+        """
+        Removes the link from the cache
+        :param link: link to be removed
+        :return: None
+        """
+        with self._lock:
+            self._entries.pop(link, None)
+
+    def hottest(self, count: int) -> list[str]:
+        """
+        Returns the most recently used links which were found and did not expire
+        :param count: maximal number of returned links
+        :return: list of links, the most recently used first
+        """
+        now = time.monotonic()
+        links = []
+        with self._lock:
+            for link in reversed(self._entries):
+                if len(links) == count:
+                    break
+                expires_at, result = self._entries[link]
+                if result and expires_at > now:
+                    links.append(link)
+
+        return links
+
+    def stats(self) -> dict:
+        """
+        Returns counters of the cache usage
+        :return: dictionary with the number of hits, misses, evictions and the current size
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "size": len(self._entries), "max_size": self.size}
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SharedRedirectCache:
+    """
+    Cache of the redirect lookups stored in the uWSGI cache, shared among all workers of the node
+
+    LRU eviction is done by uWSGI (purge_lru option), entries are stored as
+    the status code followed by the url, or NOT_FOUND_VALUE for the links which are not in the database.
+    Counters are kept per worker
+    """
+    def __init__(self, uwsgi, name: str, ttl: int, negative_ttl: int):
+        self.uwsgi = uwsgi
+        self.name = name
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, link: str) -> Optional[tuple]:
+        """
+        Retrieves the cached result of the link lookup
+        :param link: requested link
+        :return: None if the link is not cached or its entry expired,
+            otherwise (url, redirect) tuple or NOT_FOUND
+        """
+        value = self.uwsgi.cache_get(link, self.name)
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        if value == NOT_FOUND_VALUE:
+            return NOT_FOUND
+
+        return value[3:].decode(), int(value[:3])
+
+    def put(self, link: str, result: Optional[tuple], ttl: Optional[float] = None) -> None:
+        """
+        Stores the result of the link lookup to the shared cache
+        :param link: requested link
+        :param result: (url, redirect) tuple or None (empty tuple) if the link was not found
+        :param ttl: number of seconds until the expiry of the found link, None if it never expires
+        :return: None
+        """
+        if not result:
+            if self.negative_ttl == 0:
+                return
+            self.uwsgi.cache_update(link, NOT_FOUND_VALUE, self.negative_ttl, self.name)
+            return
+
+        # uWSGI cache expires the entries in whole seconds
+        ttl = self.ttl if ttl is None else min(self.ttl, int(ttl))
+        if ttl < 1:
+            return
+
+        url, redirect = result
+        if not self.uwsgi.cache_update(link, f"{redirect}{url}".encode(), ttl, self.name):
+            logging.debug("Link cannot be stored in the shared cache, link=%s", link)
+
+    def invalidate(self, link: str) -> None:
+        """
+        Removes the link from the shared cache
+        :param link: link to be removed
+        :return: None
+        """
+        self.uwsgi.cache_del(link, self.name)
+
+    def hottest(self, count: int) -> list[str]:
+        """
+        Returns the links which were found and did not expire, as listed by the uWSGI cache,
+        which does not keep the order of their use
+        :param count: maximal number of returned links
+        :return: list of links
+        """
+        links = []
+        for key in self.uwsgi.cache_keys(self.name):
+            if len(links) == count:
+                break
+            value = self.uwsgi.cache_get(key, self.name)
+            if value is not None and value != NOT_FOUND_VALUE:
+                links.append(key.decode() if isinstance(key, bytes) else key)
+
+        return links
+
+    def stats(self) -> dict:
+        """
+        Returns counters of the cache usage of this worker
+        :return: dictionary with the number of hits and misses
+        """
+        return {"hits": self.hits, "misses": self.misses}
+
+
+AnyRedirectCache = Union[RedirectCache, SharedRedirectCache]
+
+
+def shared_cache_configured(uwsgi, name: str) -> bool:
+    """
+    Checks if the uWSGI cache with the given name is configured in the uWSGI options
+    :param uwsgi: uwsgi module
+    :param name: name of the uWSGI cache
+    :return: True if the cache exists, otherwise False
+    """
+    options = uwsgi.opt.get("cache2", [])
+    if not isinstance(options, list):
+        options = [options]
+
+    for option in options:
+        if isinstance(option, bytes):
+            option = option.decode()
+        if f"name={name}" in option.split(","):
+            return True
+
+    return False
+
+
+def init(config: Cache) -> Optional[AnyRedirectCache]:
+    """
+    Creates the redirect cache if enabled based on a given config.
+    When shared cache is requested and uWSGI is running with the cache configured,
+    the shared cache is used, otherwise the process-local cache is created.
+
+    Contains FEATURE SWITCH
+    :param config: Cache object of a configuration containing information
+    :return: RedirectCache or SharedRedirectCache object or None if the cache is disabled
+    """
+    logging.debug("Going to initialize redirect cache, state %s", config.enabled)
+    # FEATURE SWITCH
+    if not config.enabled:
+        return None
+
+    if config.shared:
+        try:
+            # on non existing import (uWSGI is not running), it fails
+            import uwsgi
+        except ImportError as _:
+            logging.info("uWSGI not detected, using process-local redirect cache")
+        else:
+            if shared_cache_configured(uwsgi, config.shared_name):
+                logging.debug("Redirect cache initialized with values shared_name=%s, ttl=%s, negative_ttl=%s",
+                              config.shared_name, config.ttl, config.negative_ttl)
+                return SharedRedirectCache(uwsgi, config.shared_name, config.ttl, config.negative_ttl)
+
+            logging.warning("uWSGI cache '%s' is not configured, using process-local redirect cache",
+                            config.shared_name)
+
+    redirect_cache = RedirectCache(config.size, config.ttl, config.negative_ttl)
+    logging.debug("Redirect cache initialized with values size=%s, ttl=%s, negative_ttl=%s",
+                  config.size, config.ttl, config.negative_ttl)
+    return redirect_cache
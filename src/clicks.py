@@ -0,0 +1,158 @@
+import atexit
+import logging
+import threading
+from typing import Optional
+
+import psycopg2
+
+from config import Clicks
+
+
+class ClickCounter:
+    """
+    Per-worker buffer of the redirect counts, flushed to the database by a background thread
+
+    Redirects only increment the in-memory counter, the accumulated deltas are written
+    in one batched upsert every flush_interval seconds or after flush_hits redirects
+    """
+    def __init__(self, flush_interval: int, flush_hits: int):
+        self.flush_interval = flush_interval
+        self.flush_hits = flush_hits
+        self.pool = None
+        self._counts: dict[str, int] = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def increment(self, link: str) -> None:
+        """
+        Counts one redirect of the link
+        :param link: redirected link
+        :return: None
+        """
+        with self._lock:
+            self._counts[link] = self._counts.get(link, 0) + 1
+            self._pending += 1
+            if self._pending >= self.flush_hits:
+                self._wake.set()
+
+    def take(self) -> dict:
+        """
+        Takes all accumulated counts, leaving the counter empty
+        :return: dictionary of link -> number of redirects
+        """
+        with self._lock:
+            counts, self._counts = self._counts, {}
+            self._pending = 0
+
+        return counts
+
+    def restore(self, counts: dict) -> None:
+        """
+        Returns the counts which were not written back to the counter
+        :param counts: dictionary of link -> number of redirects
+        :return: None
+        """
+        with self._lock:
+            for link, hits in counts.items():
+                self._counts[link] = self._counts.get(link, 0) + hits
+                self._pending += hits
+
+    def flush(self) -> None:
+        """
+        Writes the accumulated counts to the database in one upsert,
+        on failure the counts are kept for the next flush.
+        Only the found links are counted, so they are not checked against the links tables again
+        :return: None
+        """
+        counts = self.take()
+        if not counts or self.pool is None:
+            self.restore(counts)
+            return
+
+        logging.debug("Flushing hits of %s links", len(counts))
+        try:
+            # the busy pool (pool.PoolBusy) is an error as well, the counts are kept
+            with self.pool.connection(background=True) as connection:
+                cursor = connection.cursor()
+                cursor.execute(
+                    "INSERT INTO link_hits (link, hits) "
+                    "SELECT new_hits.link, new_hits.hits "
+                    "FROM unnest(%(links)s::varchar[], %(hits)s::bigint[]) AS new_hits(link, hits) "
+                    "ON CONFLICT (link) DO UPDATE SET hits = link_hits.hits + EXCLUDED.hits, updated_at = NOW();",
+                    {"links": list(counts.keys()), "hits": list(counts.values())}
+                )
+                cursor.close()
+                connection.commit()
+        except psycopg2.Error as exc:
+            logging.error("Flushing hits unsuccessful, error=%s", exc)
+            self.restore(counts)
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def start(self, pool) -> None:
+        """
+        Starts the background flushing thread and registers the final flush on the worker shutdown.
+        Must be called after the process forking
+        :param pool: connection pool used for flushing (pool.ManagedConnectionPool)
+        :return: None
+        """
+        self.pool = pool
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="click-counter", daemon=True)
+        self._thread.start()
+
+        atexit.register(self.stop)
+        try:
+            # on non existing import (uWSGI is not running), it fails
+            import uwsgi
+        except ImportError as _:
+            return
+
+        previous_atexit = getattr(uwsgi, "atexit", None)
+
+        def _atexit():
+            self.stop()
+            if previous_atexit is not None:
+                previous_atexit()
+
+        uwsgi.atexit = _atexit
+
+    def stop(self) -> None:
+        """
+        Stops the background flushing thread and flushes the remaining counts
+        :return: None
+        """
+        if self._thread is None:
+            return
+
+        logging.info("Stopping click counter")
+        self._stopped.set()
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+
+
+def init(config: Clicks) -> Optional[ClickCounter]:
+    """
+    Creates the click counter if enabled based on a given config
+
+    Contains FEATURE SWITCH
+    :param config: Clicks object of a configuration containing information
+    :return: ClickCounter object or None if the counting is disabled
+    """
+    logging.debug("Going to initialize click counter, state %s", config.enabled)
+    # FEATURE SWITCH
+    if not config.enabled:
+        return None
+
+    logging.debug("Click counter initialized with values flush_interval=%s, flush_hits=%s",
+                  config.flush_interval, config.flush_hits)
+    return ClickCounter(config.flush_interval, config.flush_hits)
@@ -0,0 +1,131 @@
+import hashlib
+from typing import Optional
+
+
+class AlphabetCodec:
+    """
+    Converts non-negative integers to fixed-length strings of the given alphabet and back
+
+    The alphabet must be ordered the same way in every process (e.g., sorted),
+    otherwise the same number is encoded differently
+    """
+    def __init__(self, alphabet: list, length: int):
+        self.alphabet = alphabet
+        self.base = len(alphabet)
+        self.length = length
+        self.capacity = self.base ** length
+        self._indexes = {character: index for index, character in enumerate(alphabet)}
+
+    def encode(self, number: int) -> str:
+        """
+        Encodes the number into the string of the codec length
+        :raises ValueError: if the number cannot be represented with the codec length
+        :param number: non-negative integer lower than capacity
+        :return: encoded string
+        """
+        if number < 0 or number >= self.capacity:
+            raise ValueError(f"Number must be between 0 and {self.capacity - 1}")
+
+        characters = []
+        for _ in range(self.length):
+            number, index = divmod(number, self.base)
+            characters.append(self.alphabet[index])
+
+        return "".join(reversed(characters))
+
+    def decode(self, link: str) -> int:
+        """
+        Decodes the string back into the number
+        :raises ValueError: if the string contains characters outside the alphabet
+        :param link: string created by encode
+        :return: decoded number
+        """
+        number = 0
+        for character in link:
+            index = self._indexes.get(character)
+            if index is None:
+                raise ValueError(f"Character '{character}' is not in the alphabet")
+            number = number * self.base + index
+
+        return number
+
+    def key(self, link: str) -> Optional[int]:
+        """
+        Returns the integer the link is stored under, if the link has the form of the encoded links
+        :param link: any link, generated or custom
+        :return: decoded number or None if the link has a different length or characters outside the alphabet
+        """
+        if len(link) != self.length:
+            return None
+
+        try:
+            return self.decode(link)
+        except ValueError:
+            return None
+
+
+class FeistelScrambler:
+    """
+    Keyed bijection of the interval [0, domain) onto itself
+
+    Uses a balanced Feistel network over the smallest even number of bits covering the domain,
+    values falling outside the domain are walked through the network again (cycle walking)
+    """
+    ROUNDS = 4
+
+    def __init__(self, key: bytes, domain: int):
+        self.key = hashlib.blake2b(key, digest_size=32).digest()
+        self.domain = domain
+        self.half_bits = max(1, ((domain - 1).bit_length() + 1) // 2)
+        self.half_mask = (1 << self.half_bits) - 1
+
+    def _round(self, round_number: int, value: int) -> int:
+        digest = hashlib.blake2b(round_number.to_bytes(1, "big") + value.to_bytes(8, "big"),
+                                 key=self.key, digest_size=8).digest()
+        return int.from_bytes(digest, "big") & self.half_mask
+
+    def _permute(self, number: int) -> int:
+        left, right = number >> self.half_bits, number & self.half_mask
+        for round_number in range(self.ROUNDS):
+            left, right = right, left ^ self._round(round_number, right)
+
+        return (left << self.half_bits) | right
+
+    def _unpermute(self, number: int) -> int:
+        left, right = number >> self.half_bits, number & self.half_mask
+        for round_number in reversed(range(self.ROUNDS)):
+            left, right = right ^ self._round(round_number, left), left
+
+        return (left << self.half_bits) | right
+
+    def scramble(self, number: int) -> int:
+        """
+        Maps the number to its scrambled counterpart
+        :raises ValueError: if the number is not in the domain
+        :param number: integer in [0, domain)
+        :return: scrambled integer in [0, domain)
+        """
+        if number < 0 or number >= self.domain:
+            raise ValueError(f"Number must be between 0 and {self.domain - 1}")
+
+        number = self._permute(number)
+        while number >= self.domain:
+            number = self._permute(number)
+
+        return number
+
+    def unscramble(self, number: int) -> int:
+        """
+        Reverts the scramble function
+        :raises ValueError: if the number is not in the domain
+        :param number: scrambled integer in [0, domain)
+        :return: original integer in [0, domain)
+        """
+        if number < 0 or number >= self.domain:
+            raise ValueError(f"Number must be between 0 and {self.domain - 1}")
+
+        number = self._unpermute(number)
+        while number >= self.domain:
+            number = self._unpermute(number)
+
+        return number
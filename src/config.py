@@ -9,6 +9,14 @@ DEAFULT_EXTENSIONS = ["_", "-"]
 DEFAULT_LINK_LENGTH = 5
 DEFAULT_CREATION_TRIES = 10
 DEFAULT_DESTINATION_LENGTH = 50
+DEFAULT_GENERATION = "random"
+DEFAULT_SEQUENCE_BLOCK = 100
+DEFAULT_NODE_ID = 0
+DEFAULT_NODE_BITS = 4
+DEFAULT_WORKER_BITS = 4
+DEFAULT_SEQUENCE_BITS = 8
+DEFAULT_BULK_LIMIT = 1000
+DEFAULT_DEDUPLICATE = False
 
 DEFAULT_PROXY_ENABLED = False
 DEFAULT_PROXY_X_FOR = True
@@ -17,11 +25,78 @@ DEFAULT_PROXY_X_HOST = False
 DEFAULT_PROXY_X_PORT = False
 DEFAULT_PROXY_X_PREFIX = False
 
+DEFAULT_FAST_PATH_ENABLED = True
+
+DEFAULT_RATE_LIMIT_ENABLED = False
+DEFAULT_RATE_LIMIT_REQUESTS_PER_MINUTE = 30
+DEFAULT_RATE_LIMIT_BURST = 10
+DEFAULT_RATE_LIMIT_SLOTS = 65536
+
 DEFAULT_RECAPTCHA_ENABLED = False
 DEFAULT_RECAPTCHA_MIN_SCORE = 0.5
 DEFAULT_RECAPTCHA_VERIFY_IP = True
 DEFAULT_RECAPTCHA_SITE_KEY = ""
 
+DEFAULT_CACHE_ENABLED = True
+DEFAULT_CACHE_SIZE = 10000
+DEFAULT_CACHE_TTL = 300
+DEFAULT_CACHE_NEGATIVE_TTL = 5
+DEFAULT_CACHE_SHARED = True
+DEFAULT_CACHE_SHARED_NAME = "redirects"
+DEFAULT_CACHE_WARM_UP = 0
+DEFAULT_CACHE_WARM_UP_SOURCE = "snapshot"
+DEFAULT_CACHE_SNAPSHOT_PATH = "/tmp/url-shortener-cache.snapshot"
+
+DEFAULT_CLICKS_ENABLED = False
+DEFAULT_CLICKS_FLUSH_INTERVAL = 10
+DEFAULT_CLICKS_FLUSH_HITS = 1000
+
+DEFAULT_PURGE_ENABLED = True
+DEFAULT_PURGE_INTERVAL = 60
+DEFAULT_PURGE_BATCH_SIZE = 1000
+DEFAULT_PURGE_BATCH_PAUSE = 0.1
+
+DEFAULT_METRICS_ENABLED = False
+DEFAULT_METRICS_MULTIPROCESS_DIR = "/tmp/url-shortener-metrics"
+DEFAULT_METRICS_FLUSH_INTERVAL = 5
+
+DEFAULT_LOGGING_SAMPLING = {}
+
+DEFAULT_TIMING_SERVER_TIMING = False
+DEFAULT_TIMING_PROFILER = False
+DEFAULT_TIMING_PROFILE_DIR = "/tmp/url-shortener-profile"
+
+DEFAULT_STORAGE_BACKEND = "postgres"
+DEFAULT_STORAGE_SQLITE_PATH = "shortener.sqlite3"
+DEFAULT_STORAGE_SQLITE_MMAP = 256
+DEFAULT_STORAGE_SQLITE_SYNCHRONOUS = "normal"
+
+DEFAULT_POOL_MIN_CONNECTIONS = 1
+DEFAULT_POOL_MAX_CONNECTIONS = 0
+DEFAULT_POOL_NODE_MAX_CONNECTIONS = 0
+DEFAULT_POOL_CONNECT = "startup"
+DEFAULT_POOL_MAX_WAITING = 32
+DEFAULT_POOL_WAIT_TIMEOUT = 0.5
+DEFAULT_POOL_RESERVED = 1
+DEFAULT_POOL_RETRY_AFTER = 1
+DEFAULT_POOL_IDLE_CHECK = 30
+
+DEFAULT_GROUP_COMMIT_ENABLED = False
+DEFAULT_GROUP_COMMIT_MAX_DELAY = 2
+DEFAULT_GROUP_COMMIT_MAX_BATCH = 32
+
+DEFAULT_REPLICAS_ENABLED = False
+DEFAULT_REPLICAS_DSNS = []
+DEFAULT_REPLICAS_MAX_CONNECTIONS = 10
+DEFAULT_REPLICAS_HEALTH_INTERVAL = 5
+DEFAULT_REPLICAS_PRIMARY_FALLBACK = True
+
+DEFAULT_BLOOM_ENABLED = False
+DEFAULT_BLOOM_MEMORY = 16
+DEFAULT_BLOOM_FALSE_POSITIVE_RATE = 0.01
+DEFAULT_BLOOM_REBUILD_INTERVAL = 3600
+DEFAULT_BLOOM_MAX_AGE = 300
+
 
 @dataclass
 class ConfigValues:
@@ -38,6 +113,14 @@ class ConfigValues:
         link_length: int
         creation_tries: int
         destination_length: int
+        generation: str
+        sequence_block: int
+        node_id: int
+        node_bits: int
+        worker_bits: int
+        sequence_bits: int
+        bulk_limit: int
+        deduplicate: bool
 
         def __init__(self, config):
             link_alphabet = config.get("shortener", {}).get("utils", {}).get("alphabet", {}).get("link",
@@ -48,18 +131,42 @@ class ConfigValues:
             creation_tries = config.get("shortener", {}).get("utils", {}).get("creation_tries", DEFAULT_CREATION_TRIES)
             dest_length = config.get("shortener", {}).get("utils", {}).get("max_destination_length",
                                                                            DEFAULT_DESTINATION_LENGTH)
+            generation = config.get("shortener", {}).get("utils", {}).get("generation", DEFAULT_GENERATION)
+            sequence_block = config.get("shortener", {}).get("utils", {}).get("sequence_block", DEFAULT_SEQUENCE_BLOCK)
+            node_id = config.get("shortener", {}).get("utils", {}).get("node_id", DEFAULT_NODE_ID)
+            node_bits = config.get("shortener", {}).get("utils", {}).get("node_bits", DEFAULT_NODE_BITS)
+            worker_bits = config.get("shortener", {}).get("utils", {}).get("worker_bits", DEFAULT_WORKER_BITS)
+            sequence_bits = config.get("shortener", {}).get("utils", {}).get("sequence_bits", DEFAULT_SEQUENCE_BITS)
+            bulk_limit = config.get("shortener", {}).get("utils", {}).get("bulk_limit", DEFAULT_BULK_LIMIT)
+            deduplicate = config.get("shortener", {}).get("utils", {}).get("deduplicate", DEFAULT_DEDUPLICATE)
 
             check_character_list(link_alphabet, "Link alphabet")
             check_character_list(extensions_alphabet, "Link extensions")
             check_number(link_length, "Link length", 1)
             check_number(creation_tries, "Creation tries", 1)
             check_number(dest_length, "Destination URL string length", 1)
+            check_choice(generation, "Link generation", ("random", "sequence", "snowflake"))
+            check_number(sequence_block, "Sequence block", 1)
+            check_number(node_id, "Node ID", 0)
+            check_number(node_bits, "Node bits", 0)
+            check_number(worker_bits, "Worker bits", 0)
+            check_number(sequence_bits, "Sequence bits", 1)
+            check_number(bulk_limit, "Bulk limit", 1)
+            check_bool(deduplicate, "Deduplicate")
 
             self.link_alphabet = set(link_alphabet)
             self.extensions_alphabet = set(extensions_alphabet)
             self.link_length = link_length
             self.creation_tries = creation_tries
             self.destination_length = dest_length
+            self.generation = generation
+            self.sequence_block = sequence_block
+            self.node_id = node_id
+            self.node_bits = node_bits
+            self.worker_bits = worker_bits
+            self.sequence_bits = sequence_bits
+            self.bulk_limit = bulk_limit
+            self.deduplicate = deduplicate
 
     @dataclass
     class Proxy:
@@ -95,6 +202,47 @@ class ConfigValues:
             self.x_port = 1 if x_port else 0
             self.x_prefix = 1 if x_prefix else 0
 
+    @dataclass
+    class FastPath:
+        """
+        Data class representing a fast_path section in the configuration
+        """
+        enabled: bool
+
+        def __init__(self, config):
+            enabled = config.get("network", {}).get("fast_path", {}).get("enabled", DEFAULT_FAST_PATH_ENABLED)
+
+            check_bool(enabled, "fast_path.enabled")
+
+            self.enabled = enabled
+
+    @dataclass
+    class RateLimit:
+        """
+        Data class representing a rate_limit section in the configuration
+        """
+        enabled: bool
+        requests_per_minute: int
+        burst: int
+        slots: int
+
+        def __init__(self, config):
+            enabled = config.get("network", {}).get("rate_limit", {}).get("enabled", DEFAULT_RATE_LIMIT_ENABLED)
+            requests_per_minute = config.get("network", {}).get("rate_limit", {}).get(
+                "requests_per_minute", DEFAULT_RATE_LIMIT_REQUESTS_PER_MINUTE)
+            burst = config.get("network", {}).get("rate_limit", {}).get("burst", DEFAULT_RATE_LIMIT_BURST)
+            slots = config.get("network", {}).get("rate_limit", {}).get("slots", DEFAULT_RATE_LIMIT_SLOTS)
+
+            check_bool(enabled, "rate_limit.enabled")
+            check_number(requests_per_minute, "rate_limit.requests_per_minute", 1)
+            check_number(burst, "rate_limit.burst", 1)
+            check_number(slots, "rate_limit.slots", 1)
+
+            self.enabled = enabled
+            self.requests_per_minute = requests_per_minute
+            self.burst = burst
+            self.slots = slots
+
     @dataclass
     class Recaptcha:
         """
@@ -121,13 +269,354 @@ class ConfigValues:
             self.verify_ip = verify_ip
             self.site_key = site_key
 
+    @dataclass
+    class Cache:
+        """
+        Data class representing a cache section in the configuration
+        """
+        enabled: bool
+        size: int
+        ttl: int
+        negative_ttl: int
+        shared: bool
+        shared_name: str
+        warm_up: int
+        warm_up_source: str
+        snapshot_path: str
+
+        def __init__(self, config):
+            enabled = config.get("shortener", {}).get("cache", {}).get("enabled", DEFAULT_CACHE_ENABLED)
+            size = config.get("shortener", {}).get("cache", {}).get("size", DEFAULT_CACHE_SIZE)
+            ttl = config.get("shortener", {}).get("cache", {}).get("ttl", DEFAULT_CACHE_TTL)
+            negative_ttl = config.get("shortener", {}).get("cache", {}).get("negative_ttl", DEFAULT_CACHE_NEGATIVE_TTL)
+            shared = config.get("shortener", {}).get("cache", {}).get("shared", DEFAULT_CACHE_SHARED)
+            shared_name = config.get("shortener", {}).get("cache", {}).get("shared_name", DEFAULT_CACHE_SHARED_NAME)
+            warm_up = config.get("shortener", {}).get("cache", {}).get("warm_up", DEFAULT_CACHE_WARM_UP)
+            warm_up_source = config.get("shortener", {}).get("cache", {}).get("warm_up_source",
+                                                                              DEFAULT_CACHE_WARM_UP_SOURCE)
+            snapshot_path = config.get("shortener", {}).get("cache", {}).get("snapshot_path",
+                                                                             DEFAULT_CACHE_SNAPSHOT_PATH)
+
+            check_bool(enabled, "cache.enabled")
+            check_number(size, "cache.size", 1)
+            check_number(ttl, "cache.ttl", 1)
+            check_number(negative_ttl, "cache.negative_ttl", 0)
+            check_bool(shared, "cache.shared")
+            check_string(shared_name, "cache.shared_name")
+            check_number(warm_up, "cache.warm_up", 0)
+            check_choice(warm_up_source, "cache.warm_up_source", ("snapshot", "clicks"))
+            check_string(snapshot_path, "cache.snapshot_path")
+
+            self.enabled = enabled
+            self.size = size
+            self.ttl = ttl
+            self.negative_ttl = negative_ttl
+            self.shared = shared
+            self.shared_name = shared_name
+            self.warm_up = warm_up
+            self.warm_up_source = warm_up_source
+            self.snapshot_path = snapshot_path
+
+    @dataclass
+    class Clicks:
+        """
+        Data class representing a clicks section in the configuration
+        """
+        enabled: bool
+        flush_interval: int
+        flush_hits: int
+
+        def __init__(self, config):
+            enabled = config.get("shortener", {}).get("clicks", {}).get("enabled", DEFAULT_CLICKS_ENABLED)
+            flush_interval = config.get("shortener", {}).get("clicks", {}).get("flush_interval",
+                                                                               DEFAULT_CLICKS_FLUSH_INTERVAL)
+            flush_hits = config.get("shortener", {}).get("clicks", {}).get("flush_hits", DEFAULT_CLICKS_FLUSH_HITS)
+
+            check_bool(enabled, "clicks.enabled")
+            check_number(flush_interval, "clicks.flush_interval", 1)
+            check_number(flush_hits, "clicks.flush_hits", 1)
+
+            self.enabled = enabled
+            self.flush_interval = flush_interval
+            self.flush_hits = flush_hits
+
+    @dataclass
+    class Purge:
+        """
+        Data class representing a purge section in the configuration
+        """
+        enabled: bool
+        interval: int
+        batch_size: int
+        batch_pause: float
+
+        def __init__(self, config):
+            enabled = config.get("shortener", {}).get("purge", {}).get("enabled", DEFAULT_PURGE_ENABLED)
+            interval = config.get("shortener", {}).get("purge", {}).get("interval", DEFAULT_PURGE_INTERVAL)
+            batch_size = config.get("shortener", {}).get("purge", {}).get("batch_size", DEFAULT_PURGE_BATCH_SIZE)
+            batch_pause = config.get("shortener", {}).get("purge", {}).get("batch_pause", DEFAULT_PURGE_BATCH_PAUSE)
+
+            check_bool(enabled, "purge.enabled")
+            check_number(interval, "purge.interval", 1)
+            check_number(batch_size, "purge.batch_size", 1)
+            check_float(batch_pause, "purge.batch_pause", 0, 60)
+
+            self.enabled = enabled
+            self.interval = interval
+            self.batch_size = batch_size
+            self.batch_pause = batch_pause
+
+    @dataclass
+    class Metrics:
+        """
+        Data class representing a metrics section in the configuration
+        """
+        enabled: bool
+        multiprocess_dir: str
+        flush_interval: int
+
+        def __init__(self, config):
+            enabled = config.get("metrics", {}).get("enabled", DEFAULT_METRICS_ENABLED)
+            multiprocess_dir = config.get("metrics", {}).get("multiprocess_dir", DEFAULT_METRICS_MULTIPROCESS_DIR)
+            flush_interval = config.get("metrics", {}).get("flush_interval", DEFAULT_METRICS_FLUSH_INTERVAL)
+
+            check_bool(enabled, "metrics.enabled")
+            check_string(multiprocess_dir, "metrics.multiprocess_dir")
+            check_number(flush_interval, "metrics.flush_interval", 1)
+
+            self.enabled = enabled
+            self.multiprocess_dir = multiprocess_dir
+            self.flush_interval = flush_interval
+
+    @dataclass
+    class Logging:
+        """
+        Data class representing a logging section in the configuration
+        """
+        sampling: dict[str, float]
+
+        def __init__(self, config):
+            sampling = config.get("logging", {}).get("sampling", DEFAULT_LOGGING_SAMPLING)
+
+            if not isinstance(sampling, dict):
+                raise TypeError("logging.sampling must be a table")
+            for module, rate in sampling.items():
+                check_float(rate, f"logging.sampling.{module}", 0, 1)
+
+            self.sampling = dict(sampling)
+
+    @dataclass
+    class Timing:
+        """
+        Data class representing a timing section in the configuration
+        """
+        server_timing: bool
+        profiler: bool
+        profile_dir: str
+
+        def __init__(self, config):
+            server_timing = config.get("timing", {}).get("server_timing", DEFAULT_TIMING_SERVER_TIMING)
+            profiler = config.get("timing", {}).get("profiler", DEFAULT_TIMING_PROFILER)
+            profile_dir = config.get("timing", {}).get("profile_dir", DEFAULT_TIMING_PROFILE_DIR)
+
+            check_bool(server_timing, "timing.server_timing")
+            check_bool(profiler, "timing.profiler")
+            check_string(profile_dir, "timing.profile_dir")
+
+            self.server_timing = server_timing
+            self.profiler = profiler
+            self.profile_dir = profile_dir
+
+    @dataclass
+    class Storage:
+        """
+        Data class representing a database section (with its database.sqlite subsection) in the configuration
+        """
+        backend: str
+        sqlite_path: str
+        sqlite_mmap: int
+        sqlite_synchronous: str
+
+        def __init__(self, config):
+            backend = config.get("database", {}).get("backend", DEFAULT_STORAGE_BACKEND)
+            sqlite_path = config.get("database", {}).get("sqlite", {}).get("path", DEFAULT_STORAGE_SQLITE_PATH)
+            sqlite_mmap = config.get("database", {}).get("sqlite", {}).get("mmap", DEFAULT_STORAGE_SQLITE_MMAP)
+            sqlite_synchronous = config.get("database", {}).get("sqlite", {}).get("synchronous",
+                                                                                  DEFAULT_STORAGE_SQLITE_SYNCHRONOUS)
+
+            check_choice(backend, "database.backend", ("postgres", "sqlite", "memory"))
+            check_string(sqlite_path, "sqlite.path")
+            check_number(sqlite_mmap, "sqlite.mmap", 0)
+            check_choice(sqlite_synchronous, "sqlite.synchronous", ("off", "normal", "full"))
+
+            self.backend = backend
+            self.sqlite_path = sqlite_path
+            self.sqlite_mmap = sqlite_mmap
+            self.sqlite_synchronous = sqlite_synchronous
+
+    @dataclass
+    class Pool:
+        """
+        Data class representing a database.pool section in the configuration
+        """
+        min_connections: int
+        max_connections: int
+        node_max_connections: int
+        connect: str
+        max_waiting: int
+        wait_timeout: float
+        reserved: int
+        retry_after: int
+        idle_check: int
+
+        def __init__(self, config):
+            min_connections = config.get("database", {}).get("pool", {}).get("min_connections",
+                                                                             DEFAULT_POOL_MIN_CONNECTIONS)
+            max_connections = config.get("database", {}).get("pool", {}).get("max_connections",
+                                                                             DEFAULT_POOL_MAX_CONNECTIONS)
+            node_max_connections = config.get("database", {}).get("pool", {}).get("node_max_connections",
+                                                                                  DEFAULT_POOL_NODE_MAX_CONNECTIONS)
+            connect = config.get("database", {}).get("pool", {}).get("connect", DEFAULT_POOL_CONNECT)
+            max_waiting = config.get("database", {}).get("pool", {}).get("max_waiting", DEFAULT_POOL_MAX_WAITING)
+            wait_timeout = config.get("database", {}).get("pool", {}).get("wait_timeout", DEFAULT_POOL_WAIT_TIMEOUT)
+            reserved = config.get("database", {}).get("pool", {}).get("reserved", DEFAULT_POOL_RESERVED)
+            retry_after = config.get("database", {}).get("pool", {}).get("retry_after", DEFAULT_POOL_RETRY_AFTER)
+            idle_check = config.get("database", {}).get("pool", {}).get("idle_check", DEFAULT_POOL_IDLE_CHECK)
+
+            check_number(min_connections, "pool.min_connections", 0)
+            # 0 derives the size from the uWSGI threads
+            check_number(max_connections, "pool.max_connections", 0)
+            if 0 < max_connections < min_connections:
+                raise ValueError("pool.max_connections must not be smaller than pool.min_connections")
+            check_number(node_max_connections, "pool.node_max_connections", 0)
+            check_choice(connect, "pool.connect", ("startup", "background", "lazy"))
+            check_number(max_waiting, "pool.max_waiting", 0)
+            check_float(wait_timeout, "pool.wait_timeout", 0, 60)
+            check_number(reserved, "pool.reserved", 0)
+            check_number(retry_after, "pool.retry_after", 1)
+            check_number(idle_check, "pool.idle_check", 0)
+
+            self.min_connections = min_connections
+            self.max_connections = max_connections
+            self.node_max_connections = node_max_connections
+            self.connect = connect
+            self.max_waiting = max_waiting
+            self.wait_timeout = wait_timeout
+            self.reserved = reserved
+            self.retry_after = retry_after
+            self.idle_check = idle_check
+
+    @dataclass
+    class GroupCommit:
+        """
+        Data class representing a database.group_commit section in the configuration
+        """
+        enabled: bool
+        max_delay: int
+        max_batch: int
+
+        def __init__(self, config):
+            enabled = config.get("database", {}).get("group_commit", {}).get("enabled", DEFAULT_GROUP_COMMIT_ENABLED)
+            max_delay = config.get("database", {}).get("group_commit", {}).get("max_delay",
+                                                                               DEFAULT_GROUP_COMMIT_MAX_DELAY)
+            max_batch = config.get("database", {}).get("group_commit", {}).get("max_batch",
+                                                                               DEFAULT_GROUP_COMMIT_MAX_BATCH)
+
+            check_bool(enabled, "group_commit.enabled")
+            check_number(max_delay, "group_commit.max_delay", 0)
+            check_number(max_batch, "group_commit.max_batch", 1)
+
+            self.enabled = enabled
+            self.max_delay = max_delay
+            self.max_batch = max_batch
+
+    @dataclass
+    class Replicas:
+        """
+        Data class representing a database.replicas section in the configuration
+        """
+        enabled: bool
+        dsns: list[str]
+        max_connections: int
+        health_interval: int
+        primary_fallback: bool
+
+        def __init__(self, config):
+            enabled = config.get("database", {}).get("replicas", {}).get("enabled", DEFAULT_REPLICAS_ENABLED)
+            dsns = config.get("database", {}).get("replicas", {}).get("dsns", DEFAULT_REPLICAS_DSNS)
+            max_connections = config.get("database", {}).get("replicas", {}).get("max_connections",
+                                                                                 DEFAULT_REPLICAS_MAX_CONNECTIONS)
+            health_interval = config.get("database", {}).get("replicas", {}).get("health_interval",
+                                                                                 DEFAULT_REPLICAS_HEALTH_INTERVAL)
+            primary_fallback = config.get("database", {}).get("replicas", {}).get("primary_fallback",
+                                                                                  DEFAULT_REPLICAS_PRIMARY_FALLBACK)
+
+            check_bool(enabled, "replicas.enabled")
+            check_string_list(dsns, "replicas.dsns")
+            check_number(max_connections, "replicas.max_connections", 1)
+            check_number(health_interval, "replicas.health_interval", 1)
+            check_bool(primary_fallback, "replicas.primary_fallback")
+
+            self.enabled = enabled
+            self.dsns = list(dsns)
+            self.max_connections = max_connections
+            self.health_interval = health_interval
+            self.primary_fallback = primary_fallback
+
+    @dataclass
+    class Bloom:
+        """
+        Data class representing a bloom section in the configuration
+        """
+        enabled: bool
+        memory: int
+        false_positive_rate: float
+        rebuild_interval: int
+        max_age: int
+
+        def __init__(self, config):
+            enabled = config.get("shortener", {}).get("bloom", {}).get("enabled", DEFAULT_BLOOM_ENABLED)
+            memory = config.get("shortener", {}).get("bloom", {}).get("memory", DEFAULT_BLOOM_MEMORY)
+            false_positive_rate = config.get("shortener", {}).get("bloom", {}).get(
+                "false_positive_rate", DEFAULT_BLOOM_FALSE_POSITIVE_RATE)
+            rebuild_interval = config.get("shortener", {}).get("bloom", {}).get("rebuild_interval",
+                                                                                DEFAULT_BLOOM_REBUILD_INTERVAL)
+            max_age = config.get("shortener", {}).get("bloom", {}).get("max_age", DEFAULT_BLOOM_MAX_AGE)
+
+            check_bool(enabled, "bloom.enabled")
+            check_number(memory, "bloom.memory", 1)
+            check_float(false_positive_rate, "bloom.false_positive_rate", 0, 1)
+            if false_positive_rate in (0, 1):
+                raise ValueError("bloom.false_positive_rate must be larger than 0 and smaller than 1")
+            check_number(rebuild_interval, "bloom.rebuild_interval", 1)
+            check_number(max_age, "bloom.max_age", 0)
+
+            self.enabled = enabled
+            self.memory = memory
+            self.false_positive_rate = false_positive_rate
+            self.rebuild_interval = rebuild_interval
+            self.max_age = max_age
+
     def __init__(self, config: dict):
         if not isinstance(config, dict):
             raise TypeError("Config object must be a dictionary (dict)")
 
         self.Utils = self.Utils(config)
         self.Proxy = self.Proxy(config)
+        self.FastPath = self.FastPath(config)
+        self.RateLimit = self.RateLimit(config)
         self.Recaptcha = self.Recaptcha(config)
+        self.Cache = self.Cache(config)
+        self.Clicks = self.Clicks(config)
+        self.Purge = self.Purge(config)
+        self.Metrics = self.Metrics(config)
+        self.Logging = self.Logging(config)
+        self.Timing = self.Timing(config)
+        self.Storage = self.Storage(config)
+        self.Pool = self.Pool(config)
+        self.GroupCommit = self.GroupCommit(config)
+        self.Replicas = self.Replicas(config)
+        self.Bloom = self.Bloom(config)
 
 
 def check_character_list(item: Any, name: str) -> None:
@@ -209,6 +698,37 @@ def check_string(item: Any, name: str) -> None:
         raise TypeError(f"{name} must be a string (str)")
 
 
+def check_string_list(item: Any, name: str) -> None:
+    """
+    Checks if the inputted value is exactly a list of strings, the list can be empty
+
+    :raises TypeError: on incorrect (non-list) type or non-string item
+    :param item: Any value received from user
+    :param name: Name, with which is the value recognisable in the logs
+    :return: None
+    """
+    if not isinstance(item, list):
+        raise TypeError(f"{name} must be a list")
+
+    for value in item:
+        if not isinstance(value, str):
+            raise TypeError(f"{name} must contain only strings (str)")
+
+
+def check_choice(item: Any, name: str, choices: tuple) -> None:
+    """
+    Checks if the inputted value is one of the given choices
+
+    :raises ValueError: if the value is not one of the choices
+    :param item: Any value received from user
+    :param name: Name, with which is the value recognisable in the logs
+    :param choices: accepted values
+    :return: None
+    """
+    if item not in choices:
+        raise ValueError(f"{name} must be one of {', '.join(map(str, choices))}")
+
+
 def load_toml_conf(filename: str) -> dict:
     """
     Loads the file represented by filename as byte array
@@ -248,4 +768,17 @@ def load_conf(filename: str) -> ConfigValues:
 
 Utils = ConfigValues.Utils
 Proxy = ConfigValues.Proxy
+FastPath = ConfigValues.FastPath
+RateLimit = ConfigValues.RateLimit
 Recaptcha = ConfigValues.Recaptcha
+Cache = ConfigValues.Cache
+Clicks = ConfigValues.Clicks
+Purge = ConfigValues.Purge
+Metrics = ConfigValues.Metrics
+Logging = ConfigValues.Logging
+Timing = ConfigValues.Timing
+Storage = ConfigValues.Storage
+Pool = ConfigValues.Pool
+GroupCommit = ConfigValues.GroupCommit
+Replicas = ConfigValues.Replicas
+Bloom = ConfigValues.Bloom
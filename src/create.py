@@ -1,14 +1,30 @@
+import json
 import logging
+import time
 from dataclasses import dataclass
 from os import environ
-from typing import Optional, Any
+from typing import Optional, Any, Union
 from urllib.parse import urlparse, ParseResult
 
 import flask
 
+import db
+import metrics
+import timing
 import utils
+from bloom import LinkFilter
+from cache import AnyRedirectCache
+from codec import AlphabetCodec
+from generator import SequenceGenerator, SnowflakeGenerator
 from utils import json_response
 
+NOT_ENOUGH_VALUES = {
+    "error": "Cannot generate link, the whole pool is already taken",
+    "type": "not_enough_values"}
+EXISTS = {"error": "Requested link was already taken", "type": "exists"}
+# ten years, the longest expiry accepted in the create request
+MAX_EXPIRES_IN = 10 * 365 * 24 * 60 * 60
+
 
 @dataclass
 class InsertContext:
@@ -22,6 +38,18 @@ class InsertContext:
     link_length: int
     destination_length: int
     tries: int
+    generator: Optional[Union[SequenceGenerator, SnowflakeGenerator]] = None
+    bulk_limit: int = 1000
+    deduplicate: bool = False
+    codec: Optional[AlphabetCodec] = None
+    link_filter: Optional[LinkFilter] = None
+    # set after the cache is created (after the process forking with uWSGI)
+    redirect_cache: Optional[AnyRedirectCache] = None
+
+    def __post_init__(self):
+        # links of link_length characters of the link alphabet are stored under the number they encode
+        if self.codec is None:
+            self.codec = AlphabetCodec(self.link_alphabet_l, self.link_length)
 
 
 @dataclass
@@ -34,6 +62,7 @@ class CreateValues:
     status_code: int
     requested_link: Optional[str]
     admin: Optional[str]
+    expires_in: Optional[int]
     response: Optional[flask.Response] = None
 
     def __init__(self, body: dict, ctx: InsertContext):
@@ -41,6 +70,7 @@ class CreateValues:
         status_code = body.get("redirect", 301)  # status code with which redirect
         requested_link = body.get("requested_link", None)  # own link
         admin = body.get("admin", None)  # password for own links
+        expires_in = body.get("expires_in", None)  # number of seconds after which the link expires
 
         resp = check_destination(destination, ctx.destination_length)
         if resp is not None:
@@ -58,17 +88,70 @@ class CreateValues:
                 self.response = resp
                 return
 
+        if expires_in is not None:
+            resp = check_expires_in(expires_in)
+            if resp is not None:
+                self.response = resp
+                return
+
         destination_parsed = urlparse(destination, allow_fragments=True)
         self.protocol = str(destination_parsed.scheme)
         self.destination = utils.remove_scheme_url(destination_parsed)
         self.status_code = status_code
         self.requested_link = requested_link
         self.admin = admin
+        self.expires_in = expires_in
+
+    def __bool__(self):
+        return self.response is None
+
+
+@dataclass
+class BulkCreateValues:
+    """
+    Data class containing input values of multiple links received from user in the bulk request
+    """
+    items: list
+    response: Optional[flask.Response] = None
+
+    def __init__(self, body: dict, ctx: InsertContext):
+        links = body.get("links", None)  # list of objects in the format of the single link request
+
+        resp = check_bulk_links(links, ctx.bulk_limit)
+        if resp is not None:
+            self.response = resp
+            return
+
+        self.items = [CreateValues(item, ctx) for item in links]
 
     def __bool__(self):
         return self.response is None
 
 
+def check_bulk_links(input_value: Any, bulk_limit: int) -> Optional[flask.Response]:
+    """
+    Checks if the inputted value is exactly of a bulk links type
+    :param input_value: Any value received from user
+    :param bulk_limit: Integer representing the maximal number of links in one request
+    :return: None if value is in the correct format,
+        otherwise flask.Response with detailed information about incorrect value
+    """
+    if not isinstance(input_value, list) or len(input_value) == 0:
+        logging.debug("Links are not a non-empty list, it is %s", type(input_value))
+        return json_response({"error": "Links must be a non-empty list"}, 400)
+
+    if len(input_value) > bulk_limit:
+        logging.debug("Number of links (%s) is larger than allowed (%s)", len(input_value), bulk_limit)
+        return json_response({"error": f"At most {bulk_limit} links can be created at once"}, 400)
+
+    if any(not isinstance(item, dict) for item in input_value):
+        logging.debug("Links contain an item which is not an object")
+        return json_response({"error": "Each link must be an object"}, 400)
+
+    logging.debug("Bulk links OK")
+    return None
+
+
 def check_status_code(input_value: Any) -> Optional[flask.Response]:
     """
     Checks if the inputted value is exactly of a status code type
@@ -88,6 +171,25 @@ def check_status_code(input_value: Any) -> Optional[flask.Response]:
     return None
 
 
+def check_expires_in(input_value: Any) -> Optional[flask.Response]:
+    """
+    Checks if the inputted value is exactly of an expiry type
+    :param input_value: Any value received from user
+    :return: None if value is in the correct format,
+        otherwise flask.Response with detailed information about incorrect value
+    """
+    if not isinstance(input_value, int) or isinstance(input_value, bool):
+        logging.debug("Expiry is not of an int type, it is %s", type(input_value))
+        return json_response({"error": "Expiry must be of a numeric type"}, 400)
+
+    if input_value < 1 or input_value > MAX_EXPIRES_IN:
+        logging.debug("Expiry is not in a range, it is %s", input_value)
+        return json_response({"error": f"Expiry must be between 1 and {MAX_EXPIRES_IN} seconds"}, 400)
+
+    logging.debug("Expiry OK")
+    return None
+
+
 def check_destination(input_value: Any, destination_length: int) \
         -> Optional[flask.Response]:
     """
@@ -107,13 +209,13 @@ def check_destination(input_value: Any, destination_length: int) \
         return json_response({"error": "Destination address must have a correct protocol"}, 400)
 
     if not dest_parsed.netloc:
-        logging.debug("Netloc is invalid", dest_parsed.netloc)
+        logging.debug("Netloc is invalid, netloc=%s", dest_parsed.netloc)
         return json_response(
             {"error": "Destination address must have a correct network location"}, 400)
 
-    if len(utils.remove_scheme_url(dest_parsed).geturl()) > destination_length:
-        logging.debug("Destination is longer (%s) than allowed (%s)",
-                      len(utils.remove_scheme_url(dest_parsed).geturl()), destination_length)
+    length = len(utils.remove_scheme_url(dest_parsed).geturl())
+    if length > destination_length:
+        logging.debug("Destination is longer (%s) than allowed (%s)", length, destination_length)
         return json_response({"error": "Destination address must be shorter"}, 400)
 
     logging.debug("Destination OK")
@@ -132,15 +234,18 @@ def check_requested_link(admin: Any, input_value: Any, allowed_alphabet: set) \
         otherwise flask.Response with detailed information about incorrect value
     """
     if admin != environ.get("ADMIN_PASS"):
-        logging.debug("Admin pass is incorrect", type(input_value))
+        logging.debug("Admin pass is incorrect")
         return json_response({"error": "Unauthorized"}, 401)
 
     if not isinstance(input_value, str):
         logging.debug("Requested link is not a of a str type, it is %s", type(input_value))
         return json_response({"error": "Requested link must of a text type"}, 400)
 
-    if (set(input_value) - allowed_alphabet) != set():
-        logging.debug("Requested link contains not allowed characters, diff=%s", (set(input_value) - allowed_alphabet))
+    if not allowed_alphabet.issuperset(input_value):
+        # the difference is computed only when it is logged
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug("Requested link contains not allowed characters, diff=%s",
+                          set(input_value) - allowed_alphabet)
         return json_response(
             {"error": "Requested link contains not allowed characters"}, 400)
 
@@ -150,110 +255,410 @@ def check_requested_link(admin: Any, input_value: Any, allowed_alphabet: set) \
 
 def insert_into_db(cursor, values: dict) -> Optional[str]:
     """
-    Executes the INSERT query and retrieves information from the database.
+    Executes the prepared INSERT query and retrieves information from the database.
+    The link of the form of the encoded links is stored under its number (values["id"]),
+    the other links under their text.
     Returns one line of matched results or None
-    :param cursor: psycopg2 cursor object
+    :param cursor: psycopg2 cursor object of the db.PreparingConnection
     :param values: dictionary containing values which will be parsed to a database query
     :return: string containing the result or None
     """
     logging.debug("Inserting data into database")
-    cursor.execute(
-        "SELECT insert_link "
-        "FROM insert_link(%(link)s::varchar, %(protocol)s::varchar, "
-        "%(dest)s::varchar, %(redirect)s::integer, %(ip_address)s::bigint);",
-        values
+    protocol_id = db.get_protocol_id(cursor, values["protocol"])
+    if values["id"] is None:
+        name = "insert_link"
+        parameters = (values["link"], protocol_id, str(values["redirect"] - 300), values["dest"],
+                      values["ip_address"] - db.IP_OFFSET, values["expires_in"])
+    else:
+        name = "insert_encoded_link"
+        parameters = (values["id"], values["link"], protocol_id, str(values["redirect"] - 300), values["dest"],
+                      values["ip_address"] - db.IP_OFFSET, values["generated"], values["expires_in"])
+    start = time.perf_counter()
+    with timing.span("insert"):
+        db.execute_prepared(cursor, name, parameters)
+        logging.debug("Fetching the response")
+        result = cursor.fetchone()
+    metrics.DB_QUERY.observe(time.perf_counter() - start, name)
+    if result is None:
+        return None
+
+    return values["link"]
+
+
+def insert_many_into_db(cursor, values: list[dict]) -> set:
+    """
+    Executes one prepared INSERT query of all given links and retrieves the inserted links from the database.
+    Links which are already taken are skipped
+    :param cursor: psycopg2 cursor object of the db.PreparingConnection
+    :param values: list of dictionaries containing values which will be parsed to a database query
+    :return: set of inserted links
+    """
+    logging.debug("Inserting %s links into database", len(values))
+    parameters = (
+        [item["id"] for item in values],
+        [item["link"] for item in values],
+        [db.get_protocol_id(cursor, item["protocol"]) for item in values],
+        [str(item["redirect"] - 300) for item in values],
+        [item["dest"] for item in values],
+        [item["ip_address"] - db.IP_OFFSET for item in values],
+        [item["generated"] for item in values],
+        [item["expires_in"] for item in values],
     )
-    logging.debug("Fetching the response")
-    result = cursor.fetchone()
+    start = time.perf_counter()
+    with timing.span("insert"):
+        db.execute_prepared(cursor, "insert_links", parameters)
+        logging.debug("Fetching the response")
+        result = {row[0] for row in cursor.fetchall()}
+    metrics.DB_QUERY.observe(time.perf_counter() - start, "insert_links")
+
+    return result
+
+
+def insert_deduplicated(cursor, values: dict, codec: AlphabetCodec) -> Optional[tuple]:
+    """
+    Executes the prepared query returning the generated link of the same destination
+    or inserting the new link if there is none, in one round trip.
+    The creations of the same destination are serialized by the advisory lock held until the commit
+    :param cursor: psycopg2 cursor object of the db.PreparingConnection
+    :param values: dictionary containing values which will be parsed to a database query,
+        the link must be of the form of the encoded links
+    :param codec: AlphabetCodec object converting the stored number back to the link
+    :return: (link, created) tuple or None if the new link is already taken
+    """
+    logging.debug("Inserting deduplicated data into database")
+    protocol_id = db.get_protocol_id(cursor, values["protocol"])
+    redirect = str(values["redirect"] - 300)
+    parameters = (values["id"], protocol_id, redirect, values["dest"], values["ip_address"] - db.IP_OFFSET,
+                  values["link"])
+    start = time.perf_counter()
+    with timing.span("insert"):
+        db.execute_prepared(cursor, "dedup_link", parameters, db.lock_key(protocol_id, redirect, values["dest"]))
+        logging.debug("Fetching the response")
+        result = cursor.fetchone()
+    metrics.DB_QUERY.observe(time.perf_counter() - start, "dedup_link")
+    if result is None:
+        return None
+
+    return codec.encode(result[0]), result[1]
+
+
+def generate_link(cursor, ctx: InsertContext) -> Optional[str]:
+    """
+    Generates a new link candidate using the generation configured
+    :param cursor: psycopg2 cursor object (used only by the sequence generator)
+    :param ctx: InsertContext object with information about local session
+    :return: generated link or None if no more links can be generated
+    """
+    if ctx.generator is None:
+        return utils.generate_string(ctx.link_alphabet_l, ctx.link_length)
+
+    return ctx.generator.generate(cursor)
+
+
+def possibly_taken(link: str, ctx: InsertContext) -> bool:
+    """
+    Checks the generated link against the link filter, so the link which may be taken is not tried in the database
+
+    Contains FEATURE SWITCH
+    :param link: generated link
+    :param ctx: InsertContext object with information about local session
+    :return: True if the link may be taken, False if it is surely free or the filter is disabled
+    """
+    # FEATURE SWITCH
+    if ctx.link_filter is None or not ctx.link_filter.ready():
+        return False
+
+    if ctx.link_filter.might_contain(link):
+        logging.debug("Generated link may be taken, skipping, link=%s", link)
+        metrics.FILTER_SKIPPED.inc()
+        return True
+
+    return False
 
-    return result[0]
 
+def add_to_filter(link: str, link_filter: Optional[LinkFilter]) -> None:
+    """
+    Adds the committed link to the link filter
+
+    Contains FEATURE SWITCH
+    :param link: created link
+    :param link_filter: LinkFilter object or None if the filter is disabled
+    :return: None
+    """
+    # FEATURE SWITCH
+    if link_filter is not None:
+        link_filter.add(link)
+
+
+def invalidate_cached(link: str, redirect_cache: Optional[AnyRedirectCache]) -> None:
+    """
+    Removes the committed link from the redirect cache, so the link cached as not found
+    (requested before it was created) is redirected right away
+
+    Contains FEATURE SWITCH
+    :param link: created link
+    :param redirect_cache: redirect cache object or None if the cache is disabled
+    :return: None
+    """
+    # FEATURE SWITCH
+    if redirect_cache is not None:
+        redirect_cache.invalidate(link)
 
-def insert_existing(connection, cursor, values: dict):
+
+def insert_existing(session, values: dict, link_filter: Optional[LinkFilter] = None,
+                    redirect_cache: Optional[AnyRedirectCache] = None):
     """
     Inserts the destination given by the user along
     with the user defined shortened link to the database.
     If the link cannot be inserted int database, user is notified in the response
     If the generation is unsuccessful, returns response with the error to the user
-    :param connection: psycopg2 connection object (used for commiting the changes)
-    :param cursor: psycopg2 cursor object
+    :param session: session object of the link storage (see storage.py)
     :param values: dictionary with preprocessed information about the entry
+    :param link_filter: LinkFilter object the created link is added to or None if the filter is disabled
+    :param redirect_cache: redirect cache object the created link is removed from or None if the cache is disabled
     :return: flask.Response containing the response for the user
     """
     logging.debug("Inserting the link defined by user, link=%s", values.get("link"))
-    inserted_value = insert_into_db(cursor, values)
+    inserted_value = session.insert(values)
     if inserted_value is None:
         logging.debug("Already in the database")
-        return json_response(
-            {"error": "Requested link was already taken", "type": "exists"}, 409)
+        return json_response(EXISTS, 409)
 
     logging.debug("Commiting the changes to the database")
-    connection.commit()
+    with timing.span("commit"):
+        session.commit()
+    add_to_filter(inserted_value, link_filter)
+    invalidate_cached(inserted_value, redirect_cache)
     # SUCCESSFUL
     return json_response({"status": "created", "link": inserted_value}, 201)
 
 
-def insert_generating(connection, cursor, values: dict, ctx: InsertContext):
+def insert_generating(session, values: dict, ctx: InsertContext):
     """
     Inserts the destination given by the user along
     with the randomly generated shortened link to the database.
 
     The link is generated ctx.tries number of times;
     this value can be changed in config.
+    With the sequence or snowflake generator, the link is unique and collides only with links created otherwise
+    (custom or randomly generated ones), so the first insert succeeds.
+    With the deduplication, the generated link of the same destination is returned instead, if there is one
+    (only for the links which never expire).
+    With the link filter, the generated links which may be taken are skipped without the database query.
     If the generation is unsuccessful, returns response with the error to the user
-    :param connection: psycopg2 connection object (used for commiting the changes)
-    :param cursor: psycopg2 cursor object
+    :param session: session object of the link storage (see storage.py)
     :param values: dictionary with preprocessed information about the entry
     :param ctx: InsertContext object with information about local session
     :return: flask.Response containing the response for the user
     """
     logging.debug("Inserting the link using generation")
     for try_number in range(ctx.tries):
-        values["link"] = utils.generate_string(ctx.link_alphabet_l, ctx.link_length)
+        values["link"] = generate_link(session.cursor, ctx)
+        if values["link"] is None:
+            break
         logging.debug("Try %s/%s, generated link=%s", try_number + 1, ctx.tries, values["link"])
-        inserted_value = insert_into_db(cursor, values)
+        if possibly_taken(values["link"], ctx):
+            continue
+        values["id"] = ctx.codec.key(values["link"])
+        # FEATURE SWITCH
+        if ctx.deduplicate and values["expires_in"] is None:
+            result = session.insert_deduplicated(values)
+            inserted_value, created = result if result is not None else (None, True)
+        else:
+            inserted_value, created = session.insert(values), True
 
         if inserted_value is None:
+            metrics.GENERATION_RETRIES.inc()
             continue
 
         logging.debug("Commiting the changes to the database")
-        connection.commit()
+        with timing.span("commit"):
+            session.commit()
+        if not created:
+            logging.debug("Destination already shortened, link=%s", inserted_value)
+            metrics.DEDUPLICATED.inc()
+            return json_response({"status": "existing", "link": inserted_value}, 200)
+
+        add_to_filter(inserted_value, ctx.link_filter)
+        invalidate_cached(inserted_value, ctx.redirect_cache)
         # SUCCESSFUL
         return json_response({"status": "created", "link": inserted_value}, 201)
 
     logging.error("Link generation unsuccessful after %s tries", ctx.tries)
-    return json_response(
-        {
-            "error": "Cannot generate link, the whole pool is already taken",
-            "type": "not_enough_values"},
-        503)
+    metrics.GENERATION_FAILURES.inc()
+    return json_response(NOT_ENOUGH_VALUES, 503)
 
 
-def insert_request(connection, cursor, values: CreateValues, ip_address: int,
-                   insert_ctx: InsertContext) -> flask.Response:
+def insert_bulk(session, values: list[dict], ctx: InsertContext) -> list[dict]:
     """
-    Preprocesses the request with the given values
-    and executes the query of the link insertion to the database.
+    Inserts all given destinations in one transaction, with one INSERT query per generation try.
 
-    Returns object containing flask response to the user.
-    :param connection: psycopg2 connection object (used for commiting the changes)
-    :param cursor: psycopg2 cursor object
+    Links defined by user are inserted once, the taken ones are reported as conflicts.
+    Generated links which collided are generated again and inserted together, ctx.tries number of times
+    :param session: session object of the link storage (see storage.py)
+    :param values: list of dictionaries with preprocessed information about the entries,
+        entries without the link are generated
+    :param ctx: InsertContext object with information about local session
+    :return: list of results (body along with status code) in the order of values
+    """
+    results: list[Optional[dict]] = [None] * len(values)
+    custom = {index for index, item in enumerate(values) if item["link"] is not None}
+    used_links = set()
+
+    pending = []
+    for index in custom:
+        if values[index]["link"] in used_links:
+            logging.debug("Link requested multiple times, link=%s", values[index]["link"])
+            results[index] = {"status_code": 409, **EXISTS}
+            continue
+        used_links.add(values[index]["link"])
+        pending.append(index)
+
+    generated = [index for index in range(len(values)) if index not in custom]
+    for try_number in range(ctx.tries):
+        not_generated = []
+        for index in generated:
+            link = None
+            # links of one query must differ, otherwise only one of them is inserted
+            for _ in range(ctx.tries):
+                candidate = generate_link(session.cursor, ctx)
+                if candidate is None:
+                    break
+                if candidate not in used_links and not possibly_taken(candidate, ctx):
+                    link = candidate
+                    break
+            if link is None:
+                not_generated.append(index)
+                continue
+            used_links.add(link)
+            values[index]["link"] = link
+            values[index]["id"] = ctx.codec.key(link)
+            pending.append(index)
+
+        if not pending:
+            break
+
+        logging.debug("Try %s/%s, inserting %s links", try_number + 1, ctx.tries, len(pending))
+        inserted = session.insert_many([values[index] for index in pending])
+
+        generated = not_generated
+        for index in pending:
+            if values[index]["link"] in inserted:
+                results[index] = {"status_code": 201, "status": "created", "link": values[index]["link"]}
+            elif index in custom:
+                results[index] = {"status_code": 409, **EXISTS}
+            else:
+                metrics.GENERATION_RETRIES.inc()
+                generated.append(index)
+        pending = []
+
+    for index in generated:
+        results[index] = {"status_code": 503, **NOT_ENOUGH_VALUES}
+    if generated:
+        logging.error("Link generation of %s links unsuccessful after %s tries", len(generated), ctx.tries)
+        metrics.GENERATION_FAILURES.inc(amount=len(generated))
+
+    logging.debug("Commiting the changes to the database")
+    with timing.span("commit"):
+        session.commit()
+    for result in results:
+        if result["status_code"] == 201:
+            add_to_filter(result["link"], ctx.link_filter)
+            invalidate_cached(result["link"], ctx.redirect_cache)
+
+    return results
+
+
+def entry_values(values: CreateValues, ip_address: int, insert_ctx: InsertContext) -> dict:
+    """
+    Converts the values of the create request to the entry inserted to the storage
     :param values: CreateValues object with information parsed by user
     :param ip_address: integer representation (32 bit) of user IP address
     :param insert_ctx: InsertContext object with information about local session
-    :return: flask.Response containing the response for the user
+    :return: dictionary with preprocessed information about the entry
     """
-    sql_values = {
+    return {
         "link": values.requested_link,
+        "id": insert_ctx.codec.key(values.requested_link) if values.requested_link is not None else None,
         "protocol": values.protocol,
         "dest": values.destination.geturl(),
         "redirect": values.status_code,
-        "ip_address": ip_address
+        "ip_address": ip_address,
+        "generated": values.requested_link is None,
+        "expires_in": values.expires_in
     }
 
+
+def insert_bulk_request(session, values: BulkCreateValues, ip_address: int,
+                        insert_ctx: InsertContext) -> flask.Response:
+    """
+    Preprocesses the bulk request with the given values
+    and executes the query of the links insertion to the database.
+
+    Returns object containing flask response to the user with the result of each link,
+    links with incorrect values are reported and not inserted.
+    :param session: session object of the link storage (see storage.py)
+    :param values: BulkCreateValues object with information parsed by user
+    :param ip_address: integer representation (32 bit) of user IP address
+    :param insert_ctx: InsertContext object with information about local session
+    :return: flask.Response containing the response for the user
+    """
+    results: list[Optional[dict]] = [None] * len(values.items)
+    valid = []
+    sql_values = []
+    for index, item in enumerate(values.items):
+        if not item:
+            results[index] = {"status_code": item.response.status_code, **json.loads(item.response.get_data())}
+            continue
+
+        valid.append(index)
+        sql_values.append(entry_values(item, ip_address, insert_ctx))
+
+    if sql_values:
+        for index, result in zip(valid, insert_bulk(session, sql_values, insert_ctx)):
+            results[index] = result
+
+    return json_response({"results": results}, 200)
+
+
+def insert_grouped_request(values: CreateValues, ip_address: int, insert_ctx: InsertContext,
+                           committer) -> flask.Response:
+    """
+    Preprocesses the request with the given values
+    and submits the entry to the group commit, waiting for its result.
+
+    Returns object containing flask response to the user, the same as insert_request
+    :param values: CreateValues object with information parsed by user
+    :param ip_address: integer representation (32 bit) of user IP address
+    :param insert_ctx: InsertContext object with information about local session
+    :param committer: groupcommit.GroupCommitter object
+    :return: flask.Response containing the response for the user
+    """
+    with timing.span("group"):
+        result = committer.submit(entry_values(values, ip_address, insert_ctx))
+    status_code = result.pop("status_code")
+
+    return json_response(result, status_code)
+
+
+def insert_request(session, values: CreateValues, ip_address: int,
+                   insert_ctx: InsertContext) -> flask.Response:
+    """
+    Preprocesses the request with the given values
+    and executes the query of the link insertion to the database.
+
+    Returns object containing flask response to the user.
+    :param session: session object of the link storage (see storage.py)
+    :param values: CreateValues object with information parsed by user
+    :param ip_address: integer representation (32 bit) of user IP address
+    :param insert_ctx: InsertContext object with information about local session
+    :return: flask.Response containing the response for the user
+    """
+    sql_values = entry_values(values, ip_address, insert_ctx)
+
     if values.requested_link is None:
-        resp = insert_generating(connection, cursor, sql_values, insert_ctx)
+        resp = insert_generating(session, sql_values, insert_ctx)
     else:
-        resp = insert_existing(connection, cursor, sql_values)
+        resp = insert_existing(session, sql_values, insert_ctx.link_filter, insert_ctx.redirect_cache)
 
     return resp
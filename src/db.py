@@ -0,0 +1,184 @@
+import hashlib
+import logging
+import threading
+from typing import Optional
+
+import psycopg2.extensions
+
+IP_OFFSET = 2 ** 31
+# the expired links are not found, until they are deleted by the purge;
+# expires_at is included in the covering indexes, so the lookup stays an index-only scan
+LIVE = "(expires_at IS NULL OR expires_at > NOW())"
+# number of seconds until the expiry of the link, NULL if the link never expires
+EXPIRES_IN = "CAST(EXTRACT(EPOCH FROM expires_at - NOW()) AS float8)"
+
+# name: (parameter types, statement)
+# links of the form of the encoded links (link_length characters of the link alphabet) are stored in encoded_links
+# under their decoded number, the other (custom) links in links under their text
+STATEMENTS = {
+    "get_link": (
+        "(varchar)",
+        f"SELECT destination_proto, destination_addr, redirect, {EXPIRES_IN} FROM links WHERE link = $1 AND {LIVE}"
+    ),
+    # links table is checked only when encoded_links misses, for the links not moved by `manage.py compact` yet
+    "get_encoded_link": (
+        "(bigint, varchar)",
+        f"SELECT destination_proto, destination_addr, redirect, {EXPIRES_IN} FROM encoded_links "
+        f"WHERE id = $1 AND {LIVE} "
+        "UNION ALL "
+        f"(SELECT destination_proto, destination_addr, redirect, {EXPIRES_IN} FROM links WHERE link = $2 AND {LIVE}) "
+        "LIMIT 1"
+    ),
+    # lookup of multiple links at once, the encoded links by their numbers ($1), all links by their text ($2),
+    # the row of encoded_links takes precedence over the one of links of the same link
+    "get_links": (
+        "(bigint[], varchar[])",
+        f"SELECT id, NULL::varchar, destination_proto, destination_addr, redirect, {EXPIRES_IN} FROM encoded_links "
+        f"WHERE id = ANY($1) AND {LIVE} "
+        "UNION ALL "
+        f"SELECT NULL::bigint, link, destination_proto, destination_addr, redirect, {EXPIRES_IN} FROM links "
+        f"WHERE link = ANY($2) AND {LIVE}"
+    ),
+    "insert_link": (
+        "(varchar, integer, char, varchar, integer, integer)",
+        "INSERT INTO links (link, destination_proto, redirect, destination_addr, creator_ip, expires_at) "
+        "VALUES ($1, $2, $3, $4, $5, NOW() + $6 * INTERVAL '1 second') ON CONFLICT (link) DO NOTHING RETURNING link"
+    ),
+    "insert_encoded_link": (
+        "(bigint, varchar, integer, char, varchar, integer, boolean, integer)",
+        "INSERT INTO encoded_links (id, destination_proto, redirect, destination_addr, creator_ip, generated, "
+        "expires_at) "
+        "SELECT $1, $3, $4, $5, $6, $7, NOW() + $8 * INTERVAL '1 second' "
+        "WHERE NOT EXISTS (SELECT 1 FROM links WHERE link = $2) "
+        "ON CONFLICT (id) DO NOTHING RETURNING id"
+    ),
+    "insert_links": (
+        "(bigint[], varchar[], integer[], char[], varchar[], integer[], boolean[], integer[])",
+        "WITH new_links AS ("
+        "SELECT id, link, destination_proto, redirect, destination_addr, creator_ip, generated, "
+        "NOW() + expires_in * INTERVAL '1 second' AS expires_at FROM unnest($1, $2, $3, $4, $5, $6, $7, $8) "
+        "AS new_links(id, link, destination_proto, redirect, destination_addr, creator_ip, generated, expires_in)"
+        "), inserted_encoded AS ("
+        "INSERT INTO encoded_links (id, destination_proto, redirect, destination_addr, creator_ip, generated, "
+        "expires_at) "
+        "SELECT id, destination_proto, redirect, destination_addr, creator_ip, generated, expires_at FROM new_links "
+        "WHERE id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM links WHERE links.link = new_links.link) "
+        "ON CONFLICT (id) DO NOTHING RETURNING id"
+        "), inserted AS ("
+        "INSERT INTO links (link, destination_proto, redirect, destination_addr, creator_ip, expires_at) "
+        "SELECT link, destination_proto, redirect, destination_addr, creator_ip, expires_at FROM new_links "
+        "WHERE id IS NULL "
+        "ON CONFLICT (link) DO NOTHING RETURNING link"
+        ") "
+        "SELECT new_links.link FROM new_links INNER JOIN inserted_encoded ON inserted_encoded.id = new_links.id "
+        "UNION ALL SELECT link FROM inserted"
+    ),
+    # returns the generated link of the same destination (which never expires), or inserts the new one if there is none;
+    # no row is returned when the new link is already taken
+    "dedup_link": (
+        "(bigint, integer, char, varchar, integer, varchar)",
+        "WITH existing AS ("
+        "SELECT id FROM encoded_links "
+        "WHERE destination_addr = $4 AND generated AND destination_proto = $2 AND redirect = $3 "
+        "AND expires_at IS NULL LIMIT 1"
+        "), inserted AS ("
+        "INSERT INTO encoded_links (id, destination_proto, redirect, destination_addr, creator_ip, generated) "
+        "SELECT $1, $2, $3, $4, $5, TRUE "
+        "WHERE NOT EXISTS (SELECT 1 FROM existing) AND NOT EXISTS (SELECT 1 FROM links WHERE link = $6) "
+        "ON CONFLICT (id) DO NOTHING RETURNING id"
+        ") "
+        "SELECT id, TRUE FROM inserted UNION ALL SELECT id, FALSE FROM existing"
+    ),
+}
+
+_protocol_ids: dict[str, int] = {}
+_protocol_names: dict[int, str] = {}
+_protocols_lock = threading.Lock()
+
+
+class PreparingConnection(psycopg2.extensions.connection):
+    """
+    psycopg2 connection remembering which statements were prepared in its database session
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared: set[str] = set()
+
+
+def execute_prepared(cursor, name: str, values: tuple, lock: Optional[int] = None) -> None:
+    """
+    Executes the server-side prepared statement, preparing it first if the connection has not used it yet.
+    The connection must be created with PreparingConnection as the connection_factory
+    :param cursor: psycopg2 cursor object of the PreparingConnection
+    :param name: name of the statement in STATEMENTS
+    :param values: values of the statement parameters
+    :param lock: key of the transaction-level advisory lock taken before the statement in the same round trip,
+        the statement then sees the rows committed by the transaction which held the lock before
+    :return: None
+    """
+    connection: PreparingConnection = cursor.connection
+    if name not in connection.prepared:
+        logging.debug("Preparing statement %s", name)
+        parameter_types, statement = STATEMENTS[name]
+        cursor.execute(f"PREPARE {name} {parameter_types} AS {statement};")
+        connection.prepared.add(name)
+
+    if lock is None:
+        cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(values))});", values)
+        return
+
+    cursor.execute(f"SELECT pg_advisory_xact_lock(%s); EXECUTE {name} ({', '.join(['%s'] * len(values))});",
+                   (lock, *values))
+
+
+def lock_key(*values) -> int:
+    """
+    Returns the key of the advisory lock for the given values
+    :param values: values identifying the locked resource
+    :return: signed 64-bit integer
+    """
+    digest = hashlib.blake2b("\x00".join(map(str, values)).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def load_protocols(cursor) -> None:
+    """
+    Loads the protocols table into memory, as it is never changed while the service is running
+    :param cursor: psycopg2 cursor object
+    :return: None
+    """
+    with _protocols_lock:
+        if _protocol_ids:
+            return
+
+        logging.debug("Loading protocols")
+        cursor.execute("SELECT protocol_id, protocol FROM protocol;")
+        for protocol_id, protocol in cursor.fetchall():
+            _protocol_ids[protocol] = protocol_id
+            _protocol_names[protocol_id] = protocol
+
+
+def get_protocol_id(cursor, protocol: str) -> int:
+    """
+    Returns the ID of the protocol
+    :param cursor: psycopg2 cursor object (used only when the protocols are not loaded yet)
+    :param protocol: name of the protocol, e.g., "https"
+    :return: protocol_id from the protocols table
+    """
+    if not _protocol_ids:
+        load_protocols(cursor)
+
+    return _protocol_ids[protocol]
+
+
+def get_protocol(cursor, protocol_id: int) -> str:
+    """
+    Returns the name of the protocol
+    :param cursor: psycopg2 cursor object (used only when the protocols are not loaded yet)
+    :param protocol_id: protocol_id from the protocols table
+    :return: name of the protocol, e.g., "https"
+    """
+    if not _protocol_names:
+        load_protocols(cursor)
+
+    return _protocol_names[protocol_id]
@@ -0,0 +1,141 @@
+import functools
+import logging
+import time
+from typing import Callable, Optional
+
+import flask
+from werkzeug.exceptions import InternalServerError
+from werkzeug.utils import redirect
+
+import metrics
+import pool
+import timing
+from config import FastPath
+
+# number of the prebuilt redirect responses kept, one per destination and redirect code
+RESPONSE_CACHE_SIZE = 4096
+# endpoint of the redirect route, the fast path responses are counted under it
+ROUTE = "redirect"
+
+
+def prebuild(response: flask.Response) -> tuple[int, str, list, list[bytes]]:
+    """
+    Turns the response into the parts passed to the WSGI server, built once and sent many times
+    :param response: flask.Response
+    :return: (status code, status, headers, body) tuple
+    """
+    return response.status_code, response.status, response.get_wsgi_headers({}).to_wsgi_list(), \
+        [response.get_data()]
+
+
+@functools.lru_cache(maxsize=RESPONSE_CACHE_SIZE)
+def redirect_response(url: str, code: int) -> tuple[int, str, list, list[bytes]]:
+    """
+    Builds the redirect response the same way as flask.redirect in the redirect route
+    :param url: destination of the link
+    :param code: redirect status code
+    :return: (status code, status, headers, body) tuple
+    """
+    return prebuild(redirect(url, code, flask.Response))
+
+
+class RedirectFastPath:
+    """
+    WSGI middleware answering the redirects (GET /<link> and GET /<link>/) before Flask,
+    without its request context, URL routing and response objects
+
+    The link is checked against the alphabet and looked up the same way as by the redirect route,
+    the responses are prebuilt: one 404 response and one response per destination and redirect code.
+    The other requests (including the paths of the other routes) are passed to Flask.
+    The failed lookups are logged and answered by the prebuilt 500 response, the same as Flask answers them,
+    so the failing storage is not asked again by Flask
+    """
+    def __init__(self, wsgi_app, lookup: Callable[[str], Optional[tuple]], alphabet: set[str], reserved: set[str],
+                 not_found: tuple, busy: tuple, error: tuple):
+        self.wsgi_app = wsgi_app
+        self.lookup = lookup
+        self.alphabet = alphabet
+        self.reserved = reserved
+        self.not_found = not_found
+        self.busy = busy
+        self.error = error
+
+    def requested_link(self, environ: dict) -> Optional[str]:
+        """
+        Returns the link of the redirect request, matched the same way as the redirect route
+        :param environ: WSGI environment of the request
+        :return: requested link or None if the request is not a redirect
+        """
+        if environ.get("REQUEST_METHOD") != "GET":
+            return None
+
+        path = environ.get("PATH_INFO", "")
+        if path in self.reserved or not path.startswith("/"):
+            return None
+
+        link = path[1:-1] if path.endswith("/") else path[1:]
+        if not link or "/" in link:
+            return None
+
+        return link
+
+    def __call__(self, environ: dict, start_response):
+        link = self.requested_link(environ)
+        if link is None:
+            return self.wsgi_app(environ, start_response)
+
+        start = time.perf_counter()
+        logging.info("Opening new get request")
+        if not self.alphabet.issuperset(link):
+            logging.debug("Requested link contains not allowed characters, link=%s", link)
+            response = self.not_found
+        else:
+            try:
+                result = self.lookup(link)
+            except pool.PoolBusy as exc:
+                logging.warning("Request refused, %s", exc)
+                response = self.busy
+            except Exception as exc:
+                logging.error("Redirect lookup unsuccessful, link=%s, error=%s", link, exc, exc_info=True)
+                response = self.error
+            else:
+                response = redirect_response(*result) if result else self.not_found
+
+        status_code, status, headers, body = response
+        metrics.REQUEST_LATENCY.observe(time.perf_counter() - start, ROUTE)
+        metrics.REQUESTS.inc(ROUTE, status_code)
+        # the server can add its headers to the list
+        start_response(status, list(headers))
+        return body
+
+
+def init(app, config: FastPath, lookup: Callable[[str], Optional[tuple]], busy: flask.Response) -> None:
+    """
+    Installs the redirect fast path in front of the app if enabled based on a given config.
+    Must be called after the redirect cache, the storage and the request timing are initialized
+
+    Contains FEATURE SWITCH
+    :param app: Flask app object
+    :param config: FastPath object of a configuration containing information
+    :param lookup: function looking up the link, returning (url, redirect) tuple or None
+    :param busy: flask.Response sent when the connection pool is busy
+    :return: None
+    """
+    logging.debug("Going to initialize redirect fast path, state %s", config.enabled)
+    # FEATURE SWITCH
+    if not config.enabled:
+        return
+
+    # the spans and the profiling are kept in the Flask request context
+    if timing.SERVER_TIMING or app.config["PROFILER"] is not None:
+        logging.info("Redirect fast path not installed, the redirects are timed by Flask")
+        return
+
+    with app.app_context():
+        not_found = prebuild(flask.Response(flask.render_template("404.html"), 404))
+    # the paths of the other routes are routed by Flask, even if they look like a link
+    reserved = {rule.rule for rule in app.url_map.iter_rules() if not rule.arguments}
+
+    app.wsgi_app = RedirectFastPath(app.wsgi_app, lookup, app.config["GET_CTX"].alphabet, reserved, not_found,
+                                    prebuild(busy), prebuild(InternalServerError().get_response()))
+    logging.debug("Redirect fast path initialized with reserved paths %s", reserved)
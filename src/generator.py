@@ -0,0 +1,251 @@
+import calendar
+import logging
+import threading
+import time
+from collections import deque
+from typing import Optional, Union
+
+from codec import AlphabetCodec, FeistelScrambler
+from config import Utils
+
+# start of the time counted by the snowflake IDs (2024-01-01 00:00:00 UTC), in seconds of the Unix time
+EPOCH = calendar.timegm((2024, 1, 1, 0, 0, 0))
+# minimal number of bits of the time in the snowflake ID, 2^29 seconds are 17 years
+MIN_TIME_BITS = 29
+
+
+class SequenceGenerator:
+    """
+    Generates links from the IDs reserved in blocks from the database sequence `link_ids`
+
+    Each ID is scrambled by a keyed bijection and encoded into the link alphabet,
+    so the generated links are unique, but not guessable from each other
+    """
+    def __init__(self, codec: AlphabetCodec, scrambler: FeistelScrambler, block_size: int):
+        self.codec = codec
+        self.scrambler = scrambler
+        self.block_size = block_size
+        self._ids: deque[int] = deque()
+        self._lock = threading.Lock()
+
+    def reserve(self, cursor) -> None:
+        """
+        Reserves the next block of IDs from the database sequence in one round trip
+        :param cursor: psycopg2 cursor object
+        :return: None
+        """
+        logging.debug("Reserving block of %s IDs from the sequence", self.block_size)
+        cursor.execute(
+            "SELECT nextval('link_ids') FROM generate_series(1, %(block_size)s);",
+            {"block_size": self.block_size}
+        )
+        self._ids.extend(row[0] for row in cursor.fetchall())
+
+    def generate(self, cursor) -> Optional[str]:
+        """
+        Takes the next reserved ID and converts it into the link,
+        reserving a new block when the current one is used up
+        :param cursor: psycopg2 cursor object (used only when reserving the block)
+        :return: link or None if the sequence exceeded the number of links representable by the alphabet
+        """
+        with self._lock:
+            if not self._ids:
+                self.reserve(cursor)
+            number = self._ids.popleft()
+
+        if number >= self.codec.capacity:
+            logging.error("Sequence value %s exceeded link capacity %s", number, self.codec.capacity)
+            return None
+
+        return self.codec.encode(self.scrambler.scramble(number))
+
+
+class SnowflakeGenerator:
+    """
+    Generates links from the IDs composed of the time, node ID, worker ID and a per-worker sequence
+
+    The workers of all nodes sharing the database generate unique links without any coordination
+    or database round trip, as long as each node has its own node ID and the clocks do not move back.
+    Each ID is scrambled by a keyed bijection and encoded into the link alphabet, as by the SequenceGenerator
+    """
+    def __init__(self, codec: AlphabetCodec, scrambler: FeistelScrambler, node_id: int, node_bits: int,
+                 worker_bits: int, sequence_bits: int):
+        self.codec = codec
+        self.scrambler = scrambler
+        self.node_id = node_id
+        self.node_bits = node_bits
+        self.worker_bits = worker_bits
+        self.sequence_bits = sequence_bits
+        self.bits = capacity_bits(codec)
+        self.time_bits = self.bits - node_bits - worker_bits - sequence_bits
+        self.worker_id = 0
+        self._time = 0
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def start(self, worker_id: int) -> None:
+        """
+        Sets the worker ID of this process, must be called after the process forking.
+        The first ID is generated in the next second, so the respawned worker does not repeat the IDs
+        its predecessor generated in the current second
+        :raises ValueError: if the worker ID does not fit into worker_bits
+        :param worker_id: number of the worker on this node, starting from 0
+        :return: None
+        """
+        if worker_id >= 2 ** self.worker_bits:
+            raise ValueError(f"Worker ID {worker_id} does not fit into {self.worker_bits} worker bits")
+
+        with self._lock:
+            self.worker_id = worker_id
+            self._time = int(time.time()) - EPOCH
+            self._sequence = 2 ** self.sequence_bits - 1
+
+    def next_id(self) -> int:
+        """
+        Composes the next ID, waiting for the next second when the sequence of the current one is used up
+        or when the clock moved back
+        :return: ID of the link
+        """
+        with self._lock:
+            while True:
+                now = time.time()
+                seconds = int(now) - EPOCH
+                if seconds > self._time:
+                    self._time, self._sequence = seconds, 0
+                    break
+                if seconds == self._time and self._sequence < 2 ** self.sequence_bits - 1:
+                    self._sequence += 1
+                    break
+                if seconds < self._time:
+                    logging.warning("Clock moved back by %.3f s, waiting for the last used second",
+                                    EPOCH + self._time - now)
+                time.sleep(EPOCH + self._time + 1 - now)
+
+            link_id = (self._time << self.node_bits) | self.node_id
+            link_id = (link_id << self.worker_bits) | self.worker_id
+            return (link_id << self.sequence_bits) | self._sequence
+
+    def generate(self, cursor) -> Optional[str]:
+        """
+        Takes the next ID and converts it into the link
+        :param cursor: psycopg2 cursor object (not used, the ID is generated without the database)
+        :return: link or None if the time exceeded the time_bits of the ID
+        """
+        link_id = self.next_id()
+        if link_id >= 2 ** self.bits:
+            logging.error("Snowflake ID %s exceeded %s bits, the time bits are used up", link_id, self.bits)
+            return None
+
+        return self.codec.encode(self.scrambler.scramble(link_id))
+
+
+def capacity_bits(codec: AlphabetCodec) -> int:
+    """
+    Computes the number of bits of the IDs which can be all encoded into the links
+    :param codec: AlphabetCodec object of the generated links
+    :return: number of bits
+    """
+    return codec.capacity.bit_length() - 1
+
+
+def worker_id() -> int:
+    """
+    Detects the number of the worker of this process
+    :return: uWSGI worker number starting from 0, or 0 if uWSGI is not running
+    """
+    try:
+        # on non existing import (uWSGI is not running), it fails
+        import uwsgi
+    except ImportError as _:
+        return 0
+
+    return uwsgi.worker_id() - 1
+
+
+def start(link_generator: Optional[Union[SequenceGenerator, SnowflakeGenerator]]) -> None:
+    """
+    Prepares the link generator of this process, must be called after the process forking
+
+    Contains FEATURE SWITCH
+    :param link_generator: SequenceGenerator or SnowflakeGenerator object or None if the random generation is used
+    :return: None
+    """
+    # FEATURE SWITCH
+    if isinstance(link_generator, SnowflakeGenerator):
+        link_generator.start(worker_id())
+
+
+def init(config: Utils, link_alphabet_l: list, secret: Optional[str], env_node_id: Optional[str] = None) \
+        -> Optional[Union[SequenceGenerator, SnowflakeGenerator]]:
+    """
+    Creates the sequence or snowflake generator if enabled based on a given config
+
+    Contains FEATURE SWITCH
+    :raises ValueError: if the secret used for scrambling is not set or the snowflake ID does not fit into the link
+    :param config: Utils object of a configuration containing information
+    :param link_alphabet_l: ordered list of characters of the link alphabet
+    :param secret: secret key of the scrambling
+    :param env_node_id: node ID from the environment variable, overrides the node ID of the config
+    :return: SequenceGenerator or SnowflakeGenerator object or None if the random generation is used
+    """
+    logging.debug("Going to initialize link generator, generation %s", config.generation)
+    # FEATURE SWITCH
+    if config.generation == "random":
+        return None
+
+    if not secret:
+        raise ValueError(f"LINK_SECRET (or SECRET_KEY) must be set for the {config.generation} generation")
+
+    codec = AlphabetCodec(link_alphabet_l, config.link_length)
+    scrambler = FeistelScrambler(secret.encode(), codec.capacity)
+    if config.generation == "snowflake":
+        return init_snowflake(config, codec, scrambler, env_node_id)
+
+    logging.debug("Link generator initialized with values capacity=%s, block size=%s",
+                  codec.capacity, config.sequence_block)
+    return SequenceGenerator(codec, scrambler, config.sequence_block)
+
+
+def init_snowflake(config: Utils, codec: AlphabetCodec, scrambler: FeistelScrambler, env_node_id: Optional[str]) \
+        -> SnowflakeGenerator:
+    """
+    Creates the snowflake generator, checking the ID fits into the link and the workers fit into the worker bits
+    :raises ValueError: if the node ID is not valid or the ID does not fit into the link
+    :param config: Utils object of a configuration containing information
+    :param codec: AlphabetCodec object of the generated links
+    :param scrambler: FeistelScrambler object of the IDs
+    :param env_node_id: node ID from the environment variable, overrides the node ID of the config
+    :return: SnowflakeGenerator object
+    """
+    node_id = config.node_id
+    if env_node_id:
+        if not env_node_id.isdecimal():
+            raise ValueError("NODE_ID must be a non-negative number")
+        node_id = int(env_node_id)
+
+    if node_id >= 2 ** config.node_bits:
+        raise ValueError(f"Node ID {node_id} does not fit into {config.node_bits} node bits")
+
+    needed_bits = config.node_bits + config.worker_bits + config.sequence_bits + MIN_TIME_BITS
+    if capacity_bits(codec) < needed_bits:
+        needed_length = config.link_length
+        while capacity_bits(AlphabetCodec(codec.alphabet, needed_length)) < needed_bits:
+            needed_length += 1
+        raise ValueError(f"Snowflake ID needs {needed_bits} bits, links of length {config.link_length} hold "
+                         f"{capacity_bits(codec)} bits, link length must be at least {needed_length}")
+
+    try:
+        # on non existing import (uWSGI is not running), it fails
+        import uwsgi
+    except ImportError as _:
+        pass
+    else:
+        if uwsgi.numproc > 2 ** config.worker_bits:
+            raise ValueError(f"{uwsgi.numproc} uWSGI workers do not fit into {config.worker_bits} worker bits")
+
+    link_generator = SnowflakeGenerator(codec, scrambler, node_id, config.node_bits, config.worker_bits,
+                                        config.sequence_bits)
+    logging.debug("Link generator initialized with values capacity=%s, node ID=%s, node bits=%s, worker bits=%s, "
+                  "sequence bits=%s, time bits=%s", codec.capacity, node_id, config.node_bits, config.worker_bits,
+                  config.sequence_bits, link_generator.time_bits)
+    return link_generator
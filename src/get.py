@@ -1,9 +1,19 @@
 import logging
+import time
 from dataclasses import dataclass
-from typing import Optional, Union
+from functools import partial
+from typing import Any, Optional, Union
 
 import flask
 
+import db
+import metrics
+import timing
+from bloom import LinkFilter
+from cache import AnyRedirectCache
+from codec import AlphabetCodec
+from utils import json_response
+
 
 @dataclass
 class GetContext:
@@ -11,6 +21,30 @@ class GetContext:
     Data class used as a context for functions, containing information needed when retrieving a link
     """
     alphabet: set
+    codec: Optional[AlphabetCodec] = None
+    bulk_limit: int = 1000
+
+
+@dataclass
+class ResolveValues:
+    """
+    Data class containing the links received from user in the batch resolve request
+    """
+    links: list
+    response: Optional[flask.Response] = None
+
+    def __init__(self, body: dict, get_ctx: GetContext):
+        links = body.get("links", None)  # list of links
+
+        resp = check_resolve_links(links, get_ctx.bulk_limit)
+        if resp is not None:
+            self.response = resp
+            return
+
+        self.links = links
+
+    def __bool__(self):
+        return self.response is None
 
 
 def check_requested_link(link: str, get_ctx: GetContext) -> Optional[tuple]:
@@ -22,45 +56,145 @@ def check_requested_link(link: str, get_ctx: GetContext) -> Optional[tuple]:
     :return: None if value is in the correct format,
         otherwise tuple containing flask response and the status code
     """
-    if not isinstance(link, str) or set(link) - get_ctx.alphabet != set():
-        logging.debug("Requested link contains not allowed characters ro is not str type=%s, diff=%s", type(link),
-                      (set(link) - get_ctx.alphabet))
+    if not isinstance(link, str) or not get_ctx.alphabet.issuperset(link):
+        # the difference is computed only when it is logged
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug("Requested link contains not allowed characters or is not str type=%s, diff=%s",
+                          type(link), set(link) - get_ctx.alphabet if isinstance(link, str) else None)
         return flask.render_template("404.html"), 404
 
     return None
 
 
-def get_from_db(cursor, values: dict) -> tuple:
+def check_resolve_links(input_value: Any, bulk_limit: int) -> Optional[flask.Response]:
+    """
+    Checks if the inputted value is exactly a list of links to be resolved,
+    the links are checked against the alphabet one by one later
+    :param input_value: Any value received from user
+    :param bulk_limit: Integer representing the maximal number of links in one request
+    :return: None if value is in the correct format,
+        otherwise flask.Response with detailed information about incorrect value
+    """
+    if not isinstance(input_value, list) or len(input_value) == 0:
+        logging.debug("Links are not a non-empty list, it is %s", type(input_value))
+        return json_response({"error": "Links must be a non-empty list"}, 400)
+
+    if len(input_value) > bulk_limit:
+        logging.debug("Number of links (%s) is larger than allowed (%s)", len(input_value), bulk_limit)
+        return json_response({"error": f"At most {bulk_limit} links can be resolved at once"}, 400)
+
+    if any(not isinstance(item, str) for item in input_value):
+        logging.debug("Links contain an item which is not a string")
+        return json_response({"error": "Each link must be of a text type"}, 400)
+
+    logging.debug("Resolve links OK")
+    return None
+
+
+def lookup_values(link: str, codec: AlphabetCodec) -> dict:
+    """
+    Creates the values of the link lookup query
+    :param link: link which real destination address will be retrieved
+    :param codec: AlphabetCodec object of the encoded links
+    :return: dictionary with the link and its number (None if the link is not of the form of the encoded links)
+    """
+    return {"link": link, "id": codec.key(link)}
+
+
+def get_from_db(cursor, values: dict) -> Optional[tuple]:
     """
-    Executes the SELECT query and retrieves information from the database.
+    Executes the prepared SELECT query and retrieves information from the database,
+    looking up the encoded links by their number (primary key) and the others by their text.
     Returns one line of matched results
-    :param cursor: psycopg2 cursor object
-    :param values: dictionary containing values which will be parsed to a database query
-    :return: tuple containing zero or one element (line) based on the result
+    :param cursor: psycopg2 cursor object of the db.PreparingConnection
+    :param values: dictionary containing values which will be parsed to a database query (see lookup_values)
+    :return: (url, redirect, expires_in) tuple or None if the link does not exist or expired,
+        expires_in is the number of seconds until the expiry or None if the link never expires
     """
     logging.debug("Getting data from database, link=%s", values.get("link"))
-    cursor.execute(
-        "SELECT url, redirect FROM get_address(%(link)s::varchar);",
-        values
-    )
-    logging.debug("Fetching the response")
-    result = cursor.fetchone()
+    if values.get("id") is None:
+        name, parameters = "get_link", (values["link"],)
+    else:
+        name, parameters = "get_encoded_link", (values["id"], values["link"])
+    start = time.perf_counter()
+    with timing.span("query"):
+        db.execute_prepared(cursor, name, parameters)
+        logging.debug("Fetching the response")
+        result = cursor.fetchone()
+    metrics.DB_QUERY.observe(time.perf_counter() - start, name)
+    if result is None:
+        return None
+
+    destination_proto, destination_addr, redirect, expires_in = result
+
+    return f"{db.get_protocol(cursor, destination_proto)}://{destination_addr}", int(redirect) + 300, expires_in
+
+
+def lookup_many_values(links: list[str], codec: AlphabetCodec) -> dict:
+    """
+    Creates the values of the lookup query of multiple links
+    :param links: links which real destination addresses will be retrieved
+    :param codec: AlphabetCodec object of the encoded links
+    :return: dictionary with the numbers of the links of the form of the encoded links and all the links
+    """
+    ids = [codec.key(link) for link in links]
+    return {"ids": [link_id for link_id in ids if link_id is not None], "links": links}
+
+
+def get_many_from_db(cursor, values: dict, codec: AlphabetCodec) -> dict:
+    """
+    Executes the prepared SELECT query of multiple links in one round trip
+    :param cursor: psycopg2 cursor object of the db.PreparingConnection
+    :param values: dictionary containing values which will be parsed to a database query (see lookup_many_values)
+    :param codec: AlphabetCodec object converting the stored numbers back to the links
+    :return: dictionary of link -> (url, redirect, expires_in) tuple (see get_from_db) of the found links
+    """
+    logging.debug("Getting %s links from database", len(values["links"]))
+    start = time.perf_counter()
+    with timing.span("query"):
+        db.execute_prepared(cursor, "get_links", (values["ids"], values["links"]))
+        rows = cursor.fetchall()
+    metrics.DB_QUERY.observe(time.perf_counter() - start, "get_links")
+
+    results = {}
+    for link_id, link, destination_proto, destination_addr, redirect, expires_in in rows:
+        if link_id is not None:
+            link = codec.encode(link_id)
+        elif link in results:
+            continue
+        results[link] = (f"{db.get_protocol(cursor, destination_proto)}://{destination_addr}", int(redirect) + 300,
+                         expires_in)
+
+    return results
+
+
+def cache_result(link: str, result: Optional[tuple], redirect_cache: Optional[AnyRedirectCache]) -> Optional[tuple]:
+    """
+    Stores the result of the database lookup to the redirect cache,
+    the expiring link is kept in the cache at most until its expiry
+    :param link: link which real destination address was retrieved
+    :param result: result of get_from_db
+    :param redirect_cache: redirect cache object the result is stored to or None if the cache is disabled
+    :return: (url, redirect) tuple or None (an empty tuple) if the link does not exist
+    """
+    if result:
+        url, redirect, expires_in = result
+        result = url, redirect
+    else:
+        expires_in = None
+
+    if redirect_cache is not None:
+        redirect_cache.put(link, result, expires_in)
 
     return result
 
 
-def get_request(cursor, link: str) -> Union[flask.Response, tuple]:
+def result_response(result: Optional[tuple]) -> Union[flask.Response, tuple]:
     """
-    Preprocesses the request with the given link
-    and executes the query of getting the link from the database.
-    Returns tuple or object containing flask response for the user
-    :param cursor: psycopg2 cursor object
-    :param link: link which real destination address will be retrieved
+    Creates the response to the user based on the result of the link lookup
+    :param result: (url, redirect) tuple, or None or an empty tuple if the link was not found
     :return: flask.Response or tuple containing the response to the user
     """
-    sql_values = {"link": link}
-
-    result = get_from_db(cursor, sql_values)
     if result is None or not result:
         logging.debug("Link not found in teh database")
         return flask.render_template("404.html"), 404
@@ -68,3 +202,196 @@ def get_request(cursor, link: str) -> Union[flask.Response, tuple]:
     url, redirect = result
 
     return flask.redirect(url, code=redirect)
+
+
+def get_cached(link: str, redirect_cache: Optional[AnyRedirectCache]) -> Optional[tuple]:
+    """
+    Looks up the link in the redirect cache
+
+    Contains FEATURE SWITCH
+    :param link: link which real destination address will be retrieved
+    :param redirect_cache: redirect cache object or None if the cache is disabled
+    :return: None if the link is not cached,
+        otherwise (url, redirect) tuple or an empty tuple if the link does not exist
+    """
+    # FEATURE SWITCH
+    if redirect_cache is None:
+        return None
+
+    result = redirect_cache.get(link)
+    if result is not None:
+        logging.debug("Link found in the redirect cache, link=%s", link)
+
+    return result
+
+
+def get_filtered(link: str, link_filter: Optional[LinkFilter]) -> Optional[tuple]:
+    """
+    Checks the link against the link filter, so the links which surely do not exist are not looked up
+
+    Contains FEATURE SWITCH
+    :param link: link which real destination address will be retrieved
+    :param link_filter: LinkFilter object or None if the filter is disabled
+    :return: None if the link must be looked up, an empty tuple if the link does not exist
+    """
+    # FEATURE SWITCH
+    if link_filter is None or not link_filter.trusted():
+        return None
+
+    if link_filter.might_contain(link):
+        metrics.FILTER_LOOKUPS.inc("passed")
+        return None
+
+    logging.debug("Link not found in the link filter, link=%s", link)
+    metrics.FILTER_LOOKUPS.inc("rejected")
+    return ()
+
+
+def get_replicated(link: str, codec: AlphabetCodec, replica_set,
+                   redirect_cache: Optional[AnyRedirectCache] = None) -> Optional[tuple]:
+    """
+    Looks up the link on the read replicas and stores the result to the redirect cache.
+    The link not found on the replica is left to the primary database, when the fallback is enabled,
+    as the replica can lag behind
+
+    Contains FEATURE SWITCH
+    :param link: link which real destination address will be retrieved
+    :param codec: AlphabetCodec object of the encoded links
+    :param replica_set: replicas.ReplicaSet object or None if the replicas are disabled
+    :param redirect_cache: redirect cache object the result is stored to or None if the cache is disabled
+    :return: None if the link must be looked up on the primary database,
+        otherwise (url, redirect) tuple or an empty tuple if the link does not exist
+    """
+    # FEATURE SWITCH
+    if replica_set is None:
+        return None
+
+    result = replica_set.lookup(lookup_values(link, codec))
+    if result is None or (not result and replica_set.primary_fallback):
+        return None
+
+    return cache_result(link, result, redirect_cache)
+
+
+def get_result(session, link: str, redirect_cache: Optional[AnyRedirectCache] = None) -> Optional[tuple]:
+    """
+    Gets the link from the storage and stores the result to the redirect cache
+    :param session: session object of the link storage (see storage.py)
+    :param link: link which real destination address will be retrieved
+    :param redirect_cache: redirect cache object the result is stored to or None if the cache is disabled
+    :return: (url, redirect) tuple or None if the link does not exist
+    """
+    return cache_result(link, session.get(link), redirect_cache)
+
+
+def get_request(session, link: str, redirect_cache: Optional[AnyRedirectCache] = None) \
+        -> Union[flask.Response, tuple]:
+    """
+    Preprocesses the request with the given link
+    and gets the link from the storage.
+    Returns tuple or object containing flask response for the user
+    :param session: session object of the link storage (see storage.py)
+    :param link: link which real destination address will be retrieved
+    :param redirect_cache: redirect cache object the result is stored to or None if the cache is disabled
+    :return: flask.Response or tuple containing the response to the user
+    """
+    return result_response(get_result(session, link, redirect_cache))
+
+
+def resolve_cached(links: list[str], get_ctx: GetContext, redirect_cache: Optional[AnyRedirectCache],
+                   link_filter: Optional[LinkFilter]) -> tuple[dict, list[str]]:
+    """
+    Resolves the links which do not need the database: the links with not allowed characters,
+    the cached links and the links which surely do not exist according to the link filter
+    :param links: links received from user, can repeat
+    :param get_ctx: GetContext object with information about local session
+    :param redirect_cache: redirect cache object or None if the cache is disabled
+    :param link_filter: LinkFilter object or None if the filter is disabled
+    :return: dictionary of link -> (url, redirect) tuple or an empty tuple if the link does not exist,
+        and the list of links to be looked up in the database
+    """
+    results = {}
+    missing = []
+    for link in dict.fromkeys(links):
+        if not get_ctx.alphabet.issuperset(link):
+            results[link] = ()
+            continue
+
+        result = get_cached(link, redirect_cache)
+        if result is None:
+            result = get_filtered(link, link_filter)
+        if result is None:
+            missing.append(link)
+        else:
+            results[link] = result
+
+    return results, missing
+
+
+def store_many(links: list[str], found: dict, redirect_cache: Optional[AnyRedirectCache]) -> dict:
+    """
+    Stores the results of the lookup of multiple links to the redirect cache, including the links not found
+    :param links: looked up links
+    :param found: dictionary of found link -> (url, redirect, expires_in)
+    :param redirect_cache: redirect cache object the results are stored to or None if the cache is disabled
+    :return: dictionary of link -> (url, redirect) tuple or an empty tuple if the link does not exist
+    """
+    return {link: cache_result(link, found.get(link), redirect_cache) or () for link in links}
+
+
+def resolve_replicated(links: list[str], codec: AlphabetCodec, replica_set,
+                       redirect_cache: Optional[AnyRedirectCache] = None) -> tuple[dict, list[str]]:
+    """
+    Looks up the links on the read replicas in one query and stores the results to the redirect cache.
+    The links not found on the replica are left to the primary database, when the fallback is enabled
+
+    Contains FEATURE SWITCH
+    :param links: links to be looked up
+    :param codec: AlphabetCodec object of the encoded links
+    :param replica_set: replicas.ReplicaSet object or None if the replicas are disabled
+    :param redirect_cache: redirect cache object the results are stored to or None if the cache is disabled
+    :return: dictionary of link -> (url, redirect) tuple or an empty tuple if the link does not exist,
+        and the list of links to be looked up on the primary database
+    """
+    # FEATURE SWITCH
+    if replica_set is None or not links:
+        return {}, links
+
+    found = replica_set.lookup(lookup_many_values(links, codec), partial(get_many_from_db, codec=codec))
+    if found is None:
+        return {}, links
+
+    if not replica_set.primary_fallback:
+        return store_many(links, found, redirect_cache), []
+
+    return store_many([link for link in links if link in found], found, redirect_cache), \
+        [link for link in links if link not in found]
+
+
+def resolve_result(session, links: list[str], redirect_cache: Optional[AnyRedirectCache] = None) -> dict:
+    """
+    Gets multiple links from the storage at once and stores the results to the redirect cache
+    :param session: session object of the link storage (see storage.py)
+    :param links: links to be looked up
+    :param redirect_cache: redirect cache object the results are stored to or None if the cache is disabled
+    :return: dictionary of link -> (url, redirect) tuple or an empty tuple if the link does not exist
+    """
+    return store_many(links, session.get_many(links), redirect_cache)
+
+
+def resolve_response(links: list[str], results: dict) -> flask.Response:
+    """
+    Creates the response to the user with the result of each requested link, in the order of the request
+    :param links: links received from user
+    :param results: dictionary of link -> (url, redirect) tuple or an empty tuple if the link does not exist
+    :return: flask.Response containing the results
+    """
+    items = []
+    for link in links:
+        result = results.get(link)
+        if result:
+            items.append({"link": link, "status_code": result[1], "destination": result[0]})
+        else:
+            items.append({"link": link, "status_code": 404})
+
+    return json_response({"results": items}, 200)
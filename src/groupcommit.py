@@ -0,0 +1,150 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Optional
+
+import metrics
+from config import GroupCommit
+from create import CreateValues, InsertContext, insert_bulk
+from pool import PoolBusy
+
+# seconds the request waits for the result of its group on top of max_delay and the wait for the connection,
+# covering the insert and the commit of the group
+RESULT_MARGIN = 5
+
+
+class GroupCommitter:
+    """
+    Inserts the links of the concurrent create requests of the worker in one transaction by a background thread
+
+    The request threads queue their entries and wait for their own results. The committer takes the first queued
+    entry, waits at most max_delay seconds for the others (or until max_batch entries are queued) and inserts them
+    the same way as the bulk creation: the taken custom links are reported as conflicts, the collided generated links
+    are generated again, all within one transaction with one commit.
+    Only the requests of one worker are grouped, so it needs the worker running multiple threads (uWSGI threads),
+    a single-threaded worker only waits max_delay seconds for each request
+    """
+    def __init__(self, max_delay: float, max_batch: int, wait_timeout: float, ctx: InsertContext):
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        # the bound of the wait of the request, so it does not hang on the stuck or stopped committer
+        self.timeout = max_delay + wait_timeout + RESULT_MARGIN
+        self.ctx = ctx
+        self.link_storage = None
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+
+    def accepts(self, values: CreateValues) -> bool:
+        """
+        Checks if the creation can be grouped, the deduplicated creations are inserted one by one
+        :param values: CreateValues object with information parsed by user
+        :return: True if the creation can be submitted
+        """
+        return not (self.ctx.deduplicate and values.requested_link is None and values.expires_in is None)
+
+    def submit(self, values: dict) -> dict:
+        """
+        Queues the entry and waits until its group is committed, at most timeout seconds
+        :raises PoolBusy: if the group is not committed in time, the request is answered with 503 and Retry-After
+            (the entry may still be inserted later)
+        :param values: dictionary with preprocessed information about the entry, without the link if generated
+        :return: result of the entry (body along with status code)
+        """
+        future = Future()
+        self._queue.put((values, future))
+
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError as _:
+            raise PoolBusy(f"group commit busy, no result in {self.timeout:.1f} s") from None
+
+    def collect(self) -> list[tuple[dict, Future]]:
+        """
+        Waits for the first entry and collects the group of the entries queued until the deadline
+        :return: list of (values, future) tuples
+        """
+        group = [self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(group) < self.max_batch:
+            try:
+                group.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+
+        return group
+
+    def commit(self, group: list[tuple[dict, Future]]) -> None:
+        """
+        Inserts and commits the entries of the group, sets the result of each entry
+        :param group: list of (values, future) tuples
+        :return: None
+        """
+        logging.debug("Committing group of %s create requests", len(group))
+        metrics.GROUP_COMMIT_SIZE.observe(len(group))
+        try:
+            with self.link_storage.session(sheddable=True) as session:
+                results = insert_bulk(session, [values for values, _ in group], self.ctx)
+        # each waiting request gets the error, as it would inserting alone
+        except Exception as exc:
+            logging.error("Group commit of %s create requests unsuccessful, error=%s", len(group), exc)
+            for _, future in group:
+                future.set_exception(exc)
+            return
+
+        for (_, future), result in zip(group, results):
+            future.set_result(result)
+
+    def _run(self) -> None:
+        while True:
+            group = []
+            # the thread must survive any error, all create requests of the worker wait for it
+            try:
+                group = self.collect()
+                self.commit(group)
+            except Exception as exc:
+                logging.error("Group commit unsuccessful, error=%s", exc)
+                for _, future in group:
+                    if not future.done():
+                        future.set_exception(exc)
+
+    def start(self, link_storage) -> None:
+        """
+        Starts the background thread committing the groups.
+        Must be called after the process forking and the opening of the storage
+        :param link_storage: storage object of the links (storage.AnyStorage)
+        :return: None
+        """
+        self.link_storage = link_storage
+        self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+        self._thread.start()
+
+
+def init(config: GroupCommit, wait_timeout: float, ctx: InsertContext) -> Optional[GroupCommitter]:
+    """
+    Creates the group commit of the create requests if enabled based on a given config
+
+    Contains FEATURE SWITCH
+    :param config: GroupCommit object of a configuration containing information
+    :param wait_timeout: seconds the group waits for a connection of the pool (pool.wait_timeout)
+    :param ctx: InsertContext object with information about local session
+    :return: GroupCommitter object or None if the group commit is disabled
+    """
+    logging.debug("Going to initialize group commit, state %s", config.enabled)
+    # FEATURE SWITCH
+    if not config.enabled:
+        return None
+
+    try:
+        # on non existing import (uWSGI is not running), it fails
+        import uwsgi
+    except ImportError as _:
+        pass
+    else:
+        if int(uwsgi.opt.get("threads", 1)) < 2:
+            logging.warning("Group commit groups the requests of one worker, the single-threaded workers "
+                            "only wait max_delay for each create request, consider setting threads in uwsgi.ini")
+
+    logging.debug("Group commit initialized with values max_delay=%s, max_batch=%s", config.max_delay, config.max_batch)
+    return GroupCommitter(config.max_delay / 1000, config.max_batch, wait_timeout, ctx)
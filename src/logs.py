@@ -0,0 +1,121 @@
+import atexit
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional, TextIO
+
+from config import Logging
+
+FORMAT = "%(asctime)s:%(levelname)s:%(name)s@%(threadName)s:%(message)s"
+FORMATTER = logging.Formatter(FORMAT)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Passes only the given fraction of the records of the sampled modules below the WARNING level,
+    the warnings and errors always pass
+
+    The service logs through the root logger, so the records are sampled by the module they were logged from
+    """
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        rate = self.rates.get(record.module)
+        return rate is None or random.random() < rate
+
+
+class RecordQueueHandler(QueueHandler):
+    """
+    QueueHandler which does not copy the records, as they are not used by any other handler of the root logger
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # the arguments are merged and the traceback is formatted on the logging thread,
+        # so the record does not hold any reference changing after it is queued
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+
+        return record
+
+
+class LogPipeline:
+    """
+    Moves the writing of the log records off the threads logging them
+
+    Until started, the root logger writes the records to the output stream directly.
+    After the start, the root logger only puts them into a queue and the records are written
+    by the background thread of a QueueListener, so a slow output does not block the requests
+    """
+    def __init__(self, stream: TextIO = sys.stdout):
+        self.output = logging.StreamHandler(stream)
+        self.output.setFormatter(FORMATTER)
+        self.handler = RecordQueueHandler(queue.SimpleQueue())
+        self._listener: Optional[QueueListener] = None
+
+    def start(self) -> None:
+        """
+        Starts the background thread writing the records and switches the root logger to the queue.
+        With uWSGI, must be called after the process forking, as the threads do not survive it
+        :return: None
+        """
+        if self._listener is not None:
+            return
+
+        self._listener = QueueListener(self.handler.queue, self.output, respect_handler_level=True)
+        self._listener.start()
+        root = logging.getLogger()
+        root.addHandler(self.handler)
+        root.removeHandler(self.output)
+
+    def stop(self) -> None:
+        """
+        Switches the root logger back to the direct output, writes the queued records and stops the background thread
+        :return: None
+        """
+        if self._listener is None:
+            return
+
+        root = logging.getLogger()
+        root.addHandler(self.output)
+        root.removeHandler(self.handler)
+        self._listener.stop()
+        self._listener = None
+
+
+def init(level: int) -> LogPipeline:
+    """
+    Sets the root logger to write the records of the given level to stdout through the log pipeline
+    :param level: level of the root logger
+    :return: LogPipeline object, not started
+    """
+    pipeline = LogPipeline()
+    logging.basicConfig(handlers=[pipeline.output], level=level, force=True)
+    atexit.register(pipeline.stop)
+
+    return pipeline
+
+
+def configure(config: Logging) -> None:
+    """
+    Applies the sampling of a given config to the root logger,
+    the sampled records are dropped before they are formatted or queued
+    :param config: Logging object of a configuration containing information
+    :return: None
+    """
+    root = logging.getLogger()
+    for log_filter in list(root.filters):
+        if isinstance(log_filter, SamplingFilter):
+            root.removeFilter(log_filter)
+    if config.sampling:
+        root.addFilter(SamplingFilter(config.sampling))
+
+    logging.debug("Logging configured with values sampling=%s", config.sampling)
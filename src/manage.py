@@ -0,0 +1,426 @@
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import sys
+from datetime import datetime
+from itertools import islice
+from os import environ
+from typing import Iterable, Iterator, Optional, TextIO
+from urllib.parse import urlparse
+
+import psycopg2
+from dotenv import load_dotenv
+
+import utils
+from db import IP_OFFSET
+from codec import AlphabetCodec
+from config import load_conf
+from create import check_destination, check_requested_link, check_status_code
+
+FIELDS = ("link", "url", "redirect", "creator_ip", "created_at", "expires_at")
+LINK_MAX_LENGTH = 32
+DEFAULT_CHUNK_SIZE = 10000
+DEFAULT_ITER_SIZE = 10000
+
+
+def read_rows(file: TextIO, file_format: str) -> Iterator[tuple[int, dict]]:
+    """
+    Reads the rows of the file one by one
+    :param file: opened text file (or stdin)
+    :param file_format: "csv" (with a header) or "jsonl"
+    :return: generator of (line number, row) tuples
+    """
+    if file_format == "csv":
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as exc:
+            logging.warning("Line %s skipped, invalid JSON: %s", line_number, exc)
+            continue
+        yield line_number, row
+
+
+def response_error(response) -> str:
+    """
+    Extracts the error message from the response of a check function
+    :param response: flask.Response returned by a check function
+    :return: error message
+    """
+    return json.loads(response.get_data()).get("error", "")
+
+
+def parse_timestamp(value) -> Optional[str]:
+    """
+    Checks the timestamp of the row, the empty one is left to the database default
+    :raises ValueError: if the value is not a timestamp in the ISO 8601 format
+    :param value: Any value received from the file
+    :return: timestamp in the ISO 8601 format or None if the value is empty
+    """
+    if value is None or value == "":
+        return None
+    if not isinstance(value, str):
+        raise ValueError("timestamp must be a text")
+
+    return datetime.fromisoformat(value).isoformat()
+
+
+def validate_rows(rows: Iterable[tuple[int, dict]], allowed_alphabet: set, destination_length: int,
+                  codec: AlphabetCodec) -> Iterator[tuple]:
+    """
+    Validates the rows using the same checks as the create request
+    and converts them into the format of the database table.
+    Invalid rows are logged and skipped
+    :param rows: iterable of (line number, row) tuples
+    :param allowed_alphabet: set containing the characters allowed in the link
+    :param destination_length: Integer representing the maximal length of a destination
+    :param codec: AlphabetCodec object of the encoded links
+    :return: generator of (id, link, protocol, destination, redirect, creator_ip, created_at, expires_at) tuples,
+        id is None for the links stored by their text
+    """
+    admin = environ.get("ADMIN_PASS")
+    for line_number, row in rows:
+        if not isinstance(row, dict):
+            logging.warning("Line %s skipped, row is not an object", line_number)
+            continue
+
+        link = row.get("link")
+        resp = check_requested_link(admin, link, allowed_alphabet)
+        if resp is None and not 0 < len(link) <= LINK_MAX_LENGTH:
+            logging.warning("Line %s skipped, link must have 1 to %s characters", line_number, LINK_MAX_LENGTH)
+            continue
+
+        destination = row.get("url")
+        if resp is None:
+            resp = check_destination(destination, destination_length)
+
+        redirect = row.get("redirect") or 301
+        try:
+            redirect = int(redirect)
+            creator_ip = int(row.get("creator_ip") or 0)
+        except (TypeError, ValueError):
+            logging.warning("Line %s skipped, redirect and creator_ip must be numbers", line_number)
+            continue
+
+        if resp is None:
+            resp = check_status_code(redirect)
+        if resp is not None:
+            logging.warning("Line %s skipped, %s", line_number, response_error(resp))
+            continue
+
+        # redirect column holds one character
+        if redirect > 309:
+            logging.warning("Line %s skipped, redirect larger than 309 cannot be stored", line_number)
+            continue
+
+        if not 0 <= creator_ip < 2 * IP_OFFSET:
+            logging.warning("Line %s skipped, creator_ip must be an IPv4 address as a number", line_number)
+            continue
+
+        try:
+            created_at = parse_timestamp(row.get("created_at"))
+            expires_at = parse_timestamp(row.get("expires_at"))
+        except ValueError as _:
+            logging.warning("Line %s skipped, created_at and expires_at must be timestamps in the ISO 8601 format",
+                            line_number)
+            continue
+
+        destination_parsed = urlparse(destination, allow_fragments=True)
+        yield (codec.key(link), link, destination_parsed.scheme,
+               utils.remove_scheme_url(destination_parsed).geturl(), redirect - 300, creator_ip - IP_OFFSET,
+               created_at, expires_at)
+
+
+def chunks(rows: Iterable[tuple], chunk_size: int) -> Iterator[list[tuple]]:
+    """
+    Splits the rows into the lists of the given size
+    :param rows: iterable of rows
+    :param chunk_size: maximal number of rows in one chunk
+    :return: generator of chunks
+    """
+    iterator = iter(rows)
+    while chunk := list(islice(iterator, chunk_size)):
+        yield chunk
+
+
+def copy_chunk(cursor, chunk: list[tuple]) -> int:
+    """
+    Loads the chunk into the staging table using COPY
+    and moves it into the links tables, skipping links which are already taken
+    :param cursor: psycopg2 cursor object
+    :param chunk: list of rows in the format of validate_rows
+    :return: number of inserted links
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(chunk)
+    buffer.seek(0)
+
+    cursor.copy_expert(
+        "COPY links_import (id, link, destination_proto, destination_addr, redirect, creator_ip, created_at, "
+        "expires_at) "
+        "FROM STDIN WITH (FORMAT csv);",
+        buffer
+    )
+    # imported links are not known to be generated, so they are never returned by the deduplication
+    cursor.execute(
+        "INSERT INTO encoded_links (id, destination_proto, destination_addr, redirect, creator_ip, created_at, "
+        "generated, expires_at) "
+        "SELECT links_import.id, protocol.protocol_id, links_import.destination_addr, links_import.redirect, "
+        "links_import.creator_ip, COALESCE(links_import.created_at, NOW()), FALSE, links_import.expires_at "
+        "FROM links_import INNER JOIN protocol ON protocol.protocol = links_import.destination_proto "
+        "WHERE links_import.id IS NOT NULL "
+        "AND NOT EXISTS (SELECT 1 FROM links WHERE links.link = links_import.link) "
+        "ON CONFLICT (id) DO NOTHING;"
+    )
+    inserted = cursor.rowcount
+    cursor.execute(
+        "INSERT INTO links (link, destination_proto, destination_addr, redirect, creator_ip, created_at, expires_at) "
+        "SELECT links_import.link, protocol.protocol_id, links_import.destination_addr, links_import.redirect, "
+        "links_import.creator_ip, COALESCE(links_import.created_at, NOW()), links_import.expires_at "
+        "FROM links_import INNER JOIN protocol ON protocol.protocol = links_import.destination_proto "
+        "WHERE links_import.id IS NULL "
+        "ON CONFLICT (link) DO NOTHING;"
+    )
+
+    return inserted + cursor.rowcount
+
+
+def import_links(connection, file: TextIO, file_format: str, allowed_alphabet: set, destination_length: int,
+                 codec: AlphabetCodec, chunk_size: int) -> tuple[int, int]:
+    """
+    Streams the links from the file into the database, one transaction per chunk
+    :param connection: psycopg2 connection object
+    :param file: opened text file (or stdin)
+    :param file_format: "csv" (with a header) or "jsonl"
+    :param allowed_alphabet: set containing the characters allowed in the link
+    :param destination_length: Integer representing the maximal length of a destination
+    :param codec: AlphabetCodec object of the encoded links
+    :param chunk_size: number of rows loaded by one COPY
+    :return: tuple of the number of valid rows and the number of inserted links
+    """
+    cursor = connection.cursor()
+    cursor.execute(
+        "CREATE TEMPORARY TABLE links_import (id BIGINT, link VARCHAR(32), destination_proto VARCHAR(6), "
+        "destination_addr TEXT, redirect CHAR, creator_ip INTEGER, created_at TIMESTAMP, expires_at TIMESTAMP) "
+        "ON COMMIT DELETE ROWS;"
+    )
+    connection.commit()
+
+    valid, inserted = 0, 0
+    rows = validate_rows(read_rows(file, file_format), allowed_alphabet, destination_length, codec)
+    for chunk in chunks(rows, chunk_size):
+        inserted += copy_chunk(cursor, chunk)
+        connection.commit()
+        valid += len(chunk)
+        logging.info("Imported %s rows, %s links inserted", valid, inserted)
+
+    cursor.close()
+    return valid, inserted
+
+
+def export_links(connection, file: TextIO, file_format: str, codec: AlphabetCodec, iter_size: int) -> int:
+    """
+    Streams all links which did not expire from the database into the file using a server-side cursor
+    :param connection: psycopg2 connection object
+    :param file: opened text file (or stdout)
+    :param file_format: "csv" (with a header) or "jsonl"
+    :param codec: AlphabetCodec object of the encoded links
+    :param iter_size: number of rows fetched from the server at once
+    :return: number of exported links
+    """
+    cursor = connection.cursor(name="links_export")
+    cursor.itersize = iter_size
+    cursor.execute(
+        "SELECT NULL, links.link, CONCAT(protocol.protocol, '://', links.destination_addr), "
+        "CAST(links.redirect AS INTEGER) + 300, CAST(links.creator_ip AS BIGINT) + %(ip_offset)s, links.created_at, "
+        "links.expires_at "
+        "FROM links INNER JOIN protocol ON protocol.protocol_id = links.destination_proto "
+        "WHERE links.expires_at IS NULL OR links.expires_at > NOW() "
+        "UNION ALL "
+        "SELECT encoded_links.id, NULL, CONCAT(protocol.protocol, '://', encoded_links.destination_addr), "
+        "CAST(encoded_links.redirect AS INTEGER) + 300, CAST(encoded_links.creator_ip AS BIGINT) + %(ip_offset)s, "
+        "encoded_links.created_at, encoded_links.expires_at "
+        "FROM encoded_links INNER JOIN protocol ON protocol.protocol_id = encoded_links.destination_proto "
+        "WHERE encoded_links.expires_at IS NULL OR encoded_links.expires_at > NOW();",
+        {"ip_offset": IP_OFFSET}
+    )
+
+    writer = None
+    if file_format == "csv":
+        writer = csv.writer(file)
+        writer.writerow(FIELDS)
+
+    exported = 0
+    for link_id, link, url, redirect, creator_ip, created_at, expires_at in cursor:
+        link = codec.encode(link_id) if link is None else link
+        created_at = created_at.isoformat()
+        expires_at = expires_at.isoformat() if expires_at is not None else None
+        if file_format == "csv":
+            writer.writerow((link, url, redirect, creator_ip, created_at, expires_at))
+        else:
+            file.write(json.dumps(dict(zip(FIELDS, (link, url, redirect, creator_ip, created_at, expires_at)))) +
+                       "\n")
+        exported += 1
+
+    cursor.close()
+    connection.commit()
+    return exported
+
+
+def compact_links(connection, codec: AlphabetCodec, chunk_size: int) -> int:
+    """
+    Moves the links of the form of the encoded links from the links table into the encoded_links table,
+    one transaction per chunk, so the service keeps running during the move
+    :param connection: psycopg2 connection object
+    :param codec: AlphabetCodec object of the encoded links
+    :param chunk_size: number of rows of the links table scanned in one transaction
+    :return: number of moved links
+    """
+    cursor = connection.cursor()
+    # links.generated exists only in the databases upgraded by the migration 002
+    cursor.execute(
+        "SELECT EXISTS (SELECT 1 FROM information_schema.columns "
+        "WHERE table_name = 'links' AND column_name = 'generated');"
+    )
+    generated = "links.generated" if cursor.fetchone()[0] else "FALSE"
+
+    moved, last_id = 0, 0
+    while True:
+        cursor.execute(
+            "SELECT id, link FROM links WHERE id > %(last_id)s AND char_length(link) = %(length)s "
+            "ORDER BY id LIMIT %(chunk_size)s;",
+            {"last_id": last_id, "length": codec.length, "chunk_size": chunk_size}
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        keys = [(link, codec.key(link)) for _, link in rows]
+        keys = [(link, key) for link, key in keys if key is not None]
+        if keys:
+            cursor.execute(
+                "WITH moved AS ("
+                "INSERT INTO encoded_links (id, destination_proto, destination_addr, redirect, creator_ip, created_at, "
+                f"generated, expires_at) SELECT keys.id, links.destination_proto, links.destination_addr, "
+                f"links.redirect, links.creator_ip, links.created_at, {generated}, links.expires_at "
+                "FROM unnest(%(links)s::varchar[], %(ids)s::bigint[]) AS keys(link, id) "
+                "INNER JOIN links ON links.link = keys.link "
+                "ON CONFLICT (id) DO NOTHING RETURNING id"
+                ") "
+                "DELETE FROM links USING unnest(%(links)s::varchar[], %(ids)s::bigint[]) AS keys(link, id), moved "
+                "WHERE links.link = keys.link AND moved.id = keys.id;",
+                {"links": [link for link, _ in keys], "ids": [key for _, key in keys]}
+            )
+            moved += cursor.rowcount
+            if cursor.rowcount < len(keys):
+                logging.warning("%s links not moved, their numbers are already taken", len(keys) - cursor.rowcount)
+        connection.commit()
+        logging.info("Scanned links up to id %s, %s links moved", last_id, moved)
+
+    cursor.close()
+    return moved
+
+
+def detect_format(filename: Optional[str], file_format: Optional[str]) -> str:
+    """
+    Returns the format given by user or detects it from the file extension
+    :param filename: name of the file or None for stdin/stdout
+    :param file_format: format given by user or None
+    :return: "csv" or "jsonl"
+    """
+    if file_format is not None:
+        return file_format
+
+    if filename is not None and os.path.splitext(filename)[1] in (".jsonl", ".json"):
+        return "jsonl"
+
+    return "csv"
+
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    """
+    Parses the command-line arguments
+    :param argv: list of arguments, sys.argv is used if None
+    :return: parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Manages the links of the URL shortener")
+    parser.add_argument("--config", default="config.toml", help="path to the config file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="imports links from CSV/JSONL file or stdin")
+    import_parser.add_argument("file", nargs="?", help="input file, stdin if not given or '-'")
+    import_parser.add_argument("--format", choices=("csv", "jsonl"), help="input format, detected by extension")
+    import_parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                               help="number of rows loaded by one COPY")
+
+    export_parser = subparsers.add_parser("export", help="exports links to CSV/JSONL file or stdout")
+    export_parser.add_argument("file", nargs="?", help="output file, stdout if not given or '-'")
+    export_parser.add_argument("--format", choices=("csv", "jsonl"), help="output format, detected by extension")
+    export_parser.add_argument("--iter-size", type=int, default=DEFAULT_ITER_SIZE,
+                               help="number of rows fetched from the database at once")
+
+    compact_parser = subparsers.add_parser("compact", help="moves the links of the generated form "
+                                                           "into the integer-keyed table (after migration 003)")
+    compact_parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                                help="number of links moved in one transaction")
+
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list] = None) -> int:
+    """
+    The main function of the command-line interface
+    :param argv: list of arguments, sys.argv is used if None
+    :return: exit code
+    """
+    args = parse_args(argv)
+    logging.basicConfig(
+        handlers=[logging.StreamHandler(sys.stderr)],
+        level=os.environ.get("PY_LOGGING", "INFO").upper(),
+        format='%(asctime)s:%(levelname)s:%(name)s@%(threadName)s:%(message)s'
+    )
+    load_dotenv()
+
+    conf = load_conf(args.config)
+    # sorted the same way as in the service, so the links are encoded to the same numbers
+    codec = AlphabetCodec(sorted(conf.Utils.link_alphabet), conf.Utils.link_length)
+    connection = psycopg2.connect(environ.get("DB_STRING"))
+
+    if args.command == "compact":
+        moved = compact_links(connection, codec, args.chunk_size)
+        logging.info("Compaction finished, %s links moved", moved)
+        connection.close()
+        return 0
+
+    filename = None if args.file in (None, "-") else args.file
+    file_format = detect_format(filename, args.format)
+    if args.command == "import":
+        allowed_alphabet = conf.Utils.link_alphabet.union(conf.Utils.extensions_alphabet)
+        file = sys.stdin if filename is None else open(filename, "r", encoding="utf-8", newline="")
+        with file:
+            valid, inserted = import_links(connection, file, file_format, allowed_alphabet,
+                                           conf.Utils.destination_length, codec, args.chunk_size)
+        logging.info("Import finished, %s valid rows, %s links inserted, %s already taken",
+                     valid, inserted, valid - inserted)
+    else:
+        file = sys.stdout if filename is None else open(filename, "w", encoding="utf-8", newline="")
+        with file:
+            exported = export_links(connection, file, file_format, codec, args.iter_size)
+        logging.info("Export finished, %s links exported", exported)
+
+    connection.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,309 @@
+import atexit
+import bisect
+import glob
+import json
+import logging
+import os
+import shutil
+import threading
+from typing import Callable, Optional
+
+from config import Metrics
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Metric:
+    """
+    Base of the metrics kept in memory of the worker, samples are keyed by the tuple of label values
+
+    Recording takes one lock and a dictionary update, so it can stay enabled in production
+    """
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._samples: dict[tuple, object] = {}
+        self._function: Optional[Callable[[], dict]] = None
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def set_function(self, function: Callable[[], dict]) -> None:
+        """
+        Makes the metric read its samples from the function when collected, instead of recording them
+        :param function: function returning a dictionary of label values tuple -> value
+        :return: None
+        """
+        self._function = function
+
+    def collect(self) -> dict:
+        """
+        Returns the current samples of the worker
+        :return: dictionary of label values tuple -> value
+        """
+        if self._function is not None:
+            return self._function()
+
+        with self._lock:
+            return {labels: (list(value) if isinstance(value, list) else value)
+                    for labels, value in self._samples.items()}
+
+
+class Counter(Metric):
+    """
+    Monotonically increasing number, e.g., number of requests
+    """
+    type = "counter"
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._samples[labels] = self._samples.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    """
+    Number which can go up and down, e.g., number of connections in use
+    """
+    type = "gauge"
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._samples[labels] = self._samples.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    """
+    Distribution of the observed values in the buckets, e.g., latency in seconds
+
+    Sample value is a list of per-bucket counts (the last one for values above all buckets) followed by the sum
+    """
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+
+    def observe(self, value: float, *labels) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            sample = self._samples.get(labels)
+            if sample is None:
+                sample = self._samples[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            sample[index] += 1
+            sample[-1] += value
+
+
+REGISTRY: list[Metric] = []
+
+REQUESTS = Counter("shortener_requests_total", "Number of handled requests", ("route", "status"))
+REQUEST_LATENCY = Histogram("shortener_request_duration_seconds", "Latency of the requests", ("route",))
+POOL_CHECKOUT = Histogram("shortener_pool_checkout_seconds", "Time of taking a connection from the pool")
+POOL_IN_USE = Gauge("shortener_pool_connections_in_use", "Number of connections taken from the pool")
+POOL_REJECTED = Counter("shortener_pool_rejected_total", "Number of requests refused by the busy connection pool",
+                        ("reason",))
+DB_QUERY = Histogram("shortener_db_query_seconds", "Time of the database queries", ("query",))
+GENERATION_RETRIES = Counter("shortener_generation_retries_total", "Number of generated links which were taken")
+DEDUPLICATED = Counter("shortener_deduplicated_total", "Number of creations returning the existing link")
+GENERATION_FAILURES = Counter("shortener_generation_failures_total", "Number of links which could not be generated")
+PURGED = Counter("shortener_purged_links_total", "Number of expired links deleted by the purge")
+RATE_LIMITED = Counter("shortener_rate_limited_total", "Number of requests rejected by the rate limiter")
+RECAPTCHA_LATENCY = Histogram("shortener_recaptcha_verify_seconds", "Latency of the reCAPTCHA verification")
+CACHE_OPERATIONS = Counter("shortener_cache_operations_total", "Number of redirect cache operations", ("result",))
+REPLICA_LOOKUPS = Counter("shortener_replica_lookups_total", "Number of redirect lookups on the read replicas",
+                          ("result",))
+FILTER_LOOKUPS = Counter("shortener_filter_lookups_total", "Number of redirect lookups checked by the link filter",
+                         ("result",))
+FILTER_SKIPPED = Counter("shortener_filter_skipped_total",
+                         "Number of generated links skipped as possibly taken by the link filter")
+GROUP_COMMIT_SIZE = Histogram("shortener_group_commit_size", "Number of create requests committed together",
+                              buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+
+
+def snapshot() -> dict:
+    """
+    Returns the samples of all metrics of the worker in the JSON-serializable format
+    :return: dictionary of metric name -> list of [label values, value]
+    """
+    return {metric.name: [[list(labels), value] for labels, value in metric.collect().items()]
+            for metric in REGISTRY}
+
+
+def merge(snapshots: list[dict], live_pids: set) -> dict:
+    """
+    Merges the snapshots of the workers; counters and histograms are summed over all workers
+    (including the exited ones, so they stay monotonic), gauges only over the running ones
+    :param snapshots: list of {"pid": pid, "metrics": snapshot()} dictionaries
+    :param live_pids: set of PIDs of the running workers
+    :return: dictionary of metric name -> {label values tuple -> value}
+    """
+    merged: dict[str, dict] = {metric.name: {} for metric in REGISTRY}
+    types = {metric.name: metric.type for metric in REGISTRY}
+    for worker in snapshots:
+        for name, samples in worker["metrics"].items():
+            if name not in merged or (types[name] == "gauge" and worker["pid"] not in live_pids):
+                continue
+            for labels, value in samples:
+                labels = tuple(labels)
+                current = merged[name].get(labels)
+                if current is None:
+                    merged[name][labels] = value
+                elif isinstance(value, list):
+                    merged[name][labels] = [a + b for a, b in zip(current, value)]
+                else:
+                    merged[name][labels] = current + value
+
+    return merged
+
+
+def format_labels(labelnames: tuple, labels: tuple, extra: str = "") -> str:
+    """
+    Formats the labels in the Prometheus text format
+    :param labelnames: names of the labels
+    :param labels: values of the labels
+    :param extra: additional formatted label, e.g., le="0.5"
+    :return: formatted labels including the braces, empty string if there are none
+    """
+    parts = [f'{name}="{str(value)}"' for name, value in zip(labelnames, labels)]
+    if extra:
+        parts.append(extra)
+
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def render(merged: dict) -> str:
+    """
+    Renders the merged samples in the Prometheus text exposition format
+    :param merged: result of merge
+    :return: text of the /metrics response
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for labels, value in sorted(merged.get(metric.name, {}).items()):
+            if metric.type != "histogram":
+                lines.append(f"{metric.name}{format_labels(metric.labelnames, labels)} {value}")
+                continue
+
+            cumulative = 0
+            for bound, count in zip(metric.buckets + ("+Inf",), value[:-1]):
+                cumulative += count
+                bucket_label = f'le="{bound}"'
+                lines.append(f"{metric.name}_bucket{format_labels(metric.labelnames, labels, bucket_label)} "
+                             f"{cumulative}")
+            lines.append(f"{metric.name}_sum{format_labels(metric.labelnames, labels)} {value[-1]}")
+            lines.append(f"{metric.name}_count{format_labels(metric.labelnames, labels)} {cumulative}")
+
+    return "\n".join(lines) + "\n"
+
+
+def pid_alive(pid: int) -> bool:
+    """
+    Checks if the process with the given PID is running
+    :param pid: process ID
+    :return: True if the process is running
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+    return True
+
+
+class Exporter:
+    """
+    Shares the metrics of the worker with the other workers of the node
+
+    Each worker writes its snapshot into its own file in the directory every interval seconds,
+    the worker serving /metrics merges the files with its own live snapshot
+    """
+    def __init__(self, directory: Optional[str], interval: int):
+        self.directory = directory
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def write(self) -> None:
+        """
+        Writes the snapshot of the worker into its file
+        :return: None
+        """
+        filename = os.path.join(self.directory, f"{os.getpid()}.json")
+        with open(f"{filename}.tmp", "w", encoding="utf-8") as file:
+            json.dump({"pid": os.getpid(), "metrics": snapshot()}, file)
+        os.replace(f"{filename}.tmp", filename)
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            try:
+                self.write()
+            except OSError as exc:
+                logging.error("Writing metrics unsuccessful, error=%s", exc)
+
+    def start(self) -> None:
+        """
+        Starts the background thread writing the snapshots.
+        Must be called after the process forking
+        :return: None
+        """
+        if self.directory is None:
+            return
+
+        self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+        self._thread.start()
+        atexit.register(self.write)
+
+    def collect(self) -> str:
+        """
+        Collects the metrics of all workers
+        :return: text of the /metrics response
+        """
+        own = {"pid": os.getpid(), "metrics": snapshot()}
+        if self.directory is None:
+            return render(merge([own], {own["pid"]}))
+
+        snapshots = [own]
+        for filename in glob.glob(os.path.join(self.directory, "*.json")):
+            try:
+                with open(filename, "r", encoding="utf-8") as file:
+                    worker = json.load(file)
+            except (OSError, ValueError):
+                continue
+            if worker["pid"] != own["pid"]:
+                snapshots.append(worker)
+
+        live_pids = {worker["pid"] for worker in snapshots if pid_alive(worker["pid"])}
+        return render(merge(snapshots, live_pids))
+
+
+def init(config: Metrics, multiprocess: bool) -> Optional[Exporter]:
+    """
+    Creates the metrics exporter if enabled based on a given config
+
+    Contains FEATURE SWITCH
+    :param config: Metrics object of a configuration containing information
+    :param multiprocess: True if the metrics of multiple worker processes are aggregated (uWSGI)
+    :return: Exporter object or None if the metrics endpoint is disabled
+    """
+    logging.debug("Going to initialize metrics, state %s", config.enabled)
+    # FEATURE SWITCH
+    if not config.enabled:
+        return None
+
+    if not multiprocess:
+        return Exporter(None, config.flush_interval)
+
+    # the directory is cleaned by the master process, before the workers are forked
+    shutil.rmtree(config.multiprocess_dir, ignore_errors=True)
+    os.makedirs(config.multiprocess_dir, exist_ok=True)
+    logging.debug("Metrics initialized with values multiprocess_dir=%s, flush_interval=%s",
+                  config.multiprocess_dir, config.flush_interval)
+    return Exporter(config.multiprocess_dir, config.flush_interval)
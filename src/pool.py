@@ -0,0 +1,272 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+
+import metrics
+from config import Pool
+from db import PreparingConnection
+
+
+class PoolBusy(PoolError):
+    """
+    Raised when no connection of the pool becomes free in time or too many requests are already waiting,
+    the request is answered with 503 and Retry-After
+    """
+
+
+class DeferredConnectionPool(ThreadedConnectionPool):
+    """
+    Thread-safe connection pool which opens no connection when created, minconn connections are opened by open
+
+    Unlike ThreadedConnectionPool, it keeps all connections open after their first use (psycopg2 closes
+    the connections put back over its minconn), so the connections and their prepared statements
+    are not created again for every request
+    """
+    def __init__(self, minconn: int, maxconn: int, *args, **kwargs):
+        super().__init__(0, maxconn, *args, **kwargs)
+        self.minconn = maxconn
+        self.initial = minconn
+
+    def open(self) -> None:
+        """
+        Opens the first minconn connections of the pool
+        :raises psycopg2.Error: if a connection cannot be opened
+        :return: None
+        """
+        connections = []
+        try:
+            for _ in range(self.initial):
+                connections.append(self.getconn())
+        finally:
+            for connection in connections:
+                self.putconn(connection)
+
+    def warm_up(self) -> None:
+        """
+        Opens the first minconn connections of the pool, logging the failure
+        :return: None
+        """
+        try:
+            self.open()
+        except psycopg2.Error as exc:
+            logging.error("Opening database connections unsuccessful, error=%s", exc)
+            return
+
+        logging.debug("Database connections opened in the background, count=%s", self.initial)
+
+
+class ManagedConnectionPool(DeferredConnectionPool):
+    """
+    Connection pool of the primary database admitting at most maxconn connections in use by the requests
+    and at most background connections in use by the background threads of the worker
+
+    When all connections are in use, the request waits for a free one at most timeout seconds in the queue
+    of at most max_waiting requests; otherwise PoolBusy is raised right away, so the request is answered
+    by 503 instead of piling up. The sheddable checkouts (creations) cannot use the reserved connections
+    and do not wait in the queue filled to a half, so they are shed before the redirects.
+    The background checkouts (purge, click counter, cache warm-up) have their own connections,
+    so they neither take the connections of the requests nor are shed with them.
+    The connections are checked on the checkout: the closed ones and those idle longer than idle_check seconds
+    which do not answer are replaced by the new ones, the broken ones are closed when they are put back
+    """
+    def __init__(self, minconn: int, maxconn: int, max_waiting: int, timeout: float, reserved: int,
+                 background: int, idle_check: int, *args, **kwargs):
+        super().__init__(minconn, maxconn + background, *args, **kwargs)
+        self.requests = maxconn
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.reserved = reserved
+        self.background = background
+        self.idle_check = idle_check
+        self._in_use = 0
+        self._waiting = 0
+        self._in_background = 0
+        self._admission = threading.Condition()
+        # id of the connection -> time.monotonic() of its return
+        self._returned_at: dict[int, float] = {}
+        # ids of the connections taken by the background checkouts
+        self._background_ids: set[int] = set()
+
+    def _admit_background(self) -> None:
+        # each background thread holds one connection at most, so the wait is rare and not bounded by max_waiting
+        with self._admission:
+            deadline = time.monotonic() + self.timeout
+            while self._in_background >= self.background:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolBusy("connection pool busy, background connections in use")
+                self._admission.wait(remaining)
+            self._in_background += 1
+
+    def _admit(self, sheddable: bool) -> None:
+        limit = self.requests - self.reserved if sheddable else self.requests
+        max_waiting = self.max_waiting // 2 if sheddable else self.max_waiting
+        with self._admission:
+            if self._in_use >= limit:
+                if self._waiting >= max_waiting:
+                    metrics.POOL_REJECTED.inc("queue_full")
+                    raise PoolBusy("connection pool busy, wait queue full")
+
+                deadline = time.monotonic() + self.timeout
+                self._waiting += 1
+                try:
+                    while self._in_use >= limit:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            metrics.POOL_REJECTED.inc("timeout")
+                            raise PoolBusy("connection pool busy, wait timed out")
+                        self._admission.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._in_use += 1
+
+    def _leave(self, background: bool = False) -> None:
+        with self._admission:
+            if background:
+                self._in_background -= 1
+            else:
+                self._in_use -= 1
+            # the waiters differ in their limit, all of them check it
+            self._admission.notify_all()
+
+    def _healthy(self, connection) -> bool:
+        if connection.closed:
+            return False
+
+        returned_at = self._returned_at.get(id(connection))
+        if not self.idle_check or returned_at is None or time.monotonic() - returned_at < self.idle_check:
+            return True
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1;")
+            connection.rollback()
+        except psycopg2.Error as _:
+            return False
+
+        return True
+
+    def getconn(self, key=None, sheddable: bool = False, background: bool = False):
+        """
+        Takes the connection from the pool, waiting for a free one if all are in use
+        :raises PoolBusy: if no connection becomes free in time or the wait queue is full
+        :raises psycopg2.Error: if a new connection cannot be opened
+        :param key: key of the connection, as in psycopg2
+        :param sheddable: True if the checkout is shed before the others (creations)
+        :param background: True if the checkout is done by a background thread, using its own connections
+        :return: psycopg2 connection object
+        """
+        if background:
+            self._admit_background()
+        else:
+            self._admit(sheddable)
+        try:
+            connection = super().getconn(key)
+            if not self._healthy(connection):
+                logging.warning("Database connection broken, reconnecting")
+                super().putconn(connection, close=True)
+                connection = super().getconn(key)
+        except BaseException:
+            self._leave(background)
+            raise
+
+        if background:
+            self._background_ids.add(id(connection))
+        return connection
+
+    def putconn(self, conn=None, key=None, close: bool = False) -> None:
+        """
+        Puts the connection back to the pool, the broken connection is closed
+        :param conn: psycopg2 connection object
+        :param key: key of the connection, as in psycopg2
+        :param close: True if the connection is to be closed
+        :return: None
+        """
+        close = close or conn.closed or conn.info.transaction_status == extensions.TRANSACTION_STATUS_UNKNOWN
+        try:
+            super().putconn(conn, key, close)
+        except psycopg2.Error as _:
+            # the rollback of the connection failed, it is discarded
+            super().putconn(conn, key, close=True)
+        finally:
+            if close:
+                self._returned_at.pop(id(conn), None)
+            else:
+                self._returned_at[id(conn)] = time.monotonic()
+            background = id(conn) in self._background_ids
+            self._background_ids.discard(id(conn))
+            self._leave(background)
+
+    @contextmanager
+    def connection(self, sheddable: bool = False, background: bool = False) -> Iterator:
+        """
+        Takes the connection for the duration of the block, it is put back even if the block fails
+        (rolling back the uncommitted changes)
+        :param sheddable: True if the checkout is shed before the others (creations)
+        :param background: True if the checkout is done by a background thread, using its own connections
+        :return: psycopg2 connection object
+        """
+        connection = self.getconn(sheddable=sheddable, background=background)
+        try:
+            yield connection
+        finally:
+            self.putconn(connection)
+
+
+def pool_size(config: Pool, background: int) -> tuple[int, int]:
+    """
+    Returns the minimal and maximal number of the connections of the requests of the worker.
+    With max_connections = 0, the worker gets one connection per its request thread (uWSGI threads),
+    with node_max_connections, the connections of all uWSGI workers of the node (including the background ones)
+    stay within it
+    :param config: Pool object of a configuration containing information
+    :param background: number of the connections of the background threads, added to the returned ones
+    :return: (minconn, maxconn) tuple
+    """
+    max_connections = config.max_connections
+    try:
+        # on non existing import (uWSGI is not running), it fails
+        import uwsgi
+    except ImportError as _:
+        processes, threads = 1, None
+    else:
+        processes, threads = uwsgi.numproc, int(uwsgi.opt.get("threads", 1))
+
+    if max_connections == 0:
+        # without uWSGI, the number of the request threads is not known
+        max_connections = threads if threads is not None else 10
+    if config.node_max_connections:
+        max_connections = min(max_connections, max(1, config.node_max_connections // processes - background))
+
+    return min(config.min_connections, max_connections), max_connections
+
+
+def init(config: Pool, dsn: Optional[str], background: int) -> ManagedConnectionPool:
+    """
+    Creates the connection pool of the primary database, opening the connections based on a given config.
+    With uWSGI, must be called after the process forking, so the workers do not share the connections
+    :param config: Pool object of a configuration containing information
+    :param dsn: connection string of the database
+    :param background: number of the background threads of the worker using the pool, one connection each
+    :return: ManagedConnectionPool object
+    """
+    logging.debug("Going to open database connection pool, connect %s", config.connect)
+    min_connections, max_connections = pool_size(config, background)
+    connection_pool = ManagedConnectionPool(min_connections, max_connections, config.max_waiting, config.wait_timeout,
+                                            min(config.reserved, max_connections - 1), background, config.idle_check,
+                                            dsn, connection_factory=PreparingConnection)
+    if config.connect == "startup":
+        connection_pool.open()
+    elif config.connect == "background":
+        threading.Thread(target=connection_pool.warm_up, name="pool-connect", daemon=True).start()
+
+    logging.debug("Database connection pool created with parameters minconn=%s, maxconn=%s, background=%s, "
+                  "connect=%s, max_waiting=%s, wait_timeout=%s, reserved=%s", min_connections, max_connections,
+                  background, config.connect, config.max_waiting, config.wait_timeout, connection_pool.reserved)
+    return connection_pool
@@ -1,7 +1,5 @@
 import logging
 
-from werkzeug.middleware.proxy_fix import ProxyFix
-
 from config import Proxy
 
 
@@ -16,6 +14,9 @@ def init(app, config: Proxy) -> None:
     """
     logging.debug("Going to initialize proxy, state %s", config.enabled)
     if config.enabled:
+        # imported only when enabled, so the start without the proxy does not pay for it
+        from werkzeug.middleware.proxy_fix import ProxyFix
+
         app.wsgi_app = ProxyFix(
             app=app.wsgi_app,
             x_for=config.x_for, x_proto=config.x_proto, x_host=config.x_host,
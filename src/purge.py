@@ -0,0 +1,117 @@
+import logging
+import threading
+from typing import Optional
+
+import psycopg2
+
+import metrics
+from codec import AlphabetCodec
+from config import Purge
+
+
+class Purger:
+    """
+    Deletes the expired links in small batches by a background thread of each worker
+
+    Each batch is one short transaction deleting at most batch_size links, the batches are separated
+    by batch_pause seconds, so the purge does not hold the locks for long and the replicas receive the changes
+    gradually. All workers (and nodes) purge together, the links locked by another worker are skipped.
+    With the random generation, the numbers of the purged encoded links can be generated again,
+    the "sequence" and "snowflake" generations never reuse them
+    """
+    def __init__(self, interval: int, batch_size: int, batch_pause: float, codec: AlphabetCodec):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.codec = codec
+        self.pool = None
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def purge_batch(self, cursor) -> int:
+        """
+        Deletes one batch of the expired links of both links tables along with their counted hits
+        :param cursor: psycopg2 cursor object
+        :return: number of deleted links
+        """
+        cursor.execute(
+            "DELETE FROM encoded_links WHERE id IN ("
+            "SELECT id FROM encoded_links WHERE expires_at <= NOW() LIMIT %(batch_size)s FOR UPDATE SKIP LOCKED"
+            ") RETURNING id;",
+            {"batch_size": self.batch_size}
+        )
+        links = [self.codec.encode(row[0]) for row in cursor.fetchall()]
+        cursor.execute(
+            "DELETE FROM links WHERE id IN ("
+            "SELECT id FROM links WHERE expires_at <= NOW() LIMIT %(batch_size)s FOR UPDATE SKIP LOCKED"
+            ") RETURNING link;",
+            {"batch_size": self.batch_size - len(links)}
+        )
+        links.extend(row[0] for row in cursor.fetchall())
+        if links:
+            cursor.execute("DELETE FROM link_hits WHERE link = ANY(%(links)s);", {"links": links})
+
+        return len(links)
+
+    def purge(self) -> int:
+        """
+        Deletes all expired links, one transaction per batch
+        :return: number of deleted links
+        """
+        purged = 0
+        while not self._stopped.is_set():
+            try:
+                # the connection is put back (and rolled back) even if the batch fails
+                with self.pool.connection(background=True) as connection:
+                    cursor = connection.cursor()
+                    deleted = self.purge_batch(cursor)
+                    cursor.close()
+                    connection.commit()
+            except psycopg2.Error as exc:
+                logging.error("Purging expired links unsuccessful, error=%s", exc)
+                break
+
+            purged += deleted
+            metrics.PURGED.inc(amount=deleted)
+            if deleted < self.batch_size:
+                break
+            self._stopped.wait(self.batch_pause)
+
+        if purged:
+            logging.info("Purged %s expired links", purged)
+        return purged
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.purge()
+
+    def start(self, pool) -> None:
+        """
+        Starts the background thread purging the expired links every interval seconds.
+        Must be called after the process forking
+        :param pool: connection pool of the primary database (pool.ManagedConnectionPool)
+        :return: None
+        """
+        self.pool = pool
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="link-purge", daemon=True)
+        self._thread.start()
+
+
+def init(config: Purge, codec: AlphabetCodec) -> Optional[Purger]:
+    """
+    Creates the purge of the expired links if enabled based on a given config
+
+    Contains FEATURE SWITCH
+    :param config: Purge object of a configuration containing information
+    :param codec: AlphabetCodec object converting the numbers of the encoded links back to the links
+    :return: Purger object or None if the purge is disabled
+    """
+    logging.debug("Going to initialize purge of expired links, state %s", config.enabled)
+    # FEATURE SWITCH
+    if not config.enabled:
+        return None
+
+    logging.debug("Purge initialized with values interval=%s, batch_size=%s, batch_pause=%s",
+                  config.interval, config.batch_size, config.batch_pause)
+    return Purger(config.interval, config.batch_size, config.batch_pause, codec)
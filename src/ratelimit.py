@@ -0,0 +1,122 @@
+import hashlib
+import logging
+import math
+import mmap
+import multiprocessing
+import struct
+import time
+from typing import Optional
+
+import flask
+
+import metrics
+from config import RateLimit
+from utils import json_response
+
+TOO_MANY_REQUESTS = {"error": "Too many requests, try again later", "type": "rate_limited"}
+# hash of the client address (0 for the empty slot), remaining tokens, time of the last update (time.monotonic())
+SLOT = struct.Struct("<Qdd")
+# number of slots the address can be stored in, the least recently updated one is replaced by a new address
+WAYS = 8
+
+
+class RateLimiter:
+    """
+    Token bucket rate limiter keyed by the client address, shared by the workers of the node
+
+    Each address has a bucket of burst tokens refilled by requests_per_minute tokens per minute,
+    each request takes one token. The buckets are stored in a table of a fixed number of slots in the shared memory
+    created before the forking: the address is hashed into a set of WAYS slots and, when all of them are taken,
+    the bucket of the least recently seen address is replaced,
+    so the memory is bounded regardless of the number of clients
+    """
+    def __init__(self, requests_per_minute: int, burst: int, slots: int):
+        self.rate = requests_per_minute / 60
+        self.burst = burst
+        self.sets = max(1, slots // WAYS)
+        self._memory = mmap.mmap(-1, self.sets * WAYS * SLOT.size)
+        # created before the forking, so it is shared by the workers
+        self._lock = multiprocessing.Lock()
+
+    def acquire(self, address: str) -> float:
+        """
+        Takes one token from the bucket of the address
+        :param address: client address
+        :return: 0 if the request is allowed, otherwise number of seconds until the next token
+        """
+        key = int.from_bytes(hashlib.blake2b(address.encode(), digest_size=8).digest(), "little") or 1
+        first = (key % self.sets) * WAYS
+        now = time.monotonic()
+        with self._lock:
+            victim, victim_updated = first, math.inf
+            for slot in range(first, first + WAYS):
+                slot_key, tokens, updated = SLOT.unpack_from(self._memory, slot * SLOT.size)
+                if slot_key == key:
+                    tokens = min(self.burst, tokens + (now - updated) * self.rate)
+                    break
+                if updated < victim_updated:
+                    victim, victim_updated = slot, updated
+            else:
+                slot, tokens = victim, self.burst
+
+            if tokens < 1:
+                SLOT.pack_into(self._memory, slot * SLOT.size, key, tokens, now)
+                return (1 - tokens) / self.rate
+
+            SLOT.pack_into(self._memory, slot * SLOT.size, key, tokens - 1, now)
+
+        return 0
+
+
+def check(rate_limiter: Optional[RateLimiter], address: str) -> Optional[flask.Response]:
+    """
+    Checks the rate limit of the client, before anything else of the request is processed
+
+    Contains FEATURE SWITCH
+    :param rate_limiter: RateLimiter object or None if the rate limiting is disabled
+    :param address: client address (after the reverse proxy fix)
+    :return: None if the request is allowed, otherwise flask.Response with the status code 429
+    """
+    # FEATURE SWITCH
+    if rate_limiter is None:
+        return None
+
+    retry_after = rate_limiter.acquire(str(address))
+    if retry_after == 0:
+        return None
+
+    logging.info("Rate limit exceeded, address=%s", address)
+    metrics.RATE_LIMITED.inc()
+    response = json_response(TOO_MANY_REQUESTS, 429)
+    response.headers["Retry-After"] = str(math.ceil(retry_after))
+
+    return response
+
+
+def init(config: RateLimit) -> Optional[RateLimiter]:
+    """
+    Creates the rate limiter if enabled based on a given config.
+    Must be called before the process forking, so the buckets are shared by the workers
+
+    Contains FEATURE SWITCH
+    :param config: RateLimit object of a configuration containing information
+    :return: RateLimiter object or None if the rate limiting is disabled
+    """
+    logging.debug("Going to initialize rate limiter, state %s", config.enabled)
+    # FEATURE SWITCH
+    if not config.enabled:
+        return None
+
+    try:
+        # on non existing import (uWSGI is not running), it fails
+        import uwsgi
+    except ImportError as _:
+        pass
+    else:
+        if uwsgi.opt.get("lazy-apps") or uwsgi.opt.get("lazy"):
+            logging.warning("Rate limiter cannot be shared by the workers loading the application after the forking "
+                            "(lazy-apps), each worker limits the clients separately")
+
+    logging.debug("Rate limiter initialized with values requests_per_minute=%s, burst=%s, slots=%s",
+                  config.requests_per_minute, config.burst, config.slots)
+    return RateLimiter(config.requests_per_minute, config.burst, config.slots)
@@ -1,10 +1,11 @@
 import logging
+import time
 from dataclasses import dataclass
 from typing import Optional, Any
 
 import flask
-import requests
 
+import metrics
 from utils import json_response
 
 
@@ -99,6 +100,9 @@ def verify(user_input: RecaptchaValues, ctx: RecaptchaContext, secret_key: str,
     if not ctx.enabled:
         return None
 
+    # imported on the first verification, it is the slowest import of the service and not needed when disabled
+    import requests
+
     request_data = {
         "secret": secret_key,
         "response": user_input.token,
@@ -108,7 +112,9 @@ def verify(user_input: RecaptchaValues, ctx: RecaptchaContext, secret_key: str,
         request_data["remoteip"] = user_ip
 
     logging.debug("Sending POST request to siteverify")
+    start = time.perf_counter()
     request = requests.post("https://www.google.com/recaptcha/api/siteverify", data=request_data)
+    metrics.RECAPTCHA_LATENCY.observe(time.perf_counter() - start)
     logging.debug("Response %s", request)
 
     # recaptcha servers are unavailable or internal error
@@ -0,0 +1,150 @@
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+import psycopg2
+from psycopg2.pool import PoolError
+
+import metrics
+from config import Replicas
+from db import PreparingConnection
+from get import get_from_db
+from pool import DeferredConnectionPool
+
+
+class Replica:
+    """
+    Connection pool of one read replica along with its health
+    """
+    def __init__(self, dsn: str, max_connections: int):
+        # no connection is opened until the first lookup, so the unavailable replica does not stop the start,
+        # the connections are kept open after it
+        self.pool = DeferredConnectionPool(1, max_connections, dsn, connection_factory=PreparingConnection)
+        self.failed_at: Optional[float] = None
+
+    def healthy(self, health_interval: int) -> bool:
+        """
+        Checks if the replica can be used, the failed replica is tried again after health_interval seconds
+        :param health_interval: number of seconds the failed replica is skipped
+        :return: True if the replica can be used
+        """
+        return self.failed_at is None or time.monotonic() - self.failed_at >= health_interval
+
+
+class ReplicaSet:
+    """
+    Routes the redirect lookups to the read replicas in the round-robin order
+
+    The replica failing to connect or to execute the query is marked as failed and skipped
+    for health_interval seconds, after which the next lookup checks it again
+    """
+    def __init__(self, dsns: list[str], max_connections: int, health_interval: int, primary_fallback: bool):
+        self.replicas = [Replica(dsn, max_connections) for dsn in dsns]
+        self.health_interval = health_interval
+        self.primary_fallback = primary_fallback
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def _order(self) -> list[Replica]:
+        """
+        Returns the replicas starting with the next one in the round-robin order
+        :return: list of Replica objects
+        """
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self.replicas)
+
+        return self.replicas[start:] + self.replicas[:start]
+
+    def _mark_failed(self, replica: Replica, exc: Exception) -> None:
+        """
+        Marks the replica as failed, so it is skipped for health_interval seconds
+        :param replica: failed Replica object
+        :param exc: error of the failure
+        :return: None
+        """
+        if replica.failed_at is None:
+            logging.warning("Read replica failed, skipping it for %s seconds, error=%s", self.health_interval, exc)
+        replica.failed_at = time.monotonic()
+
+    def lookup(self, values: dict, query: Callable = get_from_db):
+        """
+        Looks up the link (or the links) on the first healthy replica
+        :param values: values of the lookup query, see get.lookup_values
+        :param query: function executing the lookup query with the cursor and the values,
+            get.get_from_db by default
+        :return: None if no replica is available,
+            otherwise the result of the query, e.g., (url, redirect, expires_in) tuple (see get.get_from_db)
+            or an empty tuple if the link does not exist on the replica
+        """
+        for replica in self._order():
+            if not replica.healthy(self.health_interval):
+                continue
+
+            try:
+                connection = replica.pool.getconn()
+            except PoolError as exc:
+                # all connections of this process to the replica are in use, the replica is still healthy
+                logging.debug("Read replica pool exhausted, error=%s", exc)
+                continue
+            except psycopg2.Error as exc:
+                self._mark_failed(replica, exc)
+                continue
+
+            # the connection is put back (and rolled back) even if the query fails by any other error
+            broken = False
+            try:
+                cursor = connection.cursor()
+                result = query(cursor, values)
+                cursor.close()
+            except psycopg2.Error as exc:
+                broken = True
+                self._mark_failed(replica, exc)
+                continue
+            finally:
+                replica.pool.putconn(connection, close=broken)
+
+            if replica.failed_at is not None:
+                logging.info("Read replica recovered")
+                replica.failed_at = None
+
+            metrics.REPLICA_LOOKUPS.inc("found" if result else "not_found")
+            return result if result is not None else ()
+
+        metrics.REPLICA_LOOKUPS.inc("unavailable")
+        return None
+
+    def close(self) -> None:
+        """
+        Closes all connections to the replicas
+        :return: None
+        """
+        for replica in self.replicas:
+            replica.pool.closeall()
+
+
+def init(config: Replicas, env_dsns: Optional[str]) -> Optional[ReplicaSet]:
+    """
+    Creates the set of read replicas if enabled based on a given config
+
+    Contains FEATURE SWITCH
+    :param config: Replicas object of a configuration containing information
+    :param env_dsns: connection strings of the replicas separated by ";" (DB_REPLICA_STRINGS),
+        used instead of the ones in the config if set
+    :return: ReplicaSet object or None if the replicas are disabled or none is configured
+    """
+    logging.debug("Going to initialize read replicas, state %s", config.enabled)
+    # FEATURE SWITCH
+    if not config.enabled:
+        return None
+
+    dsns = [dsn.strip() for dsn in env_dsns.split(";") if dsn.strip()] if env_dsns else config.dsns
+    if not dsns:
+        logging.warning("Read replicas enabled, but none is configured, using the primary database")
+        return None
+
+    logging.debug("Read replicas initialized with values count=%s, max_connections=%s, health_interval=%s, "
+                  "primary_fallback=%s", len(dsns), config.max_connections, config.health_interval,
+                  config.primary_fallback)
+    return ReplicaSet(dsns, config.max_connections, config.health_interval, config.primary_fallback)
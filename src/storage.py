@@ -0,0 +1,434 @@
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional, Union
+
+import metrics
+import timing
+from codec import AlphabetCodec
+from config import ConfigValues, Storage
+from create import insert_deduplicated, insert_into_db, insert_many_into_db
+from get import get_from_db, get_many_from_db, lookup_many_values, lookup_values
+from pool import ManagedConnectionPool
+
+# the link is the primary key of the table without rowid, so the lookup reads one B-tree only;
+# protocol and redirect are stored as they are returned (e.g., "https", 301), the times as UNIX timestamps
+SQLITE_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS links ("
+    "link TEXT PRIMARY KEY, destination_proto TEXT NOT NULL, destination_addr TEXT NOT NULL, "
+    "redirect INTEGER NOT NULL, creator_ip INTEGER NOT NULL, generated INTEGER NOT NULL, "
+    "created_at REAL NOT NULL, expires_at REAL) WITHOUT ROWID"
+)
+SQLITE_GET = (
+    "SELECT destination_proto, destination_addr, redirect, expires_at FROM links "
+    "WHERE link = ? AND (expires_at IS NULL OR expires_at > ?)"
+)
+# there is no purge of the expired links, the expired link is replaced by the new one instead;
+# no row is changed when the link is taken and not expired
+SQLITE_INSERT = (
+    "INSERT INTO links (link, destination_proto, destination_addr, redirect, creator_ip, generated, created_at, "
+    "expires_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (link) DO UPDATE SET destination_proto = excluded.destination_proto, "
+    "destination_addr = excluded.destination_addr, redirect = excluded.redirect, creator_ip = excluded.creator_ip, "
+    "generated = excluded.generated, created_at = excluded.created_at, expires_at = excluded.expires_at "
+    "WHERE links.expires_at <= excluded.created_at"
+)
+# number of the SQL statements kept compiled by each SQLite connection
+SQLITE_CACHED_STATEMENTS = 16
+# milliseconds the writer waits for the lock held by the writer of another worker
+SQLITE_BUSY_TIMEOUT = 5000
+
+
+class PostgresSession:
+    """
+    Storage session of one connection of the primary Postgres database, using the prepared statements of db.STATEMENTS
+    """
+    def __init__(self, connection, cursor, codec: AlphabetCodec):
+        self.connection = connection
+        # used also by the sequence generator, reserving the IDs from the database sequence
+        self.cursor = cursor
+        self.codec = codec
+
+    def get(self, link: str) -> Optional[tuple]:
+        """
+        Looks up the link
+        :param link: requested link
+        :return: (url, redirect, expires_in) tuple or None if the link does not exist
+        """
+        return get_from_db(self.cursor, lookup_values(link, self.codec))
+
+    def get_many(self, links: list[str]) -> dict:
+        """
+        Looks up all given links at once
+        :param links: list of requested links
+        :return: dictionary of found link -> (url, redirect, expires_in)
+        """
+        return get_many_from_db(self.cursor, lookup_many_values(links, self.codec), self.codec)
+
+    def insert(self, values: dict) -> Optional[str]:
+        """
+        Inserts the link, not committed until commit is called
+        :param values: dictionary with preprocessed information about the entry
+        :return: inserted link or None if the link is already taken
+        """
+        return insert_into_db(self.cursor, values)
+
+    def insert_many(self, values: list[dict]) -> set:
+        """
+        Inserts all given links, skipping the taken ones, not committed until commit is called
+        :param values: list of dictionaries with preprocessed information about the entries
+        :return: set of inserted links
+        """
+        return insert_many_into_db(self.cursor, values)
+
+    def insert_deduplicated(self, values: dict) -> Optional[tuple]:
+        """
+        Returns the generated link of the same destination or inserts the new link if there is none
+        :param values: dictionary with preprocessed information about the entry
+        :return: (link, created) tuple or None if the new link is already taken
+        """
+        return insert_deduplicated(self.cursor, values, self.codec)
+
+    def commit(self) -> None:
+        """
+        Commits the inserted links
+        :return: None
+        """
+        self.connection.commit()
+
+
+class PostgresStorage:
+    """
+    Storage of the links in the primary Postgres database (the database given by DB_STRING)
+
+    The connections are taken from the connection pool set by start, after the process forking
+    """
+    def __init__(self, codec: AlphabetCodec):
+        self.codec = codec
+        self.connection_pool: Optional[ManagedConnectionPool] = None
+
+    def start(self, connection_pool: ManagedConnectionPool) -> None:
+        """
+        Sets the connection pool of the primary database.
+        With uWSGI, must be called after the process forking, so the workers do not share the connections
+        :param connection_pool: connection pool of the primary database
+        :return: None
+        """
+        self.connection_pool = connection_pool
+
+    @contextmanager
+    def session(self, sheddable: bool = False, background: bool = False) -> Iterator[PostgresSession]:
+        """
+        Takes the connection from the connection pool for the duration of the session,
+        the connection is put back even if the session fails (rolling back the uncommitted changes)
+        :raises pool.PoolBusy: if no connection of the pool becomes free in time
+        :param sheddable: True if the session is refused first when the pool is busy (creations)
+        :param background: True if the session is used by a background thread, using its own connections
+        :return: PostgresSession object
+        """
+        logging.debug("Requesting connection from connection pool")
+        start = time.perf_counter()
+        with timing.span("pool"):
+            connection = self.connection_pool.getconn(sheddable=sheddable, background=background)
+        metrics.POOL_CHECKOUT.observe(time.perf_counter() - start)
+        metrics.POOL_IN_USE.inc()
+        try:
+            with connection.cursor() as cursor:
+                yield PostgresSession(connection, cursor, self.codec)
+        finally:
+            self.connection_pool.putconn(connection)
+            metrics.POOL_IN_USE.dec()
+            logging.debug("Connection put to connection pool")
+
+
+class SQLiteSession:
+    """
+    Storage session of the SQLite connection of the current thread
+    """
+    # there is no database sequence, the sequence generator is not available
+    cursor = None
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    def get(self, link: str) -> Optional[tuple]:
+        """
+        Looks up the link
+        :param link: requested link
+        :return: (url, redirect, expires_in) tuple or None if the link does not exist
+        """
+        start = time.perf_counter()
+        now = time.time()
+        with timing.span("query"):
+            result = self.connection.execute(SQLITE_GET, (link, now)).fetchone()
+        metrics.DB_QUERY.observe(time.perf_counter() - start, "get_link")
+        if result is None:
+            return None
+
+        destination_proto, destination_addr, redirect, expires_at = result
+        return f"{destination_proto}://{destination_addr}", redirect, \
+            None if expires_at is None else expires_at - now
+
+    def get_many(self, links: list[str]) -> dict:
+        """
+        Looks up all given links, one lookup of the embedded database is cheaper than building one query of them
+        :param links: list of requested links
+        :return: dictionary of found link -> (url, redirect, expires_in)
+        """
+        results = {}
+        for link in links:
+            result = self.get(link)
+            if result is not None:
+                results[link] = result
+
+        return results
+
+    def insert(self, values: dict) -> Optional[str]:
+        """
+        Inserts the link, not committed until commit is called
+        :param values: dictionary with preprocessed information about the entry
+        :return: inserted link or None if the link is already taken
+        """
+        start = time.perf_counter()
+        with timing.span("insert"):
+            inserted = self._insert(values, time.time())
+        metrics.DB_QUERY.observe(time.perf_counter() - start, "insert_link")
+
+        return values["link"] if inserted else None
+
+    def insert_many(self, values: list[dict]) -> set:
+        """
+        Inserts all given links, skipping the taken ones, not committed until commit is called
+        :param values: list of dictionaries with preprocessed information about the entries
+        :return: set of inserted links
+        """
+        start = time.perf_counter()
+        now = time.time()
+        with timing.span("insert"):
+            result = {item["link"] for item in values if self._insert(item, now)}
+        metrics.DB_QUERY.observe(time.perf_counter() - start, "insert_links")
+
+        return result
+
+    def _insert(self, values: dict, now: float) -> bool:
+        expires_at = None if values["expires_in"] is None else now + values["expires_in"]
+        cursor = self.connection.execute(SQLITE_INSERT, (
+            values["link"], values["protocol"], values["dest"], values["redirect"], values["ip_address"],
+            values["generated"], now, expires_at))
+
+        return cursor.rowcount == 1
+
+    def commit(self) -> None:
+        """
+        Commits the inserted links
+        :return: None
+        """
+        self.connection.commit()
+
+
+class SQLiteStorage:
+    """
+    Storage of the links in the embedded SQLite database file, without any network round trip
+
+    The database is in the write-ahead log mode, so the lookups are not blocked by the writes and the workers
+    of the node can share the file; the writes of all workers are serialized by the database lock.
+    Each thread opens its own connection on the first use (after the process forking), which keeps
+    the statements compiled (prepared) and reads the file through the memory map
+    """
+    def __init__(self, path: str, mmap_size: int, synchronous: str):
+        self.path = path
+        self.mmap_size = mmap_size
+        self.synchronous = synchronous
+        self._local = threading.local()
+
+    def create(self) -> None:
+        """
+        Creates the table of the links if it does not exist and switches the database to the write-ahead log mode
+        :return: None
+        """
+        connection = sqlite3.connect(self.path)
+        try:
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute(SQLITE_SCHEMA)
+            connection.commit()
+        finally:
+            connection.close()
+
+    def connect(self) -> sqlite3.Connection:
+        """
+        Opens the connection of the current thread
+        :return: sqlite3.Connection object
+        """
+        connection = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT / 1000,
+                                     cached_statements=SQLITE_CACHED_STATEMENTS)
+        connection.execute(f"PRAGMA synchronous = {self.synchronous.upper()}")
+        connection.execute(f"PRAGMA mmap_size = {self.mmap_size}")
+        logging.debug("SQLite connection opened, path=%s", self.path)
+
+        return connection
+
+    @contextmanager
+    def session(self, sheddable: bool = False, background: bool = False) -> Iterator[SQLiteSession]:
+        """
+        Uses the connection of the current thread for the duration of the session,
+        the uncommitted changes are rolled back when the session ends
+        :param sheddable: unused, each thread has its own connection
+        :param background: unused, each thread has its own connection
+        :return: SQLiteSession object
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self.connect()
+        try:
+            yield SQLiteSession(connection)
+        finally:
+            if connection.in_transaction:
+                connection.rollback()
+
+
+class MemoryStorage:
+    """
+    Storage of the links in the memory of the process, lost on the restart and not shared by the uWSGI workers
+
+    The storage is its own session; the inserts are visible right away, the commit does nothing
+    """
+    # there is no database sequence, the sequence generator is not available
+    cursor = None
+
+    def __init__(self):
+        # link -> (protocol, destination, redirect, expires_at)
+        self._links: dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def session(self, sheddable: bool = False, background: bool = False) -> Iterator["MemoryStorage"]:
+        """
+        :param sheddable: unused, there is no connection
+        :param background: unused, there is no connection
+        :return: MemoryStorage object itself
+        """
+        yield self
+
+    def get(self, link: str) -> Optional[tuple]:
+        """
+        Looks up the link
+        :param link: requested link
+        :return: (url, redirect, expires_in) tuple or None if the link does not exist
+        """
+        row = self._links.get(link)
+        if row is None:
+            return None
+
+        protocol, destination, redirect, expires_at = row
+        if expires_at is None:
+            return f"{protocol}://{destination}", redirect, None
+
+        expires_in = expires_at - time.time()
+        return (f"{protocol}://{destination}", redirect, expires_in) if expires_in > 0 else None
+
+    def get_many(self, links: list[str]) -> dict:
+        """
+        Looks up all given links
+        :param links: list of requested links
+        :return: dictionary of found link -> (url, redirect, expires_in)
+        """
+        results = {}
+        for link in links:
+            result = self.get(link)
+            if result is not None:
+                results[link] = result
+
+        return results
+
+    def insert(self, values: dict) -> Optional[str]:
+        """
+        Inserts the link
+        :param values: dictionary with preprocessed information about the entry
+        :return: inserted link or None if the link is already taken
+        """
+        with self._lock:
+            return values["link"] if self._insert(values, time.time()) else None
+
+    def insert_many(self, values: list[dict]) -> set:
+        """
+        Inserts all given links, skipping the taken ones
+        :param values: list of dictionaries with preprocessed information about the entries
+        :return: set of inserted links
+        """
+        now = time.time()
+        with self._lock:
+            return {item["link"] for item in values if self._insert(item, now)}
+
+    def _insert(self, values: dict, now: float) -> bool:
+        row = self._links.get(values["link"])
+        # the expired link is replaced, as there is no purge
+        if row is not None and (row[3] is None or row[3] > now):
+            return False
+
+        expires_at = None if values["expires_in"] is None else now + values["expires_in"]
+        self._links[values["link"]] = (values["protocol"], values["dest"], values["redirect"], expires_at)
+        return True
+
+    def commit(self) -> None:
+        """
+        Does nothing, the inserted links are stored right away
+        :return: None
+        """
+
+
+AnyStorage = Union[PostgresStorage, SQLiteStorage, MemoryStorage]
+
+
+def check_features(conf: ConfigValues) -> None:
+    """
+    Checks that no enabled feature depends on Postgres, used with the other storage backends
+
+    :raises ValueError: if any such feature is enabled
+    :param conf: ConfigValues object of the whole configuration
+    :return: None
+    """
+    postgres_features = {
+        "utils.generation = \"sequence\"": conf.Utils.generation == "sequence",
+        "utils.deduplicate": conf.Utils.deduplicate,
+        "clicks": conf.Clicks.enabled,
+        "cache.warm_up_source = \"clicks\"": conf.Cache.warm_up > 0 and conf.Cache.warm_up_source == "clicks",
+        "bloom": conf.Bloom.enabled,
+        "database.replicas": conf.Replicas.enabled,
+    }
+    enabled = [name for name, value in postgres_features.items() if value]
+    if enabled:
+        raise ValueError(f"{', '.join(enabled)} cannot be enabled without database.backend = \"postgres\"")
+
+
+def init(config: Storage, codec: AlphabetCodec) -> AnyStorage:
+    """
+    Creates the storage of the links based on a given config.
+    The Postgres storage gets its connection pool by start, after the process forking
+    :param config: Storage object of a configuration containing information
+    :param codec: AlphabetCodec object of the encoded links
+    :return: PostgresStorage, SQLiteStorage or MemoryStorage object
+    """
+    logging.debug("Going to initialize storage, backend %s", config.backend)
+    if config.backend == "postgres":
+        return PostgresStorage(codec)
+
+    if config.backend == "memory":
+        try:
+            # on non existing import (uWSGI is not running), it fails
+            import uwsgi
+        except ImportError as _:
+            pass
+        else:
+            if uwsgi.numproc > 1:
+                logging.warning("Links of the memory storage are not shared by the %s uWSGI workers, "
+                                "each worker finds only the links created by itself", uwsgi.numproc)
+        return MemoryStorage()
+
+    sqlite_storage = SQLiteStorage(config.sqlite_path, config.sqlite_mmap * 1024 * 1024, config.sqlite_synchronous)
+    # the connection is closed before the forking, the workers open their own ones
+    sqlite_storage.create()
+    logging.debug("SQLite storage initialized with values path=%s, mmap=%s, synchronous=%s",
+                  config.sqlite_path, config.sqlite_mmap, config.sqlite_synchronous)
+    return sqlite_storage
@@ -0,0 +1,276 @@
+import cProfile
+import glob
+import io
+import logging
+import mmap
+import multiprocessing
+import os
+import pstats
+import random
+import shutil
+import struct
+import threading
+import time
+from os import environ
+from typing import Any, Optional
+
+import flask
+
+from config import Timing
+from utils import json_response
+
+# fraction of the profiled requests, number of the profiling session (increased by each start of the profiling)
+SWITCH = struct.Struct("<dI")
+# number of seconds between the dumps of the profile of the worker into the profile directory
+DUMP_INTERVAL = 5
+SORT_KEYS = ("cumulative", "tottime", "calls")
+# set by init, the spans are recorded only with the Server-Timing header enabled
+SERVER_TIMING = False
+
+
+class Span:
+    """
+    Measures the duration of the block of the request, the durations of the same name are summed
+    """
+    __slots__ = ("name", "spans", "start")
+
+    def __init__(self, name: str, spans: dict):
+        self.name = name
+        self.spans = spans
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        self.spans[self.name] = self.spans.get(self.name, 0.0) + time.perf_counter() - self.start
+
+
+class NullSpan:
+    """
+    Span measuring nothing, used when the Server-Timing header is disabled
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+def span(name: str):
+    """
+    Creates the span of the current request, to be used as the context manager.
+    Outside of the request (e.g., in the background threads), nothing is measured
+
+    Contains FEATURE SWITCH
+    :param name: name of the span in the Server-Timing header
+    :return: Span or NullSpan object
+    """
+    # FEATURE SWITCH
+    if not SERVER_TIMING or not flask.has_request_context():
+        return NULL_SPAN
+
+    spans = flask.g.get("spans")
+    return NULL_SPAN if spans is None else Span(name, spans)
+
+
+def server_timing(spans: dict, total: float) -> str:
+    """
+    Formats the spans as the value of the Server-Timing header, in milliseconds
+    :param spans: dictionary of span name -> duration in seconds
+    :param total: duration of the whole request in seconds
+    :return: header value
+    """
+    return ", ".join(f"{name};dur={duration * 1000:.3f}" for name, duration in [*spans.items(), ("total", total)])
+
+
+class Profiler:
+    """
+    Profiles a fraction of the requests by cProfile, switched on and off by the admin for all workers of the node
+
+    The switch is kept in the shared memory created before the forking. Each worker profiles one request at a time,
+    collects the profiles of all its profiled requests and dumps them into the profile directory every DUMP_INTERVAL
+    seconds; the profiles of all workers are merged when the stats are requested
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._memory = mmap.mmap(-1, SWITCH.size)
+        # created before the forking, so it is shared by the workers
+        self._switch_lock = multiprocessing.Lock()
+        self._lock = threading.Lock()
+        self._session = 0
+        self._profile: Optional[cProfile.Profile] = None
+        self._dumped_at = 0.0
+
+    def switch(self, rate: float) -> int:
+        """
+        Sets the fraction of the profiled requests of all workers, starting a new session if the profiling was off
+        :param rate: fraction of the profiled requests, 0 stops the profiling
+        :return: number of the profiling session
+        """
+        with self._switch_lock:
+            previous_rate, session = SWITCH.unpack_from(self._memory, 0)
+            if rate > 0 and previous_rate == 0:
+                session += 1
+            SWITCH.pack_into(self._memory, 0, rate, session)
+
+        logging.info("Profiling switched, rate=%s, session=%s", rate, session)
+        return session
+
+    def begin(self) -> bool:
+        """
+        Starts profiling the current request if it is sampled and no other request of the worker is profiled
+        :return: True if the request is profiled, end must be called after it
+        """
+        rate, session = SWITCH.unpack_from(self._memory, 0)
+        if rate == 0 or random.random() >= rate or not self._lock.acquire(blocking=False):
+            return False
+
+        if session != self._session or self._profile is None:
+            self._session = session
+            self._profile = cProfile.Profile()
+        self._profile.enable()
+        return True
+
+    def end(self) -> None:
+        """
+        Stops profiling the current request and dumps the profile of the worker if it was not dumped recently
+        :return: None
+        """
+        try:
+            self._profile.disable()
+            if time.monotonic() - self._dumped_at >= DUMP_INTERVAL:
+                self.dump()
+        finally:
+            self._lock.release()
+
+    def dump(self) -> None:
+        """
+        Writes the profile of the worker into the profile directory, replacing its previous dump
+        :return: None
+        """
+        if self._profile is None:
+            return
+
+        path = os.path.join(self.directory, f"profile-{self._session}-{os.getpid()}.prof")
+        self._profile.dump_stats(path + ".tmp")
+        os.replace(path + ".tmp", path)
+        self._dumped_at = time.monotonic()
+
+    def stats(self, sort: str, limit: int) -> str:
+        """
+        Merges the profiles of all workers of the current session
+        :param sort: key the functions are sorted by
+        :param limit: number of printed functions
+        :return: text of the merged stats
+        """
+        session = SWITCH.unpack_from(self._memory, 0)[1]
+        if self._lock.acquire(blocking=False):
+            try:
+                if self._session == session:
+                    self.dump()
+            finally:
+                self._lock.release()
+
+        paths = glob.glob(os.path.join(self.directory, f"profile-{session}-*.prof"))
+        if not paths:
+            return f"No profiled requests in session {session}\n"
+
+        output = io.StringIO()
+        merged = pstats.Stats(*paths, stream=output)
+        output.write(f"Session {session}, profiles of {len(paths)} workers\n")
+        merged.sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+
+def check_admin(body: Any) -> Optional[flask.Response]:
+    """
+    Checks the admin password of the profiler request
+    :param body: parsed JSON body of the request
+    :return: None if the password is correct, otherwise flask.Response with the status code 401 or 400
+    """
+    if not isinstance(body, dict):
+        return json_response({"error": "Request is not in the correct format"}, 400)
+
+    if not environ.get("ADMIN_PASS") or body.get("admin") != environ.get("ADMIN_PASS"):
+        logging.debug("Admin pass is incorrect")
+        return json_response({"error": "Unauthorized"}, 401)
+
+    return None
+
+
+def begin(profiler: Optional[Profiler]) -> None:
+    """
+    Prepares the spans and the profiling of the current request
+
+    Contains FEATURE SWITCH
+    :param profiler: Profiler object or None if the profiler is disabled
+    :return: None
+    """
+    # FEATURE SWITCH
+    if SERVER_TIMING:
+        flask.g.spans = {}
+    if profiler is not None:
+        flask.g.profiled = profiler.begin()
+
+
+def finish(response: flask.Response, total: float) -> None:
+    """
+    Adds the Server-Timing header of the recorded spans to the response
+    :param response: flask.Response
+    :param total: duration of the whole request in seconds
+    :return: None
+    """
+    spans = flask.g.get("spans")
+    if spans is not None:
+        response.headers["Server-Timing"] = server_timing(spans, total)
+
+
+def teardown(profiler: Optional[Profiler]) -> None:
+    """
+    Stops profiling the current request, called even if the request failed
+    :param profiler: Profiler object or None if the profiler is disabled
+    :return: None
+    """
+    if profiler is not None and flask.g.get("profiled"):
+        flask.g.profiled = False
+        profiler.end()
+
+
+def init(config: Timing) -> Optional[Profiler]:
+    """
+    Enables the Server-Timing header and creates the profiler if enabled based on a given config.
+    Must be called before the process forking, so the profiler switch is shared by the workers
+
+    Contains FEATURE SWITCH
+    :param config: Timing object of a configuration containing information
+    :return: Profiler object or None if the profiler is disabled
+    """
+    global SERVER_TIMING
+    logging.debug("Going to initialize timing, server timing %s, profiler %s", config.server_timing, config.profiler)
+    SERVER_TIMING = config.server_timing
+    # FEATURE SWITCH
+    if not config.profiler:
+        return None
+
+    try:
+        # on non existing import (uWSGI is not running), it fails
+        import uwsgi
+    except ImportError as _:
+        pass
+    else:
+        if uwsgi.opt.get("lazy-apps") or uwsgi.opt.get("lazy"):
+            logging.warning("Profiler switch cannot be shared by the workers loading the application after the "
+                            "forking (lazy-apps), each worker is switched separately")
+
+    # the directory is cleaned by the master process, before the workers are forked
+    shutil.rmtree(config.profile_dir, ignore_errors=True)
+    os.makedirs(config.profile_dir, exist_ok=True)
+    logging.debug("Profiler initialized with values profile_dir=%s", config.profile_dir)
+    return Profiler(config.profile_dir)
@@ -0,0 +1,149 @@
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+import psycopg2
+
+from cache import AnyRedirectCache, RedirectCache
+from config import Cache
+from get import cache_result
+
+# number of links looked up by one query
+WARM_UP_BATCH = 1000
+
+
+class CacheWarmer:
+    """
+    Loads the most requested links into the redirect cache by a background thread of each worker after its start,
+    so the first requests after the deploy or the respawn of the worker do not all reach the database
+
+    The links are the most redirected ones according to the click counter (link_hits table),
+    or the links of the cache (the most recently used ones of the process-local cache),
+    written to the snapshot file when the worker stops
+    """
+    def __init__(self, size: int, source: str, snapshot_path: str):
+        self.size = size
+        self.source = source
+        self.snapshot_path = snapshot_path
+        self._thread: Optional[threading.Thread] = None
+
+    def top_links(self, link_storage) -> list[str]:
+        """
+        Returns the links to be loaded into the cache, the most requested first
+        :param link_storage: storage object of the links (storage.AnyStorage)
+        :return: list of at most size links
+        """
+        if self.source == "clicks":
+            with link_storage.session(background=True) as session:
+                session.cursor.execute("SELECT link FROM link_hits ORDER BY hits DESC LIMIT %(size)s;",
+                                       {"size": self.size})
+                return [row[0] for row in session.cursor.fetchall()]
+
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as file:
+                return [line for line in file.read().splitlines() if line][:self.size]
+        except FileNotFoundError as _:
+            logging.info("No snapshot of the redirect cache found, path=%s", self.snapshot_path)
+            return []
+
+    def warm_up(self, link_storage, redirect_cache: AnyRedirectCache) -> int:
+        """
+        Looks up the top links in batches and stores the found ones into the redirect cache
+        :param link_storage: storage object of the links (storage.AnyStorage)
+        :param redirect_cache: redirect cache object the links are stored to
+        :return: number of cached links
+        """
+        start = time.perf_counter()
+        cached = 0
+        try:
+            links = self.top_links(link_storage)
+            # the least requested links are stored first, so they are the first ones evicted by the LRU cache
+            for end in range(len(links), 0, -WARM_UP_BATCH):
+                batch = links[max(0, end - WARM_UP_BATCH):end]
+                with link_storage.session(background=True) as session:
+                    found = session.get_many(batch)
+                for link in reversed(batch):
+                    if link in found:
+                        cache_result(link, found[link], redirect_cache)
+                        cached += 1
+        except (psycopg2.Error, sqlite3.Error, OSError) as exc:
+            logging.error("Warming up the redirect cache unsuccessful, error=%s", exc)
+
+        logging.info("Redirect cache warmed up with %s links in %.3f s", cached, time.perf_counter() - start)
+        return cached
+
+    def save(self, redirect_cache: AnyRedirectCache) -> None:
+        """
+        Writes the links of the cache to the snapshot file, the snapshot of the worker stopped last is kept
+        :param redirect_cache: redirect cache object of the worker
+        :return: None
+        """
+        links = redirect_cache.hottest(self.size)
+        path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        try:
+            with open(path, "w", encoding="utf-8") as file:
+                file.write("".join(f"{link}\n" for link in links))
+            os.replace(path, self.snapshot_path)
+        except OSError as exc:
+            logging.error("Writing the snapshot of the redirect cache unsuccessful, error=%s", exc)
+            return
+
+        logging.info("Snapshot of the redirect cache written, links=%s", len(links))
+
+    def start(self, link_storage, redirect_cache: Optional[AnyRedirectCache]) -> None:
+        """
+        Starts the background thread warming up the redirect cache, the worker serves the requests meanwhile.
+        With the snapshot source, the snapshot of the cache is written when the process exits,
+        of the shared cache by the first worker only.
+        Must be called after the process forking and the opening of the storage
+        :param link_storage: storage object of the links (storage.AnyStorage)
+        :param redirect_cache: redirect cache object of the worker or None if the cache is disabled
+        :return: None
+        """
+        if redirect_cache is None:
+            return
+
+        try:
+            # on non existing import (uWSGI is not running), it fails
+            import uwsgi
+        except ImportError as _:
+            first_worker = True
+        else:
+            first_worker = uwsgi.worker_id() == 1
+
+        # the shared cache is saved and warmed up once, by the first worker
+        if not isinstance(redirect_cache, RedirectCache) and not first_worker:
+            return
+
+        if self.source == "snapshot" and (isinstance(redirect_cache, RedirectCache)
+                                          or hasattr(redirect_cache.uwsgi, "cache_keys")):
+            atexit.register(self.save, redirect_cache)
+        elif self.source == "snapshot":
+            logging.warning("Snapshot of the shared redirect cache is not written, listing the keys of the uWSGI cache "
+                            "is not supported by this uWSGI version, consider the clicks source")
+
+        self._thread = threading.Thread(target=self.warm_up, args=(link_storage, redirect_cache),
+                                        name="cache-warm-up", daemon=True)
+        self._thread.start()
+
+
+def init(config: Cache) -> Optional[CacheWarmer]:
+    """
+    Creates the warm-up of the redirect cache if enabled based on a given config
+
+    Contains FEATURE SWITCH
+    :param config: Cache object of a configuration containing information
+    :return: CacheWarmer object or None if the warm-up or the cache is disabled
+    """
+    logging.debug("Going to initialize warm-up of redirect cache, links %s", config.warm_up)
+    # FEATURE SWITCH
+    if not config.enabled or config.warm_up == 0:
+        return None
+
+    logging.debug("Warm-up of redirect cache initialized with values warm_up=%s, warm_up_source=%s, "
+                  "snapshot_path=%s", config.warm_up, config.warm_up_source, config.snapshot_path)
+    return CacheWarmer(config.warm_up, config.warm_up_source, config.snapshot_path)
@@ -9,36 +9,54 @@ VALUES ('http'), ('https');
 
 CREATE TABLE links (
     id SERIAL PRIMARY KEY,
-    link VARCHAR (32) UNIQUE NOT NULL,
+    link VARCHAR (32) NOT NULL,
     destination_proto INTEGER NOT NULL,
     destination_addr VARCHAR(50) NOT NULL,
     redirect char,
     creator_ip INTEGER NOT NULL,
     created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    -- the links created here are custom, the generated ones are stored in encoded_links;
+    -- kept for the links moved from here by `manage.py compact` (see migration 002)
+    generated BOOLEAN NOT NULL DEFAULT FALSE,
+    -- NULL for the links which never expire
+    expires_at TIMESTAMP,
+    -- covering the columns of the redirect lookup, so it can be answered by an index-only scan
+    CONSTRAINT links_link_key UNIQUE (link) INCLUDE (destination_proto, destination_addr, redirect, expires_at),
     CONSTRAINT fk_dest_proto FOREIGN KEY (destination_proto) REFERENCES protocol(protocol_id)
 );
 
-CREATE FUNCTION insert_link(redir_link varchar, destination_proto varchar, destination_addr varchar, redirect int, creator_ip bigint) RETURNS varchar AS
-    $$
-    DECLARE
-        ret VARCHAR := null;
-    BEGIN
-    INSERT INTO links(link, destination_proto, redirect, destination_addr, creator_ip) VALUES
-        (redir_link, (SELECT protocol.protocol_id FROM protocol where protocol.protocol = destination_proto), (redirect - 300), destination_addr, cast((creator_ip - 2^31) AS integer) )
-        ON CONFLICT (link) DO NOTHING RETURNING links.link INTO ret;
-    return ret;
-    END;
-    $$
-    LANGUAGE 'plpgsql';
+-- links of `link_length` characters of the link alphabet (all generated links),
+-- stored under the number they encode, so the redirect is a lookup of the 8-byte primary key;
+-- the other (custom) links are stored in the links table
+CREATE TABLE encoded_links (
+    id BIGINT NOT NULL,
+    destination_proto INTEGER NOT NULL,
+    destination_addr VARCHAR(50) NOT NULL,
+    redirect char,
+    creator_ip INTEGER NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    -- false for the custom links, only the generated links are returned by the deduplication
+    generated BOOLEAN NOT NULL DEFAULT TRUE,
+    expires_at TIMESTAMP,
+    -- covering the columns of the redirect lookup, so it can be answered by an index-only scan
+    CONSTRAINT encoded_links_pkey PRIMARY KEY (id) INCLUDE (destination_proto, destination_addr, redirect, expires_at),
+    CONSTRAINT fk_encoded_dest_proto FOREIGN KEY (destination_proto) REFERENCES protocol(protocol_id)
+);
+
+-- hash index stores only the 4-byte hash of the destination, used by the deduplication lookup
+CREATE INDEX links_destination_hash ON links USING HASH (destination_addr) WHERE generated;
+CREATE INDEX encoded_links_destination_hash ON encoded_links USING HASH (destination_addr) WHERE generated;
 
-CREATE VIEW addresses AS
-    SELECT CONCAT(protocol.protocol, '://', links.destination_addr) as url, (CAST(links.redirect AS INTEGER) + 300) as redirect, links.link as link FROM links INNER JOIN protocol ON protocol.protocol_id = links.destination_proto;
+-- only the links which expire, used by the purge of the expired links
+CREATE INDEX links_expires_at ON links (expires_at) WHERE expires_at IS NOT NULL;
+CREATE INDEX encoded_links_expires_at ON encoded_links (expires_at) WHERE expires_at IS NOT NULL;
 
-CREATE FUNCTION get_address(req_link varchar) RETURNS TABLE (url text, redirect integer) AS
-    $$
-    BEGIN
-        RETURN QUERY
-            SELECT addresses.url, addresses.redirect FROM addresses where addresses.link = req_link;
-        END;
-    $$
-    LANGUAGE 'plpgsql';
\ No newline at end of file
+-- IDs reserved in blocks by the workers for the "sequence" link generation
+CREATE SEQUENCE link_ids AS BIGINT MINVALUE 0 START WITH 0;
+
+-- number of redirects of each link (of both links tables), written in batches by the workers
+CREATE TABLE link_hits (
+    link VARCHAR (32) PRIMARY KEY,
+    hits BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
@@ -0,0 +1,14 @@
+-- Replaces the unique index of links.link with the one covering the columns of the redirect lookup,
+-- so the prepared statement `get_link` can be answered by an index-only scan.
+-- The new index is built without blocking the writes, then swapped in one short transaction.
+CREATE UNIQUE INDEX CONCURRENTLY links_link_covering ON links (link) INCLUDE (destination_proto, destination_addr, redirect);
+
+BEGIN;
+ALTER TABLE IF EXISTS link_hits DROP CONSTRAINT IF EXISTS fk_hits_link;
+ALTER TABLE links DROP CONSTRAINT links_link_key;
+ALTER TABLE links ADD CONSTRAINT links_link_key UNIQUE USING INDEX links_link_covering;
+ALTER TABLE IF EXISTS link_hits ADD CONSTRAINT fk_hits_link FOREIGN KEY (link) REFERENCES links(link) ON DELETE CASCADE;
+COMMIT;
+
+-- keeps the visibility map up to date, index-only scans depend on it
+VACUUM (ANALYZE) links;
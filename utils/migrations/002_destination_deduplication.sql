@@ -0,0 +1,7 @@
+-- Marks the generated links and indexes their destinations for the deduplication (`deduplicate` in config.toml).
+-- Adding the column with a constant default does not rewrite the table.
+-- The existing links are not known to be generated, so they are never returned by the deduplication.
+ALTER TABLE links ADD COLUMN generated BOOLEAN NOT NULL DEFAULT FALSE;
+
+-- hash index stores only the 4-byte hash of the destination, used by the deduplication lookup
+CREATE INDEX CONCURRENTLY links_destination_hash ON links USING HASH (destination_addr) WHERE generated;
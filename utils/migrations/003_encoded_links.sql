@@ -0,0 +1,19 @@
+-- Creates the table of the links stored under the number they encode (see utils/database.sql).
+-- New links are written to it right after the upgrade, the existing ones stay readable in the links table
+-- and are moved by `python manage.py compact` afterwards.
+CREATE TABLE encoded_links (
+    id BIGINT NOT NULL,
+    destination_proto INTEGER NOT NULL,
+    destination_addr VARCHAR(50) NOT NULL,
+    redirect char,
+    creator_ip INTEGER NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    generated BOOLEAN NOT NULL DEFAULT TRUE,
+    CONSTRAINT encoded_links_pkey PRIMARY KEY (id) INCLUDE (destination_proto, destination_addr, redirect),
+    CONSTRAINT fk_encoded_dest_proto FOREIGN KEY (destination_proto) REFERENCES protocol(protocol_id)
+);
+
+CREATE INDEX encoded_links_destination_hash ON encoded_links USING HASH (destination_addr) WHERE generated;
+
+-- the hits are counted for the links of both tables
+ALTER TABLE IF EXISTS link_hits DROP CONSTRAINT IF EXISTS fk_hits_link;
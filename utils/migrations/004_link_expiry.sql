@@ -0,0 +1,24 @@
+-- Adds the expiry of the links (`expires_in` of the create request), NULL for the links which never expire.
+-- Adding the nullable column does not rewrite the tables.
+ALTER TABLE links ADD COLUMN expires_at TIMESTAMP;
+ALTER TABLE encoded_links ADD COLUMN expires_at TIMESTAMP;
+
+-- Replaces the covering indexes of the redirect lookups with the ones including the expiry,
+-- so the expired links are filtered by the index-only scan.
+-- The new indexes are built without blocking the writes, then swapped in one short transaction.
+CREATE UNIQUE INDEX CONCURRENTLY links_link_expiring ON links (link) INCLUDE (destination_proto, destination_addr, redirect, expires_at);
+CREATE UNIQUE INDEX CONCURRENTLY encoded_links_pkey_expiring ON encoded_links (id) INCLUDE (destination_proto, destination_addr, redirect, expires_at);
+
+BEGIN;
+ALTER TABLE links DROP CONSTRAINT links_link_key;
+ALTER TABLE links ADD CONSTRAINT links_link_key UNIQUE USING INDEX links_link_expiring;
+ALTER TABLE encoded_links DROP CONSTRAINT encoded_links_pkey;
+ALTER TABLE encoded_links ADD CONSTRAINT encoded_links_pkey PRIMARY KEY USING INDEX encoded_links_pkey_expiring;
+COMMIT;
+
+-- only the links which expire, used by the purge of the expired links
+CREATE INDEX CONCURRENTLY links_expires_at ON links (expires_at) WHERE expires_at IS NOT NULL;
+CREATE INDEX CONCURRENTLY encoded_links_expires_at ON encoded_links (expires_at) WHERE expires_at IS NOT NULL;
+
+-- keeps the visibility map up to date, index-only scans depend on it
+VACUUM (ANALYZE) links, encoded_links;
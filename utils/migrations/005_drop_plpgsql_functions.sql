@@ -0,0 +1,6 @@
+-- Drops the plpgsql functions and the view replaced by the server-side prepared statements of the service (src/db.py),
+-- nothing calls them since then.
+DROP FUNCTION IF EXISTS get_address(varchar);
+DROP VIEW IF EXISTS addresses;
+DROP FUNCTION IF EXISTS insert_link(varchar, varchar, varchar, int, bigint);
+DROP FUNCTION IF EXISTS insert_links(varchar[], varchar[], varchar[], int[], bigint[]);
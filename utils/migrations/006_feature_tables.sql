@@ -0,0 +1,12 @@
+-- Creates the objects of the optional features added to utils/database.sql without their own migration,
+-- so the migrated database equals the one created by utils/database.sql. Nothing is changed if they already exist.
+
+-- IDs reserved in blocks by the workers for the "sequence" link generation
+CREATE SEQUENCE IF NOT EXISTS link_ids AS BIGINT MINVALUE 0 START WITH 0;
+
+-- number of redirects of each link (of both links tables), written in batches by the workers
+CREATE TABLE IF NOT EXISTS link_hits (
+    link VARCHAR (32) PRIMARY KEY,
+    hits BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);